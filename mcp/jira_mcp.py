@@ -0,0 +1,454 @@
+#!/usr/bin/env python3
+"""
+Jira MCP Connection
+
+A persistent session to the Atlassian Remote MCP Server (through the
+mcp-remote proxy) and direct, structured calls to its Jira tools.
+
+Issue creation used to go through an LLM agent that was asked to call
+createJiraIssue with fields the server already knew. Here the tool is called
+directly with arguments built from the request, mapped onto the tool's own
+input schema, so no LLM round-trip is needed.
+
+The mcp-remote process (and its OAuth session) is started once at startup
+and supervised: a background task pings it, reconnects with backoff when it
+dies and keeps a cached status for the health endpoint, so neither requests
+nor health checks pay for a new Node subprocess.
+
+Bulk creation shares that session: issues are created with bounded
+concurrency, each child only after its parent exists (so it can be linked by
+key), and rate-limited calls are retried with exponential backoff.
+"""
+import asyncio
+import json
+import os
+import random
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from mcp_use import MCPClient
+
+from tool_catalog import JIRA_SERVER, ToolSpec, get_tool_catalog
+from trace_replay import tool_result_is_error, tool_result_text
+
+ISSUE_KEY_PATTERN = re.compile(r"\b([A-Z][A-Z0-9_]+-\d+)\b")
+ISSUE_URL_PATTERN = re.compile(r"(https://[^\s\"'/]+/browse/[A-Z][A-Z0-9_]+-\d+)")
+
+CREATE_ISSUE_TOOL = "createJiraIssue"
+
+
+class JiraToolError(Exception):
+    """Raised when a Jira MCP tool call is rejected by the server"""
+
+
+def get_jira_site() -> str:
+    """Jira Cloud site (or cloud ID) passed as cloudId to the Atlassian tools"""
+    cloud_id = os.getenv("JIRA_CLOUD_ID", "")
+    if not cloud_id or cloud_id == "your-jira-cloud-id-here":
+        return "rowen.atlassian.net"
+    return cloud_id
+
+
+def _first_property(properties: Dict[str, Any], *names: str) -> Optional[str]:
+    """The first of the candidate argument names that the tool's schema declares"""
+    for name in names:
+        if name in properties:
+            return name
+    return None
+
+
+def build_issue_arguments(
+    input_schema: Optional[Dict[str, Any]],
+    cloud_id: str,
+    project: str,
+    summary: str,
+    description: str,
+    issue_type: str,
+    priority: Optional[str] = None,
+    parent: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    createJiraIssue arguments for the structured issue fields
+
+    Field names are matched against the tool's input schema (the Atlassian
+    server names them projectKey/issueTypeName; older versions used
+    project/issueType). Fields without a top-level argument, such as
+    priority, go into additional_fields when the tool accepts it.
+    """
+    properties = (input_schema or {}).get("properties") or {}
+    arguments: Dict[str, Any] = {
+        _first_property(properties, "cloudId") or "cloudId": cloud_id,
+        _first_property(properties, "projectKey", "project") or "projectKey": project,
+        _first_property(properties, "issueTypeName", "issueType") or "issueTypeName": issue_type,
+        "summary": summary,
+        "description": description
+    }
+    additional_fields: Dict[str, Any] = {}
+
+    if priority:
+        if "priority" in properties:
+            arguments["priority"] = priority
+        else:
+            additional_fields["priority"] = {"name": priority}
+    if parent:
+        parent_argument = _first_property(properties, "parent", "parentKey", "parentIssueKey")
+        if parent_argument:
+            arguments[parent_argument] = parent
+        else:
+            additional_fields["parent"] = {"key": parent}
+
+    if additional_fields:
+        additional_argument = _first_property(properties, "additional_fields", "additionalFields")
+        if additional_argument:
+            arguments[additional_argument] = additional_fields
+        else:
+            print(f"[JIRA] {CREATE_ISSUE_TOOL} has no additional fields argument; skipping {', '.join(additional_fields)}")
+    return arguments
+
+
+def is_rate_limited(error: Exception) -> bool:
+    """Whether a Jira tool error is the Atlassian API's rate limiting"""
+    text = str(error).lower()
+    return "429" in text or "rate limit" in text or "too many requests" in text
+
+
+def check_issue_links(items: List[Dict[str, Any]]) -> Optional[str]:
+    """Problem with the refs/parent_refs of a bulk request (duplicates, unknown parents, cycles), if any"""
+    refs = [item["ref"] for item in items]
+    duplicates = sorted({ref for ref in refs if refs.count(ref) > 1})
+    if duplicates:
+        return f"Duplicate refs: {', '.join(duplicates)}"
+    parents = {item["ref"]: item.get("parent_ref") for item in items}
+    unknown = sorted(ref for ref, parent in parents.items() if parent and parent not in parents)
+    if unknown:
+        return f"Unknown parent_ref on: {', '.join(unknown)}"
+    for ref in parents:
+        seen = set()
+        while ref and ref not in seen:
+            seen.add(ref)
+            ref = parents[ref]
+        if ref:
+            return f"Parent links form a cycle through {ref}"
+    return None
+
+
+def parse_created_issue(result: Any, site: str) -> Dict[str, str]:
+    """Issue key and browse URL from a createJiraIssue tool result"""
+    text = tool_result_text(result)
+    key = None
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            key = data.get("key") or (data.get("issue") or {}).get("key")
+    except ValueError:
+        pass
+    if not key:
+        match = ISSUE_KEY_PATTERN.search(text)
+        key = match.group(1) if match else None
+    if not key:
+        raise JiraToolError(f"{CREATE_ISSUE_TOOL} returned no issue key: {text[:200]}")
+
+    url_match = ISSUE_URL_PATTERN.search(text)
+    host = site if "." in site else f"{site}.atlassian.net"
+    return {"key": key, "url": url_match.group(1) if url_match else f"https://{host}/browse/{key}"}
+
+
+class JiraMCPConnection:
+    """One long-lived MCP session to the Atlassian Remote MCP Server"""
+
+    def __init__(self):
+        self.remote_url = os.getenv("JIRA_MCP_REMOTE_URL", "https://mcp.atlassian.com/v1/sse")
+        self.call_timeout = float(os.getenv("JIRA_MCP_CALL_TIMEOUT", "60"))
+        self.bulk_concurrency = int(os.getenv("JIRA_BULK_CONCURRENCY", "4"))
+        self.max_retries = int(os.getenv("JIRA_RATE_LIMIT_RETRIES", "5"))
+        self.retry_base_delay = float(os.getenv("JIRA_RATE_LIMIT_BASE_DELAY", "1"))
+        self.retry_max_delay = float(os.getenv("JIRA_RATE_LIMIT_MAX_DELAY", "30"))
+        self.health_interval = float(os.getenv("JIRA_MCP_HEALTH_INTERVAL", "30"))
+        self.reconnect_min_delay = float(os.getenv("JIRA_MCP_RECONNECT_MIN_DELAY", "2"))
+        self.reconnect_max_delay = float(os.getenv("JIRA_MCP_RECONNECT_MAX_DELAY", "60"))
+        self.client: Optional[MCPClient] = None
+        self.session = None
+        self._lock = asyncio.Lock()
+        self._supervisor: Optional[asyncio.Task] = None
+        self._wake = asyncio.Event()
+        self._connected = asyncio.Event()
+        self.connect_wait = float(os.getenv("JIRA_MCP_CONNECT_WAIT", "15"))
+        self.state = "disconnected"
+        self.last_error: Optional[str] = None
+        self.connected_since: Optional[float] = None
+        self.last_check: Optional[float] = None
+        self.connects = 0
+        self.failed_connects = 0
+
+    def client_config(self) -> Dict[str, Any]:
+        """mcp-remote proxy configuration for the Atlassian Remote MCP Server"""
+        return {
+            "mcpServers": {
+                "atlassian": {
+                    "command": "npx",
+                    "args": ["-y", "mcp-remote", self.remote_url],
+                    "env": {
+                        "NODE_OPTIONS": "--no-warnings"
+                    }
+                }
+            }
+        }
+
+    @property
+    def connected(self) -> bool:
+        return self.session is not None
+
+    async def get_session(self):
+        """
+        The connected session
+
+        Without a supervisor mcp-remote is started on first use. With one,
+        callers wait up to JIRA_MCP_CONNECT_WAIT seconds for its reconnect
+        instead of each starting their own process.
+        """
+        if self._supervisor is not None:
+            if self.session is None:
+                self._wake.set()
+                try:
+                    await asyncio.wait_for(self._connected.wait(), timeout=self.connect_wait)
+                except asyncio.TimeoutError:
+                    raise ConnectionError(f"Jira MCP is not connected ({self.last_error or self.state})")
+            if self.session is not None:
+                return self.session
+        return await self._connect()
+
+    async def _connect(self):
+        async with self._lock:
+            if self.session is None:
+                print(f"[JIRA] Connecting to {self.remote_url} via mcp-remote...")
+                self.state = "connecting"
+                client = MCPClient(self.client_config())
+                try:
+                    self.session = await client.create_session("atlassian")
+                except Exception as e:
+                    self.state = "disconnected"
+                    self.last_error = str(e)
+                    self.failed_connects += 1
+                    await client.close_all_sessions()
+                    raise
+                self.client = client
+                self.state = "connected"
+                self.last_error = None
+                self.connected_since = time.time()
+                self.connects += 1
+                self._connected.set()
+                print("[JIRA] Atlassian MCP session connected")
+            return self.session
+
+    async def list_tools(self) -> List[Any]:
+        """Raw tool list of the connected server (use tools() for the cached catalog)"""
+        session = await self.get_session()
+        return await session.connector.list_tools()
+
+    async def tools(self) -> Dict[str, ToolSpec]:
+        """Cached tool specs of the connected server by name"""
+        return await get_tool_catalog().get(JIRA_SERVER, self.list_tools)
+
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        """
+        Call a Jira MCP tool
+
+        Arguments are checked against the tool's cached schema first
+        (ToolArgumentsError, no network hop); raises JiraToolError when the
+        server rejects the call.
+        """
+        spec = (await self.tools()).get(name)
+        if spec is not None:
+            spec.validate(arguments)
+        session = await self.get_session()
+        try:
+            result = await asyncio.wait_for(session.connector.call_tool(name, arguments), timeout=self.call_timeout)
+        except (asyncio.TimeoutError, ConnectionError, OSError) as e:
+            # The proxy process or its transport is gone; have the supervisor reconnect
+            await self.reset(str(e))
+            raise ConnectionError(f"Jira MCP call {name} failed: {e}") from e
+        if tool_result_is_error(result):
+            raise JiraToolError(f"{name} failed: {tool_result_text(result)[:500]}")
+        return result
+
+    async def create_issue(
+        self,
+        project: str,
+        summary: str,
+        description: str,
+        issue_type: str,
+        priority: Optional[str] = None,
+        parent: Optional[str] = None
+    ) -> Dict[str, str]:
+        """Create an issue with a direct createJiraIssue call; returns its key and URL"""
+        tool = (await self.tools()).get(CREATE_ISSUE_TOOL)
+        if tool is None:
+            raise JiraToolError(f"The Jira MCP server does not provide {CREATE_ISSUE_TOOL}")
+        site = get_jira_site()
+        arguments = build_issue_arguments(
+            tool.input_schema, site, project, summary, description, issue_type, priority, parent
+        )
+        result = await self.call_tool(CREATE_ISSUE_TOOL, arguments)
+        return parse_created_issue(result, site)
+
+    async def create_issue_with_retry(self, **fields) -> Dict[str, Any]:
+        """create_issue, retried with exponential backoff and jitter while Jira rate-limits us"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                issue = await self.create_issue(**fields)
+                issue["attempts"] = attempt + 1
+                return issue
+            except JiraToolError as e:
+                if not is_rate_limited(e) or attempt == self.max_retries:
+                    raise
+                delay = random.uniform(0.5, 1.0) * min(self.retry_max_delay, self.retry_base_delay * 2 ** attempt)
+                print(f"[JIRA] Rate limited, retrying '{fields.get('summary', '')[:40]}' in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    async def create_issues(self, items: List[Dict[str, Any]], concurrency: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        Create many issues, parents before children, at most `concurrency` at a time
+
+        Each item has a unique ref, the create_issue fields and optionally a
+        parent_ref (another item) or parent_key (an existing issue); call
+        check_issue_links first. Returns a result per ref: created (with key
+        and URL), failed (with the error) or skipped (its parent failed).
+        """
+        semaphore = asyncio.Semaphore(max(1, concurrency or self.bulk_concurrency))
+        created: Dict[str, asyncio.Future] = {item["ref"]: asyncio.get_running_loop().create_future() for item in items}
+        results: Dict[str, Dict[str, Any]] = {}
+
+        async def create(item: Dict[str, Any]):
+            ref = item["ref"]
+            parent_key = item.get("parent_key")
+            try:
+                if item.get("parent_ref"):
+                    parent = await created[item["parent_ref"]]
+                    if parent is None:
+                        results[ref] = {"status": "skipped", "error": f"Parent {item['parent_ref']} was not created"}
+                        return
+                    parent_key = parent
+                async with semaphore:
+                    issue = await self.create_issue_with_retry(
+                        project=item["project"],
+                        summary=item["summary"],
+                        description=item.get("description", ""),
+                        issue_type=item["issue_type"],
+                        priority=item.get("priority"),
+                        parent=parent_key
+                    )
+                results[ref] = {"status": "created", "parent_key": parent_key, **issue}
+            except Exception as e:
+                results[ref] = {"status": "failed", "parent_key": parent_key, "error": str(e)}
+            finally:
+                if not created[ref].done():
+                    created[ref].set_result(results.get(ref, {}).get("key"))
+
+        await asyncio.gather(*(create(item) for item in items))
+        return {item["ref"]: results[item["ref"]] for item in items}
+
+    async def ping(self) -> bool:
+        """Round-trip to the Atlassian MCP server over the existing session"""
+        session = self.session
+        if session is None:
+            return False
+        try:
+            client_session = getattr(session.connector, "client_session", None)
+            if client_session is not None and hasattr(client_session, "send_ping"):
+                await asyncio.wait_for(client_session.send_ping(), timeout=self.call_timeout)
+            else:
+                await asyncio.wait_for(session.connector.list_tools(), timeout=self.call_timeout)
+            return True
+        except Exception as e:
+            self.last_error = f"Ping failed: {e}"
+            return False
+
+    def start(self):
+        """Start the supervisor that keeps the session connected (idempotent)"""
+        if self._supervisor is None:
+            self._supervisor = asyncio.create_task(self._supervise())
+
+    async def _supervise(self):
+        delay = self.reconnect_min_delay
+        while True:
+            self._wake.clear()
+            if self.session is None:
+                try:
+                    await self._connect()
+                    delay = self.reconnect_min_delay
+                except Exception as e:
+                    # Back off without waking early, so callers waiting for a connection cannot force a retry storm
+                    print(f"[JIRA] Atlassian MCP connection failed, retrying in {delay:.0f}s: {e}")
+                    await asyncio.sleep(delay)
+                    delay = min(delay * 2, self.reconnect_max_delay)
+                    continue
+            else:
+                self.last_check = time.time()
+                if not await self.ping():
+                    print(f"[JIRA] Atlassian MCP session is unhealthy, reconnecting: {self.last_error}")
+                    await self.reset(self.last_error)
+                    continue
+            await self._sleep(self.health_interval)
+
+    async def _sleep(self, seconds: float):
+        """Sleep until the next check, or until a failed call asks for a reconnect"""
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    def status(self) -> Dict[str, Any]:
+        """Cached connection status (no network round-trip)"""
+        tools = get_tool_catalog().cached(JIRA_SERVER)
+        return {
+            "state": self.state,
+            "connected": self.connected,
+            "remote_url": self.remote_url,
+            "connected_since": self.connected_since,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "connects": self.connects,
+            "failed_connects": self.failed_connects,
+            "supervised": self._supervisor is not None,
+            "tool_names": sorted(tools) if tools is not None else None
+        }
+
+    async def reset(self, error: Optional[str] = None):
+        """Drop the session; the supervisor (or the next call) reconnects"""
+        async with self._lock:
+            client, self.client, self.session = self.client, None, None
+            # A new session may come with a different tool set
+            get_tool_catalog().invalidate(JIRA_SERVER)
+            self.state = "disconnected"
+            self.connected_since = None
+            self._connected.clear()
+            if error:
+                self.last_error = error
+        self._wake.set()
+        if client is not None:
+            try:
+                await client.close_all_sessions()
+            except Exception as e:
+                print(f"[JIRA] Error closing Atlassian MCP session: {e}")
+
+    async def close(self):
+        """Stop the supervisor and close the session"""
+        if self._supervisor is not None:
+            self._supervisor.cancel()
+            try:
+                await self._supervisor
+            except asyncio.CancelledError:
+                pass
+            self._supervisor = None
+        await self.reset()
+
+# Global connection instance
+_jira_connection = None
+
+def get_jira_connection() -> JiraMCPConnection:
+    """Get or create the global JiraMCPConnection instance"""
+    global _jira_connection
+    if _jira_connection is None:
+        _jira_connection = JiraMCPConnection()
+    return _jira_connection
@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Job Queue
+
+Runs long test executions in the background so the submitting HTTP request
+returns a job ID immediately instead of holding a connection open for the
+whole browser-agent run.
+
+Jobs wait in a bounded FIFO queue and are picked up by a fixed number of
+worker tasks. Each job keeps an append-only event log that clients can poll
+through the job status or follow live as Server-Sent Events (resuming from
+Last-Event-ID). Queued jobs can be cancelled before they start and running
+jobs are cancelled in place. Finished jobs are kept for a retention window.
+"""
+import asyncio
+import json
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TERMINAL_STATES = {SUCCEEDED, FAILED, CANCELLED}
+
+JobRunner = Callable[["Job"], Awaitable[Dict[str, Any]]]
+
+
+class JobQueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity"""
+
+
+class Job:
+    """A queued or running unit of work plus its event log"""
+
+    def __init__(self, kind: str, runner: JobRunner, params: Optional[Dict[str, Any]] = None):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.runner = runner
+        self.params = params or {}
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.events: List[Dict[str, Any]] = []
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+        # Binary payloads (screenshots) of recent events, kept out of the JSON event log
+        self._attachments: "OrderedDict[int, bytes]" = OrderedDict()
+        self._max_attachments = int(os.getenv("JOB_MAX_ATTACHMENTS", "20"))
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    def emit(self, event_type: str, data: Optional[Dict[str, Any]] = None, attachment: Optional[bytes] = None):
+        """Append an event to the job's log and wake up any streaming clients"""
+        event_id = len(self.events) + 1
+        self.events.append({"id": event_id, "type": event_type, "time": time.time(), "data": data or {}})
+        if attachment is not None:
+            self._attachments[event_id] = attachment
+            while len(self._attachments) > self._max_attachments:
+                self._attachments.popitem(last=False)
+        # Wake everyone waiting on the current event and give later waiters a fresh one
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    def get_attachment(self, event_id: int) -> Optional[bytes]:
+        """Binary payload of an event, if it is still held in memory"""
+        return self._attachments.get(event_id)
+
+    def set_status(self, status: str, error: Optional[str] = None):
+        """Move the job to a new state and record it as an event"""
+        self.status = status
+        self.error = error
+        if status == RUNNING:
+            self.started_at = time.time()
+        elif status in TERMINAL_STATES:
+            self.finished_at = time.time()
+            self._attachments.clear()
+        self.emit("status", {"status": status, "error": error} if error else {"status": status})
+
+    async def stream(self, after: int = 0, heartbeat: Optional[float] = None) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield events after the given event ID, live, until the job finishes
+
+        When heartbeat is set, None is yielded after that many idle seconds so
+        the caller can keep the connection alive.
+        """
+        position = max(0, after)
+        while True:
+            while position < len(self.events):
+                position += 1
+                yield self.events[position - 1]
+            if self.done:
+                return
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout=heartbeat)
+            except asyncio.TimeoutError:
+                yield None
+
+    def to_dict(self, include_events: bool = False) -> Dict[str, Any]:
+        """Serialize the job for the status endpoints"""
+        data = {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": round((self.started_at or self.finished_at or time.time()) - self.created_at, 3),
+            "run_seconds": round((self.finished_at or time.time()) - self.started_at, 3) if self.started_at else None,
+            "event_count": len(self.events),
+            "result": self.result,
+            "error": self.error
+        }
+        if include_events:
+            data["events"] = self.events
+        return data
+
+
+class JobQueue:
+    """Bounded FIFO of jobs served by a fixed pool of worker tasks"""
+
+    def __init__(self, workers: Optional[int] = None, max_queued: Optional[int] = None, retention: Optional[float] = None):
+        self.worker_count = workers or int(os.getenv("JOB_WORKERS", "4"))
+        self.max_queued = max_queued or int(os.getenv("JOB_QUEUE_MAX_SIZE", "100"))
+        self.retention = retention or float(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._workers: List[asyncio.Task] = []
+        self._stopping = False
+        self.submitted = 0
+        self.rejected = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.started = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    @property
+    def running(self) -> int:
+        return sum(1 for job in self._jobs.values() if job.status == RUNNING)
+
+    def start(self):
+        """Start the worker tasks (idempotent)"""
+        if self._workers:
+            return
+        self._stopping = False
+        self._workers = [asyncio.create_task(self._worker(index)) for index in range(self.worker_count)]
+        print(f"[JOBS] Job queue started ({self.worker_count} workers, max {self.max_queued} queued)")
+
+    async def stop(self):
+        """Cancel running jobs and stop the workers"""
+        self._stopping = True
+        for job in self._jobs.values():
+            if not job.done and job.task is not None:
+                job.task.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        print("[JOBS] Job queue stopped")
+
+    def submit(self, kind: str, runner: JobRunner, params: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue a job; raises JobQueueFullError when the queue is at capacity"""
+        self._prune()
+        if self.queue_depth >= self.max_queued:
+            self.rejected += 1
+            raise JobQueueFullError(f"Job queue is full ({self.max_queued} jobs waiting)")
+
+        job = Job(kind, runner, params)
+        self._jobs[job.job_id] = job
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        job.emit("status", {"status": QUEUED, "position": self.queue_depth})
+        print(f"[JOBS] Queued {kind} job {job.job_id[:8]} (queue depth {self.queue_depth})")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent jobs first"""
+        jobs = [job for job in reversed(self._jobs.values()) if status is None or job.status == status]
+        return [job.to_dict() for job in jobs[:limit]]
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued or running job; returns None for unknown jobs"""
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        if job.status == QUEUED:
+            # Workers skip jobs that were cancelled while waiting
+            self.cancelled += 1
+            job.set_status(CANCELLED)
+        elif job.task is not None:
+            job.task.cancel()
+        return job
+
+    async def _worker(self, index: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if job.status != QUEUED:
+                    continue
+                wait_time = time.time() - job.created_at
+                self.total_wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+                self.started += 1
+                job.set_status(RUNNING)
+                job.task = asyncio.create_task(job.runner(job))
+                try:
+                    job.result = await job.task
+                    self.succeeded += 1
+                    job.set_status(SUCCEEDED)
+                except asyncio.CancelledError:
+                    self.cancelled += 1
+                    job.set_status(CANCELLED)
+                    if self._stopping or asyncio.current_task().cancelling():
+                        # The worker itself is being stopped (the job task is cancelled along with it)
+                        raise
+                except Exception as e:
+                    self.failed += 1
+                    job.set_status(FAILED, str(e))
+                print(f"[JOBS] Worker {index} finished job {job.job_id[:8]}: {job.status}")
+            finally:
+                self._queue.task_done()
+
+    def _prune(self):
+        """Forget finished jobs older than the retention window"""
+        cutoff = time.time() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, wait times and outcome counters"""
+        return {
+            "workers": self.worker_count,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_seconds": round(self.total_wait_time / self.started, 3) if self.started else 0.0,
+            "max_wait_seconds": round(self.max_wait_time, 3),
+            "oldest_queued_seconds": round(max(
+                (time.time() - job.created_at for job in self._jobs.values() if job.status == QUEUED), default=0.0
+            ), 3)
+        }
+
+
+def format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Encode a job event as a Server-Sent Events message (None becomes a keep-alive comment)"""
+    if event is None:
+        return ": keep-alive\n\n"
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+# Global queue instance
+_job_queue = None
+
+def get_job_queue() -> JobQueue:
+    """Get or create the global JobQueue instance"""
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+"""
+LLM Response Cache
+
+Content-addressed cache of provider responses for the generation endpoints
+(/generate-design-code, /generate-code, /review-code, /reverse-engineer-*),
+so regenerating the same design or code from the same prompt and image does
+not go back to the provider.
+
+The key is a SHA-256 over the provider, the call (SDK function or LangChain
+model with its model name and sampling parameters), the normalized prompt
+text, the hashes of any images and the remaining generation arguments.
+Entries live in a memory LRU tier backed by an on-disk tier with size-based
+LRU eviction; each endpoint has its own TTL. Clients can skip the cache with
+"X-LLM-Cache: bypass" / "Cache-Control: no-cache" (read skipped, the fresh
+result is stored) or "Cache-Control: no-store" (neither read nor stored).
+"""
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+DEFAULT_CACHED_ENDPOINTS = "/generate-design-code,/generate-code,/review-code,/reverse-engineer-design,/reverse-engineer-code"
+
+# Attributes of a LangChain chat model that change what it generates
+MODEL_PARAMETERS = ("model", "model_name", "temperature", "max_tokens", "max_output_tokens", "top_p", "top_k", "reasoning_effort")
+
+# Strings longer than this under an image-like key (or data: URLs) are hashed instead of keyed verbatim
+IMAGE_KEY_HINTS = ("image", "data")
+
+
+def normalize_prompt(text: str) -> str:
+    """Prompt text with line endings and surrounding/trailing whitespace normalized"""
+    lines = text.replace("\r\n", "\n").strip().split("\n")
+    return "\n".join(line.rstrip() for line in lines)
+
+
+def _hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+def _normalize(value: Any, key: str = "") -> Any:
+    """JSON-able, key-stable form of a call argument, with images replaced by their hashes"""
+    if isinstance(value, BaseMessage):
+        return {"role": value.type, "content": _normalize(value.content)}
+    if isinstance(value, dict):
+        return {str(name): _normalize(item, str(name)) for name, item in sorted(value.items(), key=lambda pair: str(pair[0]))}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item, key) for item in value]
+    if isinstance(value, str):
+        if value.startswith("data:") and ";base64," in value:
+            return f"image-sha256:{_hash_text(value.split(';base64,', 1)[1])}"
+        if any(hint in key.lower() for hint in IMAGE_KEY_HINTS) and len(value) > 256:
+            return f"image-sha256:{_hash_text(value)}"
+        return normalize_prompt(value)
+    if value is None or isinstance(value, (int, float, bool)):
+        return value
+    return repr(value)
+
+
+def describe_call(call: Callable[..., Any]) -> Dict[str, Any]:
+    """Identity of the function or bound model method being called"""
+    owner = getattr(call, "__self__", None)
+    description = {"call": f"{getattr(call, '__module__', '')}.{getattr(call, '__qualname__', repr(call))}"}
+    if owner is not None:
+        for name in MODEL_PARAMETERS:
+            value = getattr(owner, name, None)
+            if isinstance(value, (str, int, float, bool)):
+                description[name] = value
+    return description
+
+
+def compute_cache_key(provider: str, call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """Content address of a provider call"""
+    material = {
+        "provider": (provider or "").lower(),
+        **describe_call(call),
+        "args": _normalize(list(args)),
+        "kwargs": _normalize(kwargs)
+    }
+    return hashlib.sha256(json.dumps(material, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def _result_text(result: Any) -> str:
+    if isinstance(result, tuple) and len(result) == 3:
+        return str(result[1] or "")
+    content = getattr(result, "content", None)
+    return content if isinstance(content, str) else ""
+
+
+def reported_tokens(result: Any) -> int:
+    """Total tokens the provider reported for a call, or 0 if it reported none"""
+    if isinstance(result, tuple) and len(result) == 3 and isinstance(result[2], dict):
+        usage = result[2].get("usage") or {}
+        if usage.get("total_tokens"):
+            return int(usage["total_tokens"])
+    usage = getattr(result, "usage_metadata", None)
+    if usage and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+    return 0
+
+
+def result_tokens(result: Any, prompt_chars: int = 0) -> int:
+    """Tokens a provider call used (reported usage, else estimated at ~4 chars per token)"""
+    return reported_tokens(result) or (prompt_chars + len(_result_text(result))) // 4
+
+
+def serialize_result(result: Any) -> Optional[Dict[str, Any]]:
+    """JSON form of a successful provider result, or None if it should not be cached"""
+    if isinstance(result, tuple) and len(result) == 3:
+        success, content, metadata = result
+        if not success or not content:
+            return None
+        return {"type": "sdk", "content": content, "metadata": metadata if isinstance(metadata, dict) else {}}
+    if isinstance(result, AIMessage) and isinstance(result.content, str) and result.content:
+        return {"type": "message", "content": result.content, "usage_metadata": result.usage_metadata}
+    return None
+
+
+def deserialize_result(data: Dict[str, Any]) -> Any:
+    """Rebuild the provider result handlers expect from its cached form"""
+    if data["type"] == "sdk":
+        return True, data["content"], {**data["metadata"], "cached": True}
+    return AIMessage(content=data["content"], usage_metadata=data.get("usage_metadata"), response_metadata={"cached": True})
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU + disk) cache of generation results"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.enabled = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+        self.directory = directory or os.getenv("LLM_CACHE_DIR", "./llm_cache")
+        self.memory_entries = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "256"))
+        self.disk_max_bytes = int(float(os.getenv("LLM_CACHE_DISK_MAX_MB", "256")) * 1024 * 1024)
+        self.default_ttl = float(os.getenv("LLM_CACHE_TTL", "86400"))
+        self.min_content_chars = int(os.getenv("LLM_CACHE_MIN_CONTENT_CHARS", "200"))
+        self.endpoints = {path.strip() for path in os.getenv("LLM_CACHE_ENDPOINTS", DEFAULT_CACHED_ENDPOINTS).split(",") if path.strip()}
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._disk_bytes: Optional[int] = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.bypassed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.evictions = 0
+        self.saved_tokens = 0
+        self.per_endpoint: Dict[str, Dict[str, int]] = {}
+
+    def ttl_for(self, endpoint: str) -> float:
+        """TTL for an endpoint: LLM_CACHE_TTL_<ENDPOINT> (e.g. LLM_CACHE_TTL_REVIEW_CODE), else LLM_CACHE_TTL"""
+        name = endpoint.strip("/").replace("-", "_").replace("/", "_").upper()
+        return float(os.getenv(f"LLM_CACHE_TTL_{name}", str(self.default_ttl)))
+
+    def policy(self, http_request: Any) -> Tuple[Optional[str], bool, bool]:
+        """(endpoint, read, write) for a request; endpoint is None when the request is not cacheable"""
+        if not self.enabled or http_request is None:
+            return None, False, False
+        endpoint = http_request.url.path
+        if endpoint not in self.endpoints or self.ttl_for(endpoint) <= 0:
+            return None, False, False
+        cache_control = (http_request.headers.get("cache-control") or "").lower()
+        if "no-store" in cache_control:
+            self.bypassed += 1
+            return endpoint, False, False
+        if "no-cache" in cache_control or (http_request.headers.get("x-llm-cache") or "").lower() == "bypass":
+            self.bypassed += 1
+            return endpoint, False, True
+        return endpoint, True, True
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _count(self, endpoint: str, outcome: str):
+        counters = self.per_endpoint.setdefault(endpoint, {"hits": 0, "misses": 0, "stores": 0})
+        counters[outcome] += 1
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # Touch for LRU eviction
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _disk_size(self) -> int:
+        total = 0
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+        return total
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        previous = os.path.getsize(path) if os.path.exists(path) else 0
+        os.replace(temp_path, path)
+        if self._disk_bytes is None:
+            self._disk_bytes = self._disk_size()
+        else:
+            self._disk_bytes += len(data) - previous
+        if self._disk_bytes > self.disk_max_bytes:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Delete least recently used files until the disk tier is at 90% of its limit"""
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                    files.append((stat.st_mtime, stat.st_size, path))
+                except OSError:
+                    pass
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        target = self.disk_max_bytes * 0.9
+        for _, size, path in files:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self.evictions += 1
+            except OSError:
+                pass
+        self._disk_bytes = total
+
+    async def get(self, key: str, endpoint: str) -> Optional[Any]:
+        """Cached result for a key, or None on a miss or expired entry"""
+        entry = self._memory.get(key)
+        tier = "memory"
+        if entry is None:
+            entry = await asyncio.to_thread(self._read_disk, key)
+            tier = "disk"
+        if entry is not None and entry["expires_at"] < time.time():
+            self.expired += 1
+            self._memory.pop(key, None)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            self._count(endpoint, "misses")
+            return None
+
+        self._remember(key, entry)
+        if tier == "memory":
+            self.memory_hits += 1
+        else:
+            self.disk_hits += 1
+        self.saved_tokens += entry.get("tokens", 0)
+        self._count(endpoint, "hits")
+        print(f"[LLM-CACHE] {tier} hit for {endpoint} ({key[:12]}, ~{entry.get('tokens', 0)} tokens saved)")
+        return deserialize_result(entry["result"])
+
+    async def put(self, key: str, endpoint: str, result: Any, prompt_chars: int = 0, validate: Optional[Callable[[str], bool]] = None):
+        """
+        Store a successful result under the endpoint's TTL
+
+        validate, if given, receives the result text; results it rejects
+        (output the handler will refuse) are not stored.
+        """
+        data = serialize_result(result)
+        if data is None or len(data["content"]) < self.min_content_chars:
+            return
+        if validate is not None and not validate(data["content"]):
+            self.rejected += 1
+            print(f"[LLM-CACHE] Not caching {endpoint} result {key[:12]}: failed validation")
+            return
+        now = time.time()
+        entry = {
+            "key": key,
+            "endpoint": endpoint,
+            "stored_at": now,
+            "expires_at": now + self.ttl_for(endpoint),
+            "tokens": result_tokens(result, prompt_chars),
+            "result": data
+        }
+        self._remember(key, entry)
+        try:
+            await asyncio.to_thread(self._write_disk, key, entry)
+        except OSError as e:
+            print(f"[LLM-CACHE] Could not write cache entry {key[:12]}: {e}")
+        self.stores += 1
+        self._count(endpoint, "stores")
+
+    def clear(self) -> int:
+        """Drop every entry from both tiers; returns the number of files removed"""
+        self._memory.clear()
+        removed = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                try:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+                except OSError:
+                    pass
+        self._disk_bytes = 0
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and the tokens the cache saved"""
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "enabled": self.enabled,
+            "endpoints": sorted(self.endpoints),
+            "memory_entries": len(self._memory),
+            "memory_max_entries": self.memory_entries,
+            "disk_bytes": self._disk_bytes,
+            "disk_max_bytes": self.disk_max_bytes,
+            "hits": hits,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / (hits + self.misses), 3) if hits + self.misses else 0.0,
+            "stores": self.stores,
+            "bypassed": self.bypassed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "evictions": self.evictions,
+            "saved_tokens": self.saved_tokens,
+            "per_endpoint": self.per_endpoint
+        }
+
+
+def prompt_chars(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> int:
+    """Rough size of the text sent in a call, for token estimates"""
+    total = 0
+    for value in list(args) + list(kwargs.values()):
+        if isinstance(value, str) and not value.startswith("data:"):
+            total += len(value) if len(value) < 100000 else 0
+        elif isinstance(value, BaseMessage) and isinstance(value.content, str):
+            total += len(value.content)
+        elif isinstance(value, list):
+            total += prompt_chars(tuple(value), {})
+        elif isinstance(value, dict):
+            total += prompt_chars((), {k: v for k, v in value.items() if "image" not in str(k)})
+    return total
+
+# Global cache instance
+_llm_response_cache = None
+
+def get_llm_response_cache() -> LLMResponseCache:
+    """Get or create the global LLMResponseCache instance"""
+    global _llm_response_cache
+    if _llm_response_cache is None:
+        _llm_response_cache = LLMResponseCache()
+    return _llm_response_cache
@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+LLM Circuit Breakers
+
+One circuit breaker per provider/model, so a degraded model fails fast (or
+is swapped for an equivalent one) instead of making every request wait out
+its full timeout.
+
+A breaker watches the outcomes of its model's calls over a sliding window
+and opens when the error rate or the share of slow calls crosses its
+threshold. While it is open, calls fail over to the equivalent model
+configured in LLM_FAILOVER (e.g. google/gemini-2.5-pro=openai/gpt-4o), or
+fail immediately when none is configured. After a cool-down the breaker
+lets a few probe calls through (half-open) and closes again once they
+succeed.
+
+Failover translates the call for the other provider: LangChain chat models
+are swapped for the pooled client of the target model, and the official
+SDK helpers for their counterpart on the other SDK.
+"""
+import asyncio
+import importlib
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from llm_rate_limiter import RateLimitTimeoutError, call_model, rate_limit_error
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+DEFAULT_FAILOVER = "google/gemini-2.5-pro=openai/gpt-4o,google/gemini-2.5-flash=openai/gpt-4o-mini,openai/*=google/gemini-2.5-pro"
+
+# Official SDK helpers by (provider, kind), imported lazily on failover
+SDK_FUNCTIONS = {
+    ("google", "text"): ("official_gemini_service", "agenerate_text_with_official_gemini"),
+    ("google", "multimodal"): ("official_gemini_service", "agenerate_multimodal_with_official_gemini"),
+    ("openai", "text"): ("official_openai_service", "agenerate_text_with_official_openai"),
+    ("openai", "multimodal"): ("official_openai_service", "agenerate_multimodal_with_official_openai")
+}
+
+# Arguments every SDK helper of a kind understands; the rest are provider specific
+PORTABLE_ARGUMENTS = {
+    "text": ("prompt",),
+    "multimodal": ("text_prompt", "image_base64", "image_mime_type")
+}
+
+# send(provider, call, args, kwargs) performs the provider call
+SendFunction = Callable[[str, Callable[..., Any], Tuple[Any, ...], Dict[str, Any]], Awaitable[Any]]
+
+
+class CircuitOpenError(Exception):
+    """Raised when a provider/model's breaker is open and no failover model could take the call"""
+
+
+def get_configured_failover() -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """Parse LLM_FAILOVER ("provider/model=provider/model,...", source model "*" for the provider default)"""
+    failover = {}
+    for entry in os.getenv("LLM_FAILOVER", DEFAULT_FAILOVER).split(","):
+        entry = entry.strip()
+        if "=" not in entry:
+            continue
+        source, target = (part.strip() for part in entry.split("=", 1))
+        source_provider, _, source_model = source.partition("/")
+        target_provider, _, target_model = target.partition("/")
+        if source_provider and target_provider and target_model:
+            failover[(source_provider.lower(), source_model or "*")] = (target_provider.lower(), target_model)
+    return failover
+
+
+def translate_call(call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any], provider: str, model: str) -> Optional[Tuple[Callable[..., Any], Tuple[Any, ...], Dict[str, Any]]]:
+    """The same request addressed to another provider/model, or None if it cannot be translated"""
+    owner = getattr(call, "__self__", None)
+    if owner is not None and hasattr(owner, "ainvoke"):
+        from llm_client_pool import get_pooled_llm
+        temperature = getattr(owner, "temperature", None)
+        llm = get_pooled_llm(provider, model, temperature if isinstance(temperature, (int, float)) else None)
+        return getattr(llm, call.__name__), args, kwargs
+
+    for (_, kind), (_, function_name) in SDK_FUNCTIONS.items():
+        if getattr(call, "__name__", None) != function_name or args:
+            continue
+        target = SDK_FUNCTIONS.get((provider, kind))
+        if target is None:
+            return None
+        module = importlib.import_module(target[0])
+        translated = {name: kwargs[name] for name in PORTABLE_ARGUMENTS[kind] if name in kwargs}
+        system_prompt = kwargs.get("system_prompt")
+        prompt_key = PORTABLE_ARGUMENTS[kind][0]
+        if system_prompt and provider == "google":
+            translated[prompt_key] = f"{system_prompt}\n\n{translated.get(prompt_key, '')}"
+        elif system_prompt:
+            translated["system_prompt"] = system_prompt
+        if provider == "google" and "disable_thinking" in kwargs:
+            translated["disable_thinking"] = kwargs["disable_thinking"]
+        translated["model"] = model
+        return getattr(module, target[1]), (), translated
+    return None
+
+
+def call_failed(result: Any = None, error: Optional[BaseException] = None) -> Optional[bool]:
+    """Whether a call counts as a failure; None when it says nothing about the model's health"""
+    if isinstance(error, (RateLimitTimeoutError, asyncio.CancelledError)) or rate_limit_error(result, error):
+        return None
+    if error is not None:
+        return True
+    return isinstance(result, tuple) and len(result) == 3 and not result[0]
+
+
+class CircuitBreaker:
+    """Sliding-window error/latency breaker for one provider/model"""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.window = float(os.getenv("LLM_BREAKER_WINDOW", "60"))
+        self.min_calls = int(os.getenv("LLM_BREAKER_MIN_CALLS", "5"))
+        self.error_rate = float(os.getenv("LLM_BREAKER_ERROR_RATE", "0.5"))
+        self.slow_seconds = float(os.getenv("LLM_BREAKER_SLOW_SECONDS", "60"))
+        self.slow_rate = float(os.getenv("LLM_BREAKER_SLOW_RATE", "0.8"))
+        self.open_seconds = float(os.getenv("LLM_BREAKER_OPEN_SECONDS", "30"))
+        self.half_open_probes = int(os.getenv("LLM_BREAKER_HALF_OPEN_PROBES", "1"))
+        self.state = CLOSED
+        self.opened_at: Optional[float] = None
+        self.probes_in_flight = 0
+        self._outcomes: Deque[Tuple[float, bool, bool]] = deque()
+        self.times_opened = 0
+        self.rejected = 0
+        self.failovers = 0
+        self.last_error: Optional[str] = None
+
+    def _prune(self, now: float):
+        while self._outcomes and now - self._outcomes[0][0] > self.window:
+            self._outcomes.popleft()
+
+    def _open(self, reason: str):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.times_opened += 1
+        self._outcomes.clear()
+        print(f"[BREAKER] {self.provider}/{self.model} circuit opened: {reason}")
+
+    def allow(self) -> Optional[str]:
+        """'closed' or 'probe' if a call may go through, None if the circuit is open"""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+            self.state = HALF_OPEN
+            self.probes_in_flight = 0
+            print(f"[BREAKER] {self.provider}/{self.model} circuit half-open, probing")
+        if self.state == CLOSED:
+            return CLOSED
+        if self.state == HALF_OPEN and self.probes_in_flight < self.half_open_probes:
+            self.probes_in_flight += 1
+            return "probe"
+        self.rejected += 1
+        return None
+
+    def record(self, mode: str, failed: Optional[bool], latency: float, error: Optional[str] = None):
+        """Record a call's outcome (failed=None releases a probe without judging the model)"""
+        if mode == "probe":
+            self.probes_in_flight -= 1
+        if failed is None:
+            return
+        if failed:
+            self.last_error = error
+        slow = latency > self.slow_seconds
+        if mode == "probe":
+            if self.state != HALF_OPEN:
+                return
+            if failed or slow:
+                self._open(f"probe {'failed' if failed else f'took {latency:.0f}s'}")
+            else:
+                self.state = CLOSED
+                self.opened_at = None
+                print(f"[BREAKER] {self.provider}/{self.model} circuit closed, probe succeeded")
+            return
+        if self.state != CLOSED:
+            return
+
+        now = time.monotonic()
+        self._outcomes.append((now, failed, slow))
+        self._prune(now)
+        calls = len(self._outcomes)
+        if calls < self.min_calls:
+            return
+        failures = sum(1 for _, outcome_failed, _ in self._outcomes if outcome_failed)
+        slow_calls = sum(1 for _, _, outcome_slow in self._outcomes if outcome_slow)
+        if failures / calls >= self.error_rate:
+            self._open(f"{failures} of the last {calls} calls failed")
+        elif slow_calls / calls >= self.slow_rate:
+            self._open(f"{slow_calls} of the last {calls} calls took over {self.slow_seconds:.0f}s")
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        self._prune(now)
+        calls = len(self._outcomes)
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "state": self.state,
+            "window_calls": calls,
+            "window_error_rate": round(sum(1 for _, failed, _ in self._outcomes if failed) / calls, 3) if calls else 0.0,
+            "window_slow_rate": round(sum(1 for _, _, slow in self._outcomes if slow) / calls, 3) if calls else 0.0,
+            "open_for_seconds": round(now - self.opened_at, 1) if self.opened_at else None,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+            "failovers": self.failovers,
+            "last_error": self.last_error
+        }
+
+
+class CircuitBreakers:
+    """Breakers for every provider/model seen, plus the failover routing between them"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_BREAKER_ENABLED", "true").lower() == "true"
+        self.failover = get_configured_failover()
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+    def get_breaker(self, provider: str, model: str) -> CircuitBreaker:
+        provider = (provider or "default").lower()
+        breaker = self._breakers.get((provider, model))
+        if breaker is None:
+            breaker = CircuitBreaker(provider, model)
+            self._breakers[(provider, model)] = breaker
+        return breaker
+
+    def failover_target(self, provider: str, model: str) -> Optional[Tuple[str, str]]:
+        provider = (provider or "default").lower()
+        return self.failover.get((provider, model)) or self.failover.get((provider, "*"))
+
+    async def call(self, provider: str, call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any], send: SendFunction, allow_failover: bool = True) -> Tuple[Any, str, str]:
+        """
+        Send a call through its provider/model's breaker
+
+        Returns:
+            (result, provider, model) of the model that actually served the call
+        """
+        model = call_model(call, kwargs)
+        if not self.enabled:
+            return await send(provider, call, args, kwargs), provider, model
+
+        breaker = self.get_breaker(provider, model)
+        mode = breaker.allow()
+        if mode is None:
+            return await self._failover(breaker, call, args, kwargs, send, allow_failover, "circuit is open")
+
+        started_at = time.monotonic()
+        try:
+            result = await send(provider, call, args, kwargs)
+        except BaseException as e:
+            breaker.record(mode, call_failed(error=e), time.monotonic() - started_at, str(e)[:300])
+            if breaker.state == OPEN and allow_failover and isinstance(e, Exception) and self.failover_target(breaker.provider, model):
+                return await self._failover(breaker, call, args, kwargs, send, allow_failover, f"call failed: {e}")
+            raise
+        failed = call_failed(result)
+        error = result[2].get("error") if failed and isinstance(result[2], dict) else None
+        breaker.record(mode, failed, time.monotonic() - started_at, str(error)[:300] if failed else None)
+        if failed and breaker.state == OPEN and allow_failover and self.failover_target(breaker.provider, model):
+            return await self._failover(breaker, call, args, kwargs, send, allow_failover, "call failed")
+        return result, provider, model
+
+    async def _failover(self, breaker: CircuitBreaker, call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any], send: SendFunction, allow_failover: bool, reason: str) -> Tuple[Any, str, str]:
+        source = f"{breaker.provider}/{breaker.model}"
+        target = self.failover_target(breaker.provider, breaker.model) if allow_failover else None
+        if target is None:
+            raise CircuitOpenError(f"{source} is unavailable ({reason}) and no failover model is configured")
+        if self.get_breaker(*target).state == OPEN:
+            raise CircuitOpenError(f"{source} is unavailable ({reason}) and its failover {target[0]}/{target[1]} is too")
+        translated = translate_call(call, args, kwargs, *target)
+        if translated is None:
+            raise CircuitOpenError(f"{source} is unavailable ({reason}) and the call cannot be sent to {target[0]}/{target[1]}")
+
+        breaker.failovers += 1
+        print(f"[BREAKER] {source} {reason}, failing over to {target[0]}/{target[1]}")
+        target_call, target_args, target_kwargs = translated
+        return await self.call(target[0], target_call, target_args, target_kwargs, send, allow_failover=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "failover": {f"{source[0]}/{source[1]}": f"{target[0]}/{target[1]}" for source, target in self.failover.items()},
+            "breakers": [breaker.stats() for breaker in self._breakers.values()]
+        }
+
+# Global breakers instance
+_circuit_breakers = None
+
+def get_circuit_breakers() -> CircuitBreakers:
+    """Get or create the global CircuitBreakers instance"""
+    global _circuit_breakers
+    if _circuit_breakers is None:
+        _circuit_breakers = CircuitBreakers()
+    return _circuit_breakers
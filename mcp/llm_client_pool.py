@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+LLM Client Pool
+
+Process-wide pool of LangChain chat model clients keyed by
+(provider, model, temperature), so request handlers reuse an existing client
+instead of constructing a new ChatOpenAI / ChatGoogleGenerativeAI per request.
+
+OpenAI clients share keep-alive httpx connection pools, so repeated requests
+skip the TCP and TLS handshakes. Google and Anthropic clients keep their own
+transport, which is reused along with the pooled client object.
+Clients are evicted least-recently-used once the pool is full and after
+sitting idle longer than the configured TTL.
+"""
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Clients created at startup when LLM_CLIENT_POOL_WARM is not set
+DEFAULT_WARM_TARGETS = "google:gemini-2.5-pro,google:gemini-2.5-flash,openai:gpt-4o"
+
+PoolKey = Tuple[str, str, Optional[float]]
+
+
+class PooledClient:
+    """A pooled chat model plus its usage bookkeeping"""
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+
+
+class LLMClientPool:
+    """Keyed LRU pool of reusable chat model clients"""
+
+    def __init__(self, max_size: Optional[int] = None, idle_ttl: Optional[float] = None):
+        self.max_size = max_size or int(os.getenv("LLM_CLIENT_POOL_MAX_SIZE", "32"))
+        self.idle_ttl = idle_ttl or float(os.getenv("LLM_CLIENT_POOL_IDLE_TTL", "1800"))
+        self._clients: "OrderedDict[PoolKey, PooledClient]" = OrderedDict()
+        self._http_client = None
+        self._http_async_client = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_http_clients(self) -> Tuple[Any, Any]:
+        """Shared keep-alive httpx clients for the OpenAI chat models"""
+        if self._http_client is None:
+            import httpx
+            limits = httpx.Limits(
+                max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+                keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "120"))
+            )
+            timeout = httpx.Timeout(float(os.getenv("LLM_HTTP_TIMEOUT", "600")), connect=10.0)
+            self._http_client = httpx.Client(limits=limits, timeout=timeout)
+            self._http_async_client = httpx.AsyncClient(limits=limits, timeout=timeout)
+        return self._http_client, self._http_async_client
+
+    def _create(self, provider: str, model: str, temperature: Optional[float]) -> Any:
+        """Construct a new chat model for the given key"""
+        kwargs: Dict[str, Any] = {"model": model}
+        if temperature is not None:
+            kwargs["temperature"] = temperature
+
+        if provider == "openai":
+            from langchain_openai import ChatOpenAI
+            http_client, http_async_client = self._get_http_clients()
+            return ChatOpenAI(
+                openai_api_key=os.getenv("OPENAI_API_KEY"),
+                http_client=http_client,
+                http_async_client=http_async_client,
+                **kwargs
+            )
+        elif provider == "anthropic":
+            from langchain_anthropic import ChatAnthropic
+            return ChatAnthropic(**kwargs)
+        elif provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
+            return ChatGoogleGenerativeAI(google_api_key=os.getenv("GOOGLE_API_KEY"), **kwargs)
+        else:
+            raise ValueError(f"Unsupported LLM provider: {provider}")
+
+    def _evict(self):
+        """Drop idle clients, then least-recently-used ones until under max_size"""
+        now = time.time()
+        for key in [key for key, entry in self._clients.items() if now - entry.last_used > self.idle_ttl]:
+            del self._clients[key]
+            self.evictions += 1
+            print(f"[LLM-POOL] Evicted idle client {key}")
+        while len(self._clients) > self.max_size:
+            key, _ = self._clients.popitem(last=False)
+            self.evictions += 1
+            print(f"[LLM-POOL] Evicted least recently used client {key}")
+
+    def get(self, provider: str, model: Optional[str] = None, temperature: Optional[float] = None) -> Any:
+        """
+        Get a pooled chat model, creating it on first use
+
+        Args:
+            provider: 'openai', 'google' or 'anthropic'
+            model: Model name (OpenAI defaults to gpt-4o when empty)
+            temperature: Sampling temperature, or None for the provider default
+
+        Returns:
+            A LangChain chat model
+        """
+        provider = provider.lower()
+        if not model and provider == "openai":
+            model = "gpt-4o"
+        key = (provider, model, temperature)
+
+        entry = self._clients.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._clients.move_to_end(key)
+        else:
+            self.misses += 1
+            entry = PooledClient(self._create(provider, model, temperature))
+            self._clients[key] = entry
+            print(f"[LLM-POOL] Created {provider} client for {model} (temperature={temperature})")
+
+        entry.last_used = time.time()
+        entry.uses += 1
+        self._evict()
+        return entry.client
+
+    def warm(self, targets: Optional[List[Tuple[str, str]]] = None):
+        """Pre-create clients so the first requests do not pay construction cost"""
+        for provider, model in targets if targets is not None else get_configured_warm_targets():
+            try:
+                self.get(provider, model)
+            except Exception as e:
+                print(f"[LLM-POOL] Could not warm {provider}:{model}: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy and hit/miss counters"""
+        now = time.time()
+        return {
+            "size": len(self._clients),
+            "max_size": self.max_size,
+            "idle_ttl_seconds": self.idle_ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "clients": [
+                {
+                    "provider": provider,
+                    "model": model,
+                    "temperature": temperature,
+                    "uses": entry.uses,
+                    "idle_seconds": round(now - entry.last_used, 1)
+                }
+                for (provider, model, temperature), entry in self._clients.items()
+            ]
+        }
+
+    async def aclose(self):
+        """Drop all clients and close the shared HTTP connection pools"""
+        self._clients.clear()
+        if self._http_async_client is not None:
+            await self._http_async_client.aclose()
+        if self._http_client is not None:
+            self._http_client.close()
+        self._http_client = None
+        self._http_async_client = None
+        print("[LLM-POOL] LLM client pool closed")
+
+
+def get_configured_warm_targets() -> List[Tuple[str, str]]:
+    """Parse LLM_CLIENT_POOL_WARM ("provider:model,provider:model") into pairs"""
+    targets = []
+    for item in os.getenv("LLM_CLIENT_POOL_WARM", DEFAULT_WARM_TARGETS).split(","):
+        item = item.strip()
+        if ":" not in item:
+            continue
+        provider, model = item.split(":", 1)
+        targets.append((provider.strip().lower(), model.strip()))
+    return targets
+
+# Global pool instance
+_llm_client_pool = None
+
+def get_llm_client_pool() -> LLMClientPool:
+    """Get or create the global LLMClientPool instance"""
+    global _llm_client_pool
+    if _llm_client_pool is None:
+        _llm_client_pool = LLMClientPool()
+    return _llm_client_pool
+
+def get_pooled_llm(provider: str, model: Optional[str] = None, temperature: Optional[float] = None) -> Any:
+    """Convenience function to get a chat model from the global pool"""
+    return get_llm_client_pool().get(provider, model, temperature)
@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+LLM Call Executor
+
+Shared offload layer for provider calls made from the request handlers.
+
+Every call is admitted through a per-provider lane with its own concurrency
+cap, so a burst of requests against one provider cannot starve the others or
+the rest of the server. Coroutine functions are awaited directly; plain
+(blocking) callables run on the lane's bounded thread pool rather than the
+event loop's shared default executor. Waiting happens on the event loop, so
+queued calls stay cancellable and are dropped when the HTTP client disconnects.
+
+Identical calls (same provider, model, prompt and arguments) that arrive while
+one is already in flight attach to it and share its result or error instead
+of spending a second provider call, and each call waits for its
+provider/model's RPM/TPM allowance (llm_rate_limiter) before it is sent.
+Calls to a model whose circuit breaker is open fail over to its configured
+equivalent (llm_circuit_breaker), and opted-in calls are hedged with a
+backup request when they run slower than usual (llm_hedging).
+"""
+import asyncio
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from llm_cache import compute_cache_key, get_llm_response_cache, prompt_chars
+from llm_rate_limiter import call_model, get_llm_rate_limiter, request_priority
+from llm_circuit_breaker import call_failed, get_circuit_breakers
+from llm_hedging import get_request_hedger
+from llm_latency import get_latency_tracker
+
+# Default number of concurrent calls per provider when no override is configured
+DEFAULT_PROVIDER_CONCURRENCY = 8
+
+
+class ClientDisconnectedError(Exception):
+    """Raised when the HTTP client went away before the provider call finished"""
+
+
+class ProviderLane:
+    """Concurrency-capped execution lane for a single provider"""
+
+    def __init__(self, provider: str, max_concurrency: int):
+        self.provider = provider
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix=f"llm-{provider}")
+        self.waiting = 0
+        self.active = 0
+        self.max_waiting = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.total_run_time = 0.0
+
+    async def submit(self, call: Callable[..., Any], *args, **kwargs) -> Any:
+        """Wait for a slot, then run the call (awaited if async, on the thread pool if not)"""
+        queued_at = time.time()
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        try:
+            await self.semaphore.acquire()
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        finally:
+            self.waiting -= 1
+
+        wait_time = time.time() - queued_at
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.active += 1
+        started_at = time.time()
+        try:
+            if asyncio.iscoroutinefunction(call):
+                result = await call(*args, **kwargs)
+            else:
+                loop = asyncio.get_running_loop()
+                result = await loop.run_in_executor(self.executor, functools.partial(call, *args, **kwargs))
+            self.completed += 1
+            self.total_run_time += time.time() - started_at
+            return result
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        except Exception:
+            self.failed += 1
+            self.total_run_time += time.time() - started_at
+            raise
+        finally:
+            self.active -= 1
+            self.semaphore.release()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth and timing counters for this lane"""
+        finished = self.completed + self.failed
+        return {
+            "provider": self.provider,
+            "max_concurrency": self.max_concurrency,
+            "active": self.active,
+            "queue_depth": self.waiting,
+            "max_queue_depth": self.max_waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "cancelled": self.cancelled,
+            "avg_wait_seconds": round(self.total_wait_time / (finished + self.cancelled), 3) if (finished + self.cancelled) else 0.0,
+            "max_wait_seconds": round(self.max_wait_time, 3),
+            "avg_run_seconds": round(self.total_run_time / finished, 3) if finished else 0.0
+        }
+
+
+class LLMExecutor:
+    """Per-provider lanes plus client-disconnect cancellation"""
+
+    def __init__(self, default_concurrency: Optional[int] = None, disconnect_poll_interval: Optional[float] = None):
+        self.default_concurrency = default_concurrency or int(os.getenv("LLM_CONCURRENCY_DEFAULT", str(DEFAULT_PROVIDER_CONCURRENCY)))
+        self.disconnect_poll_interval = disconnect_poll_interval or float(os.getenv("LLM_DISCONNECT_POLL_INTERVAL", "0.5"))
+        self._lanes: Dict[str, ProviderLane] = {}
+
+    def get_lane(self, provider: str) -> ProviderLane:
+        """Get or create the lane for a provider (cap from LLM_CONCURRENCY_<PROVIDER>)"""
+        provider = (provider or "default").lower()
+        lane = self._lanes.get(provider)
+        if lane is None:
+            max_concurrency = int(os.getenv(f"LLM_CONCURRENCY_{provider.upper()}", str(self.default_concurrency)))
+            lane = ProviderLane(provider, max_concurrency)
+            self._lanes[provider] = lane
+            print(f"[EXECUTOR] Created lane for {provider} (max_concurrency={max_concurrency})")
+        return lane
+
+    async def run(self, provider: str, call: Callable[..., Any], *args, http_request: Any = None, **kwargs) -> Any:
+        """
+        Run a provider call through the provider's lane
+
+        Args:
+            provider: Provider key used to pick the lane (e.g. 'google', 'openai')
+            call: Coroutine function or blocking callable
+            http_request: Optional FastAPI Request; the call is cancelled if its client disconnects
+
+        Returns:
+            Whatever the call returns
+        """
+        work = asyncio.ensure_future(self.get_lane(provider).submit(call, *args, **kwargs))
+        return await self.watch(work, provider, http_request)
+
+    async def watch(self, work: "asyncio.Future[Any]", provider: str, http_request: Any = None) -> Any:
+        """Await work on behalf of an HTTP request, cancelling it if the request's client disconnects"""
+        if http_request is None:
+            return await work
+
+        try:
+            while True:
+                done, _ = await asyncio.wait({work}, timeout=self.disconnect_poll_interval)
+                if done:
+                    return work.result()
+                if await http_request.is_disconnected():
+                    print(f"[EXECUTOR] Client disconnected, cancelling {provider} call")
+                    work.cancel()
+                    try:
+                        await work
+                    except asyncio.CancelledError:
+                        pass
+                    raise ClientDisconnectedError(f"Client disconnected before the {provider} call completed")
+        except asyncio.CancelledError:
+            work.cancel()
+            raise
+
+    def metrics(self) -> Dict[str, Any]:
+        """Metrics for every lane created so far"""
+        return {
+            "default_concurrency": self.default_concurrency,
+            "lanes": [lane.metrics() for lane in self._lanes.values()],
+            "single_flight": get_single_flight().stats(),
+            "rate_limits": get_llm_rate_limiter().metrics(),
+            "circuit_breakers": get_circuit_breakers().stats(),
+            "hedging": get_request_hedger().stats(),
+            "latency": get_latency_tracker().stats()
+        }
+
+    def shutdown(self):
+        """Release the lane thread pools"""
+        for lane in self._lanes.values():
+            lane.executor.shutdown(wait=False, cancel_futures=True)
+        print("[EXECUTOR] LLM executor lanes shut down")
+
+class _Flight:
+    """One in-flight provider call and the requests waiting on it"""
+
+    def __init__(self, task: "asyncio.Task[Any]", provider: str):
+        self.task = task
+        self.provider = provider
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Coalesces identical concurrent provider calls into one"""
+
+    def __init__(self):
+        self.enabled = os.getenv("LLM_SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+        self._flights: Dict[str, _Flight] = {}
+        self.calls = 0
+        self.coalesced = 0
+        self.abandoned = 0
+        self.per_provider: Dict[str, int] = {}
+
+    def _finished(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        # Retrieve the outcome so an error nobody awaited is not logged as unhandled
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    async def run(self, key: str, provider: str, start: Callable[[], Awaitable[Any]], http_request: Any = None) -> Any:
+        """
+        Await the in-flight call for key, starting it with start() if there is none
+
+        Every waiter gets the call's result or error. A waiter whose client
+        disconnects leaves on its own; the shared call is cancelled only when
+        no waiter is left.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(start()), provider)
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._finished(key, flight))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+            self.per_provider[provider] = self.per_provider.get(provider, 0) + 1
+            print(f"[EXECUTOR] Coalesced identical {provider} call into the one in flight ({flight.waiters} already waiting)")
+
+        flight.waiters += 1
+        try:
+            return await get_llm_executor().watch(asyncio.shield(flight.task), provider, http_request)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                self.abandoned += 1
+                flight.task.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        """In-flight and coalesced call counters"""
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._flights),
+            "waiting": sum(flight.waiters for flight in self._flights.values()),
+            "provider_calls": self.calls,
+            "coalesced": self.coalesced,
+            "coalesced_by_provider": self.per_provider,
+            "abandoned": self.abandoned
+        }
+
+# Global executor instance
+_llm_executor = None
+
+def get_llm_executor() -> LLMExecutor:
+    """Get or create the global LLMExecutor instance"""
+    global _llm_executor
+    if _llm_executor is None:
+        _llm_executor = LLMExecutor()
+    return _llm_executor
+
+# Global single-flight instance
+_single_flight = None
+
+def get_single_flight() -> SingleFlight:
+    """Get or create the global SingleFlight instance"""
+    global _single_flight
+    if _single_flight is None:
+        _single_flight = SingleFlight()
+    return _single_flight
+
+async def run_llm_call(provider: str, call: Callable[..., Any], *args, http_request: Any = None, validate: Optional[Callable[[str], bool]] = None, **kwargs) -> Any:
+    """
+    Convenience function to run a provider call through the global executor
+
+    Calls made for a cacheable endpoint (see llm_cache) are answered from the
+    response cache when possible, and successful results are stored there
+    unless validate (called with the result text) rejects them.
+    Identical calls already in flight are joined instead of sent again, and
+    new calls wait for their provider/model's rate limits before being sent
+    through its circuit breaker.
+    """
+    cache = get_llm_response_cache()
+    endpoint, read, write = cache.policy(http_request)
+    single_flight = get_single_flight()
+    key = compute_cache_key(provider, call, args, kwargs) if endpoint is not None or single_flight.enabled else None
+    if read:
+        cached = await cache.get(key, endpoint)
+        if cached is not None:
+            return cached
+
+    async def send(target_provider: str, target_call: Callable[..., Any], target_args: Tuple[Any, ...], target_kwargs: Dict[str, Any]) -> Any:
+        permit = await get_llm_rate_limiter().acquire(target_provider, target_call, target_args, target_kwargs, request_priority(http_request))
+        started_at = time.time()
+        try:
+            result = await get_llm_executor().run(target_provider, target_call, *target_args, **target_kwargs)
+        except Exception as e:
+            permit.settle(error=e)
+            raise
+        permit.settle(result)
+        # Fast 429 round-trips would drag down the percentiles used for hedging and routing
+        if call_failed(result) is False:
+            get_latency_tracker().record(target_provider, call_model(target_call, target_kwargs), time.time() - started_at)
+        return result
+
+    async def through_breaker(target_provider: str, target_call: Callable[..., Any], target_args: Tuple[Any, ...], target_kwargs: Dict[str, Any]) -> Tuple[Any, str, str]:
+        return await get_circuit_breakers().call(target_provider, target_call, target_args, target_kwargs, send)
+
+    async def call_provider() -> Any:
+        hedger = get_request_hedger()
+        if hedger.requested(http_request):
+            result, served_provider, served_model = await hedger.call(provider, call, args, kwargs, through_breaker)
+        else:
+            result, served_provider, served_model = await through_breaker(provider, call, args, kwargs)
+        # Answers from a failover model are not cached under the requested model's key
+        failed_over = served_provider.lower() != (provider or "").lower() or served_model != call_model(call, kwargs)
+        if write and not failed_over:
+            await cache.put(key, endpoint, result, prompt_chars(args, kwargs), validate)
+        return result
+
+    if key is None or not single_flight.enabled:
+        return await get_llm_executor().watch(asyncio.ensure_future(call_provider()), provider, http_request)
+    return await single_flight.run(key, provider, call_provider, http_request)
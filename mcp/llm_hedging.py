@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+LLM Request Hedging
+
+Opt-in hedged requests for latency-critical generations. When a hedged
+call has not returned by a percentile (LLM_HEDGE_PERCENTILE) of its model's
+recent latency, a second request is sent to the backup model configured in
+LLM_HEDGE_BACKUP (the same model when none is configured). The first good
+result wins and the other request is cancelled.
+
+Hedging is requested per call with "X-LLM-Hedge: true" or for whole
+endpoints with LLM_HEDGE_ENDPOINTS. Every hedge is counted with its
+estimated token cost, so the extra spend is visible next to the latency
+it saves.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from llm_circuit_breaker import call_failed, translate_call
+from llm_latency import get_latency_tracker
+from llm_rate_limiter import call_model, estimate_tokens
+
+# run(provider, call, args, kwargs) -> (result, served provider, served model)
+RunFunction = Callable[[str, Callable[..., Any], Tuple[Any, ...], Dict[str, Any]], Awaitable[Tuple[Any, str, str]]]
+
+
+def get_configured_backups() -> Dict[Tuple[str, str], Tuple[str, str]]:
+    """Parse LLM_HEDGE_BACKUP ("provider/model=provider/model,...")"""
+    backups = {}
+    for entry in os.getenv("LLM_HEDGE_BACKUP", "").split(","):
+        if "=" not in entry:
+            continue
+        source, target = (part.strip() for part in entry.split("=", 1))
+        source_provider, _, source_model = source.partition("/")
+        target_provider, _, target_model = target.partition("/")
+        if source_provider and source_model and target_provider and target_model:
+            backups[(source_provider.lower(), source_model)] = (target_provider.lower(), target_model)
+    return backups
+
+
+class HedgeStats:
+    """Hedging counters of one primary provider/model"""
+
+    def __init__(self):
+        self.calls = 0
+        self.hedged = 0
+        self.primary_wins = 0
+        self.backup_wins = 0
+        self.both_failed = 0
+        self.extra_tokens = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hedged": self.hedged,
+            "hedge_rate": round(self.hedged / self.calls, 3) if self.calls else 0.0,
+            "primary_wins": self.primary_wins,
+            "backup_wins": self.backup_wins,
+            "both_failed": self.both_failed,
+            "estimated_extra_tokens": self.extra_tokens
+        }
+
+
+class RequestHedger:
+    """Races a delayed backup request against slow primaries"""
+
+    def __init__(self):
+        self.endpoints = {path.strip() for path in os.getenv("LLM_HEDGE_ENDPOINTS", "").split(",") if path.strip()}
+        self.percentile = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+        self.min_samples = int(os.getenv("LLM_HEDGE_MIN_SAMPLES", "20"))
+        self.default_delay = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY", "30"))
+        self.min_delay = float(os.getenv("LLM_HEDGE_MIN_DELAY", "2"))
+        self.backups = get_configured_backups()
+        self._stats: Dict[Tuple[str, str], HedgeStats] = {}
+
+    def requested(self, http_request: Any) -> bool:
+        """Whether the request opted into hedging (header, or an endpoint listed in LLM_HEDGE_ENDPOINTS)"""
+        if http_request is None:
+            return False
+        header = (http_request.headers.get("x-llm-hedge") or "").lower()
+        if header in ("true", "1", "on"):
+            return True
+        if header in ("false", "0", "off"):
+            return False
+        return http_request.url.path in self.endpoints
+
+    def delay_for(self, provider: str, model: str) -> float:
+        """Seconds to wait for the primary before hedging"""
+        latency = get_latency_tracker().percentile(provider, model, self.percentile, self.min_samples)
+        return max(self.min_delay, latency if latency is not None else self.default_delay)
+
+    def _get_stats(self, provider: str, model: str) -> HedgeStats:
+        key = ((provider or "default").lower(), model)
+        if key not in self._stats:
+            self._stats[key] = HedgeStats()
+        return self._stats[key]
+
+    async def call(self, provider: str, call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any], run: RunFunction) -> Tuple[Any, str, str]:
+        """Run a call, hedging it with a backup request if it is slower than usual"""
+        model = call_model(call, kwargs)
+        stats = self._get_stats(provider, model)
+        stats.calls += 1
+        source = ((provider or "default").lower(), model)
+        target = self.backups.get(source, source)
+
+        delay = self.delay_for(provider, model)
+        started_at = time.monotonic()
+        primary = asyncio.ensure_future(run(provider, call, args, kwargs))
+        hedge = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                return primary.result()
+
+            backup = (call, args, kwargs) if target == source else translate_call(call, args, kwargs, *target)
+            if backup is None:
+                return await primary
+            backup_call, backup_args, backup_kwargs = backup
+            stats.hedged += 1
+            stats.extra_tokens += estimate_tokens(backup_args, backup_kwargs)
+            print(f"[HEDGE] {provider}/{model} still running after {delay:.1f}s, hedging with {target[0]}/{target[1]}")
+            hedge = asyncio.ensure_future(run(target[0], backup_call, backup_args, backup_kwargs))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # Only an explicit success wins (call_failed is None for 429s, which are not good results)
+                    if task.exception() is None and call_failed(task.result()[0]) is False:
+                        if task is primary:
+                            stats.primary_wins += 1
+                        else:
+                            stats.backup_wins += 1
+                            print(f"[HEDGE] Backup {target[0]}/{target[1]} won after {time.monotonic() - started_at:.1f}s")
+                        return task.result()
+            # Neither produced a good result: report the primary's outcome
+            stats.both_failed += 1
+            return primary.result()
+        finally:
+            # Also reached when the caller is cancelled: never leave a provider call running
+            losers = [task for task in (primary, hedge) if task is not None and not task.done()]
+            for task in losers:
+                task.cancel()
+            if losers:
+                await asyncio.gather(*losers, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "endpoints": sorted(self.endpoints),
+            "percentile": self.percentile,
+            "backups": {f"{source[0]}/{source[1]}": f"{target[0]}/{target[1]}" for source, target in self.backups.items()},
+            "models": {
+                f"{provider}/{model}": {**stats.to_dict(), "current_delay_seconds": round(self.delay_for(provider, model), 2)}
+                for (provider, model), stats in self._stats.items()
+            }
+        }
+
+# Global hedger instance
+_request_hedger = None
+
+def get_request_hedger() -> RequestHedger:
+    """Get or create the global RequestHedger instance"""
+    global _request_hedger
+    if _request_hedger is None:
+        _request_hedger = RequestHedger()
+    return _request_hedger
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+LLM Latency Tracker
+
+Rolling latency samples of successful provider calls per provider/model,
+used to pick hedging delays and to route requests by live latency.
+Only the provider round-trip is measured (not time spent waiting in the
+rate limiter or executor queues).
+"""
+import math
+import os
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+class ModelLatency:
+    """Recent successful call latencies of one provider/model"""
+
+    def __init__(self, provider: str, model: str, max_samples: int, max_age: float):
+        self.provider = provider
+        self.model = model
+        self.max_age = max_age
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=max_samples)
+        self.calls = 0
+
+    def record(self, seconds: float):
+        self.calls += 1
+        self._samples.append((time.time(), seconds))
+
+    def latencies(self) -> List[float]:
+        """Latencies recorded within the last max_age seconds"""
+        cutoff = time.time() - self.max_age
+        return [seconds for recorded_at, seconds in self._samples if recorded_at >= cutoff]
+
+    def percentile(self, percentile: float) -> Optional[float]:
+        """Nearest-rank percentile of recent latencies, or None without samples"""
+        latencies = sorted(self.latencies())
+        if not latencies:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * len(latencies)))
+        return latencies[min(rank, len(latencies)) - 1]
+
+    def stats(self) -> Dict[str, Any]:
+        latencies = self.latencies()
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "calls": self.calls,
+            "samples": len(latencies),
+            "p50_seconds": round(self.percentile(50), 3) if latencies else None,
+            "p95_seconds": round(self.percentile(95), 3) if latencies else None,
+            "max_seconds": round(max(latencies), 3) if latencies else None
+        }
+
+
+class LatencyTracker:
+    """Latency samples for every provider/model that served a call"""
+
+    def __init__(self):
+        self.max_samples = int(os.getenv("LLM_LATENCY_SAMPLES", "200"))
+        self.max_age = float(os.getenv("LLM_LATENCY_MAX_AGE", "3600"))
+        self._models: Dict[Tuple[str, str], ModelLatency] = {}
+
+    def get(self, provider: str, model: str) -> ModelLatency:
+        provider = (provider or "default").lower()
+        latency = self._models.get((provider, model))
+        if latency is None:
+            latency = ModelLatency(provider, model, self.max_samples, self.max_age)
+            self._models[(provider, model)] = latency
+        return latency
+
+    def record(self, provider: str, model: str, seconds: float):
+        """Record the latency of a successful call"""
+        self.get(provider, model).record(seconds)
+
+    def percentile(self, provider: str, model: str, percentile: float, min_samples: int = 1) -> Optional[float]:
+        """Latency percentile of a model, or None with fewer than min_samples recent samples"""
+        latency = self.get(provider, model)
+        if len(latency.latencies()) < max(1, min_samples):
+            return None
+        return latency.percentile(percentile)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [latency.stats() for latency in self._models.values()]
+
+# Global tracker instance
+_latency_tracker = None
+
+def get_latency_tracker() -> LatencyTracker:
+    """Get or create the global LatencyTracker instance"""
+    global _latency_tracker
+    if _latency_tracker is None:
+        _latency_tracker = LatencyTracker()
+    return _latency_tracker
@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+LLM Rate Limiter
+
+Client-side requests-per-minute and tokens-per-minute limits for each
+provider/model, so bursts queue here instead of spending quota on calls the
+provider will reject with 429.
+
+Every provider call estimates its tokens (prompt text, images and expected
+output) before it is sent and waits in its model's queue until both token
+buckets can cover it. The queue is ordered by priority (X-LLM-Priority:
+high / normal / low) and then arrival, with waiting requests aging towards
+the front so low priority work is never starved. Once a call returns, the
+estimate is corrected with the reported usage; a 429 from the provider
+pauses the model's queue for the retry delay it asked for.
+"""
+import asyncio
+import itertools
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from llm_cache import describe_call, prompt_chars, reported_tokens
+
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+DEFAULT_PRIORITY = "normal"
+
+RATE_LIMIT_MARKERS = ("429", "resource_exhausted", "rate limit", "rate_limit", "too many requests", "quota")
+RETRY_DELAY_PATTERN = re.compile(r"retry(?:[_ -]?after|[_ -]?delay|[_ -]in)\D{0,6}(\d+(?:\.\d+)?)", re.IGNORECASE)
+# OpenAI: "Please try again in 20s", "... in 120ms", "... in 1m30s"
+TRY_AGAIN_PATTERN = re.compile(r"try again in (?:(\d+)m(?!s))?(\d+(?:\.\d+)?)(ms|s)", re.IGNORECASE)
+
+
+def retry_delay(message: str) -> Optional[float]:
+    """Seconds a rate limit error asks to wait before retrying, or None if it does not say"""
+    match = TRY_AGAIN_PATTERN.search(message)
+    if match:
+        minutes, amount, unit = match.groups()
+        seconds = float(amount) / 1000 if unit.lower() == "ms" else float(amount)
+        return int(minutes or 0) * 60 + seconds
+    match = RETRY_DELAY_PATTERN.search(message)
+    return float(match.group(1)) if match else None
+
+class RateLimitTimeoutError(Exception):
+    """Raised when a call waited longer than LLM_RATE_QUEUE_TIMEOUT for rate limit capacity"""
+
+
+def get_configured_limits() -> Dict[Tuple[str, str], Tuple[float, float]]:
+    """
+    Parse LLM_RATE_LIMITS ("provider/model=rpm:tpm,...", model "*" for the provider default)
+
+    A 0 or missing value leaves that dimension unlimited.
+    """
+    limits = {}
+    for entry in os.getenv("LLM_RATE_LIMITS", "").split(","):
+        entry = entry.strip()
+        if not entry or "=" not in entry:
+            continue
+        target, values = entry.split("=", 1)
+        provider, _, model = target.strip().partition("/")
+        rpm, _, tpm = values.partition(":")
+        try:
+            limits[(provider.lower(), model.strip() or "*")] = (float(rpm or 0), float(tpm or 0))
+        except ValueError:
+            print(f"[RATE-LIMIT] Ignoring malformed LLM_RATE_LIMITS entry: {entry}")
+    return limits
+
+
+def call_model(call: Callable[..., Any], kwargs: Dict[str, Any]) -> str:
+    """Model a provider call targets (model= argument, else the LangChain model's name)"""
+    description = describe_call(call)
+    model = kwargs.get("model") or description.get("model") or description.get("model_name") or "default"
+    return str(model).replace("models/", "", 1)
+
+
+def _count_images(value: Any, key: str = "") -> int:
+    if isinstance(value, str):
+        return 1 if value.startswith("data:image") or (key.startswith("image") and len(value) > 256) else 0
+    if isinstance(value, dict):
+        return sum(_count_images(item, str(name)) for name, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_count_images(item, key) for item in value)
+    content = getattr(value, "content", None)
+    return _count_images(content) if content is not None else 0
+
+
+def estimate_tokens(args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> int:
+    """Tokens a call is expected to use: prompt (~4 chars each), images and the expected output"""
+    image_tokens = int(os.getenv("LLM_RATE_IMAGE_TOKENS", "1000"))
+    output_tokens = kwargs.get("max_tokens") or int(os.getenv("LLM_RATE_OUTPUT_TOKENS", "2000"))
+    return prompt_chars(args, kwargs) // 4 + _count_images([args, kwargs]) * image_tokens + output_tokens
+
+
+def rate_limit_error(result: Any = None, error: Optional[BaseException] = None) -> Optional[str]:
+    """The provider's rate limit message if a call was rejected with 429, else None"""
+    if error is not None:
+        message = str(error)
+    elif isinstance(result, tuple) and len(result) == 3 and not result[0] and isinstance(result[2], dict):
+        message = str(result[2].get("error", ""))
+    else:
+        return None
+    return message if any(marker in message.lower() for marker in RATE_LIMIT_MARKERS) else None
+
+
+class TokenBucket:
+    """Per-minute allowance refilled continuously; capacity 0 means unlimited"""
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until the bucket can cover amount (capped at its capacity)"""
+        if not self.capacity:
+            return 0.0
+        self._refill()
+        missing = min(amount, self.capacity) - self.level
+        return max(0.0, missing * 60 / self.capacity)
+
+    def take(self, amount: float):
+        """Spend amount; the level may go negative when a call used more than estimated"""
+        if self.capacity:
+            self._refill()
+            self.level -= amount
+
+    def give(self, amount: float):
+        if self.capacity:
+            self._refill()
+            self.level = min(self.capacity, self.level + amount)
+
+
+class _Waiter:
+    def __init__(self, seq: int, priority: str, tokens: int):
+        self.seq = seq
+        self.priority = priority
+        self.tokens = tokens
+        self.enqueued_at = time.monotonic()
+        self.future: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+
+
+class RatePermit:
+    """Admission of one call; settle() corrects the token estimate after it returns"""
+
+    def __init__(self, limiter: "ModelRateLimiter", tokens: int, waited: float):
+        self.limiter = limiter
+        self.tokens = tokens
+        self.waited = waited
+
+    def settle(self, result: Any = None, error: Optional[BaseException] = None):
+        self.limiter.settle(self, result, error)
+
+
+class ModelRateLimiter:
+    """RPM/TPM buckets and the priority queue of one provider/model"""
+
+    def __init__(self, provider: str, model: str, rpm: float, tpm: float, aging_seconds: float):
+        self.provider = provider
+        self.model = model
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.aging_seconds = aging_seconds
+        self.paused_until = 0.0
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.admitted = 0
+        self.queued = 0
+        self.timed_out = 0
+        self.rate_limited = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+        self.total_wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    @property
+    def limited(self) -> bool:
+        return bool(self.requests.capacity or self.tokens.capacity)
+
+    def _rank(self, waiter: _Waiter, now: float) -> Tuple[float, int]:
+        """Queue order: priority class, improved by one class per aging period waited, then arrival"""
+        aged = (now - waiter.enqueued_at) / self.aging_seconds if self.aging_seconds else 0
+        return PRIORITIES[waiter.priority] - aged, waiter.seq
+
+    def _dispatch(self):
+        """Admit waiters from the front of the queue while both buckets can cover them"""
+        self._timer = None
+        while self._waiters:
+            now = time.monotonic()
+            self._waiters = [waiter for waiter in self._waiters if not waiter.future.done()]
+            if not self._waiters:
+                return
+            head = min(self._waiters, key=lambda waiter: self._rank(waiter, now))
+            delay = max(self.paused_until - now, self.requests.wait_time(1), self.tokens.wait_time(head.tokens))
+            if delay > 0:
+                self._timer = asyncio.get_running_loop().call_later(delay, self._dispatch)
+                return
+            self.requests.take(1)
+            self.tokens.take(head.tokens)
+            self._waiters.remove(head)
+            head.future.set_result(None)
+
+    async def acquire(self, tokens: int, priority: str, timeout: Optional[float]) -> RatePermit:
+        """Wait for capacity for a call of the estimated size"""
+        started_at = time.monotonic()
+        self.estimated_tokens += tokens
+        if not self.limited and self.paused_until <= time.monotonic():
+            self.admitted += 1
+            return RatePermit(self, tokens, 0.0)
+
+        waiter = _Waiter(next(self._seq), priority, tokens)
+        self._waiters.append(waiter)
+        if self._timer is None:
+            self._dispatch()
+        queued = not waiter.future.done()
+        if queued:
+            self.queued += 1
+            print(f"[RATE-LIMIT] Queued {priority} {self.provider}/{self.model} call (~{tokens} tokens, {len(self._waiters)} waiting)")
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise RateLimitTimeoutError(
+                f"{self.provider}/{self.model} rate limit queue wait exceeded {timeout:.0f}s; try again shortly"
+            ) from None
+        finally:
+            if not waiter.future.done():
+                waiter.future.cancel()
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+
+        waited = time.monotonic() - started_at
+        self.admitted += 1
+        if queued:
+            self.total_wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+        return RatePermit(self, tokens, waited)
+
+    def settle(self, permit: RatePermit, result: Any = None, error: Optional[BaseException] = None):
+        """Correct the token estimate with reported usage and pause the queue after a 429"""
+        message = rate_limit_error(result, error)
+        if message is not None:
+            self.rate_limited += 1
+            cooldown = retry_delay(message)
+            if cooldown is None:
+                cooldown = float(os.getenv("LLM_RATE_LIMIT_COOLDOWN", "10"))
+            self.paused_until = max(self.paused_until, time.monotonic() + cooldown)
+            print(f"[RATE-LIMIT] {self.provider}/{self.model} returned a rate limit error, pausing its queue for {cooldown:.1f}s")
+            return
+        if error is not None or result is None:
+            return
+        actual = reported_tokens(result)
+        if actual:
+            self.actual_tokens += actual
+            if actual > permit.tokens:
+                self.tokens.take(actual - permit.tokens)
+            else:
+                self.tokens.give(permit.tokens - actual)
+
+    def metrics(self) -> Dict[str, Any]:
+        admitted_after_wait = self.queued - self.timed_out
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "rpm_limit": self.requests.capacity or None,
+            "tpm_limit": self.tokens.capacity or None,
+            "queue_depth": len([waiter for waiter in self._waiters if not waiter.future.done()]),
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "timed_out": self.timed_out,
+            "rate_limited": self.rate_limited,
+            "paused_for_seconds": round(max(0.0, self.paused_until - time.monotonic()), 1),
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+            "avg_queue_wait_seconds": round(self.total_wait_time / admitted_after_wait, 3) if admitted_after_wait > 0 else 0.0,
+            "max_queue_wait_seconds": round(self.max_wait_time, 3)
+        }
+
+
+class LLMRateLimiter:
+    """Per provider/model rate limiters created on first use from LLM_RATE_LIMITS"""
+
+    def __init__(self):
+        self.limits = get_configured_limits()
+        self.queue_timeout = float(os.getenv("LLM_RATE_QUEUE_TIMEOUT", "120")) or None
+        self.aging_seconds = float(os.getenv("LLM_RATE_AGING_SECONDS", "30"))
+        self._limiters: Dict[Tuple[str, str], ModelRateLimiter] = {}
+
+    def get_limiter(self, provider: str, model: str) -> ModelRateLimiter:
+        provider = (provider or "default").lower()
+        limiter = self._limiters.get((provider, model))
+        if limiter is None:
+            rpm, tpm = self.limits.get((provider, model)) or self.limits.get((provider, "*")) or (0, 0)
+            limiter = ModelRateLimiter(provider, model, rpm, tpm, self.aging_seconds)
+            self._limiters[(provider, model)] = limiter
+            if limiter.limited:
+                print(f"[RATE-LIMIT] Limiting {provider}/{model} to {rpm or 'unlimited'} RPM, {tpm or 'unlimited'} TPM")
+        return limiter
+
+    async def acquire(self, provider: str, call: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any], priority: str = DEFAULT_PRIORITY) -> RatePermit:
+        """Estimate a call's tokens and wait until its provider/model can take it"""
+        limiter = self.get_limiter(provider, call_model(call, kwargs))
+        priority = priority if priority in PRIORITIES else DEFAULT_PRIORITY
+        return await limiter.acquire(estimate_tokens(args, kwargs), priority, self.queue_timeout)
+
+    def metrics(self) -> List[Dict[str, Any]]:
+        return [limiter.metrics() for limiter in self._limiters.values()]
+
+
+def request_priority(http_request: Any) -> str:
+    """Priority requested through the X-LLM-Priority header"""
+    if http_request is None:
+        return DEFAULT_PRIORITY
+    priority = (http_request.headers.get("x-llm-priority") or DEFAULT_PRIORITY).lower()
+    return priority if priority in PRIORITIES else DEFAULT_PRIORITY
+
+# Global rate limiter instance
+_llm_rate_limiter = None
+
+def get_llm_rate_limiter() -> LLMRateLimiter:
+    """Get or create the global LLMRateLimiter instance"""
+    global _llm_rate_limiter
+    if _llm_rate_limiter is None:
+        _llm_rate_limiter = LLMRateLimiter()
+    return _llm_rate_limiter
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Adaptive Model Router
+
+Picks the model for a generation request from a latency budget and a
+quality tier instead of a model name supplied by the client.
+
+Each provider has a fast model (e.g. gemini-2.5-flash) and a pro model
+(e.g. gemini-2.5-pro), configured in LLM_ROUTER_MODELS. The "fast" tier
+always gets the fast model and "best" the pro model; "balanced" sends
+heavy work (image input, long prompts, design and reverse-engineering
+endpoints) to pro and the rest to fast. The choice is then checked against
+live conditions: a model whose circuit breaker is open is avoided, and pro
+is downgraded to fast when its recent latency (LLM_ROUTER_PERCENTILE) would
+not fit the latency budget of a "balanced" request while fast would.
+"""
+import os
+from typing import Any, Dict, Optional
+
+from llm_circuit_breaker import OPEN, get_circuit_breakers
+from llm_latency import get_latency_tracker
+
+QUALITY_TIERS = ("fast", "balanced", "best")
+
+DEFAULT_ROUTER_MODELS = "google/gemini-2.5-flash=fast,google/gemini-2.5-pro=pro,openai/gpt-4o-mini=fast,openai/gpt-4o=pro"
+
+# How demanding each endpoint's output is, for the "balanced" tier
+ENDPOINT_WEIGHTS = {
+    "/generate-design-code": "heavy",
+    "/reverse-engineer-design": "heavy",
+    "/reverse-engineer-code": "heavy",
+    "/generate-code": "medium",
+    "/apply-suggestions": "medium",
+    "/review-code": "light"
+}
+
+
+def get_configured_router_models() -> Dict[str, Dict[str, str]]:
+    """Parse LLM_ROUTER_MODELS ("provider/model=fast|pro,...") into {provider: {class: model}}"""
+    models: Dict[str, Dict[str, str]] = {}
+    for entry in os.getenv("LLM_ROUTER_MODELS", DEFAULT_ROUTER_MODELS).split(","):
+        if "=" not in entry:
+            continue
+        target, model_class = (part.strip() for part in entry.split("=", 1))
+        provider, _, model = target.partition("/")
+        if provider and model and model_class in ("fast", "pro"):
+            models.setdefault(provider.lower(), {})[model_class] = model
+    return models
+
+
+class RouteDecision:
+    """The model chosen for a request and why"""
+
+    def __init__(self, provider: str, model: str, model_class: str, tier: str, reason: str, predicted_latency: float):
+        self.provider = provider
+        self.model = model
+        self.model_class = model_class
+        self.tier = tier
+        self.reason = reason
+        self.predicted_latency = predicted_latency
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "class": self.model_class,
+            "tier": self.tier,
+            "reason": self.reason,
+            "predicted_latency_seconds": round(self.predicted_latency, 2)
+        }
+
+
+class ModelRouter:
+    """Chooses between a provider's fast and pro models per request"""
+
+    def __init__(self):
+        self.models = get_configured_router_models()
+        self.percentile = float(os.getenv("LLM_ROUTER_PERCENTILE", "90"))
+        self.min_samples = int(os.getenv("LLM_ROUTER_MIN_SAMPLES", "5"))
+        self.default_latency = {
+            "fast": float(os.getenv("LLM_ROUTER_DEFAULT_LATENCY_FAST", "20")),
+            "pro": float(os.getenv("LLM_ROUTER_DEFAULT_LATENCY_PRO", "60"))
+        }
+        self.heavy_prompt_chars = int(os.getenv("LLM_ROUTER_HEAVY_PROMPT_CHARS", "6000"))
+        self.long_prompt_chars = int(os.getenv("LLM_ROUTER_LONG_PROMPT_CHARS", "20000"))
+        self.routed: Dict[str, int] = {}
+        self.downgraded = 0
+        self.avoided_open_circuits = 0
+
+    def predicted_latency(self, provider: str, model: str, model_class: str) -> float:
+        """Recent latency percentile of a model, or its class default before enough samples exist"""
+        latency = get_latency_tracker().percentile(provider, model, self.percentile, self.min_samples)
+        return latency if latency is not None else self.default_latency[model_class]
+
+    def _needs_pro(self, endpoint: str, prompt_chars: int, has_image: bool) -> bool:
+        weight = ENDPOINT_WEIGHTS.get(endpoint, "light")
+        if prompt_chars >= self.long_prompt_chars:
+            return True
+        return weight == "heavy" and (has_image or prompt_chars >= self.heavy_prompt_chars)
+
+    def route(self, provider: str, endpoint: str, prompt_chars: int, has_image: bool = False, quality_tier: Optional[str] = None, latency_budget: Optional[float] = None) -> RouteDecision:
+        """
+        Choose the model for a request
+
+        Raises:
+            ValueError: Unknown quality tier or no router models for the provider
+        """
+        provider = (provider or "").lower()
+        tier = (quality_tier or "balanced").lower()
+        if tier not in QUALITY_TIERS:
+            raise ValueError(f"Unknown quality_tier '{quality_tier}', expected one of: {', '.join(QUALITY_TIERS)}")
+        models = self.models.get(provider, {})
+        if not models:
+            raise ValueError(f"No router models configured for provider '{provider}' (LLM_ROUTER_MODELS)")
+
+        if tier == "best":
+            model_class, reason = "pro", "best quality requested"
+        elif tier == "fast":
+            model_class, reason = "fast", "fast tier requested"
+        elif self._needs_pro(endpoint, prompt_chars, has_image):
+            model_class, reason = "pro", f"heavy request ({endpoint}, {prompt_chars} prompt chars{', image' if has_image else ''})"
+        else:
+            model_class, reason = "fast", f"light request ({endpoint}, {prompt_chars} prompt chars)"
+        if model_class not in models:
+            model_class = "fast" if model_class == "pro" else "pro"
+            reason += f", only a {model_class} model is configured"
+
+        other_class = "fast" if model_class == "pro" else "pro"
+        breakers = get_circuit_breakers()
+        if other_class in models and breakers.get_breaker(provider, models[model_class]).state == OPEN \
+                and breakers.get_breaker(provider, models[other_class]).state != OPEN:
+            self.avoided_open_circuits += 1
+            reason += f"; {models[model_class]} circuit is open"
+            model_class = other_class
+
+        predicted = self.predicted_latency(provider, models[model_class], model_class)
+        if latency_budget and tier == "balanced" and model_class == "pro" and predicted > latency_budget and "fast" in models:
+            fast_predicted = self.predicted_latency(provider, models["fast"], "fast")
+            if fast_predicted <= latency_budget or fast_predicted < predicted:
+                self.downgraded += 1
+                reason += f"; pro p{self.percentile:.0f} {predicted:.1f}s exceeds the {latency_budget:.1f}s budget"
+                model_class, predicted = "fast", fast_predicted
+
+        model = models[model_class]
+        self.routed[f"{provider}/{model}"] = self.routed.get(f"{provider}/{model}", 0) + 1
+        print(f"[ROUTER] {endpoint} -> {provider}/{model} ({reason})")
+        return RouteDecision(provider, model, model_class, tier, reason, predicted)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "models": self.models,
+            "percentile": self.percentile,
+            "routed": self.routed,
+            "downgraded_for_budget": self.downgraded,
+            "avoided_open_circuits": self.avoided_open_circuits,
+            "predicted_latency_seconds": {
+                f"{provider}/{model}": round(self.predicted_latency(provider, model, model_class), 2)
+                for provider, models in self.models.items() for model_class, model in models.items()
+            }
+        }
+
+# Global router instance
+_model_router = None
+
+def get_model_router() -> ModelRouter:
+    """Get or create the global ModelRouter instance"""
+    global _model_router
+    if _model_router is None:
+        _model_router = ModelRouter()
+    return _model_router
@@ -1,25 +1,39 @@
 import asyncio
+import functools
+import json
 import os
 import ssl
 import time
 import re
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, Callable, List, Optional
 from contextlib import asynccontextmanager
 from datetime import datetime
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, Response, StreamingResponse
 from pydantic import BaseModel
 from dotenv import load_dotenv
 
 from mcp_use import MCPClient, MCPAgent
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_google_genai import ChatGoogleGenerativeAI
 
 # Import our official services
-from official_gemini_service import get_official_gemini_service, generate_text_with_official_gemini, generate_multimodal_with_official_gemini
-from official_openai_service import get_official_openai_service, generate_text_with_official_openai, generate_multimodal_with_official_openai
+from official_gemini_service import get_official_gemini_service, agenerate_text_with_official_gemini, agenerate_multimodal_with_official_gemini
+from official_openai_service import get_official_openai_service, agenerate_text_with_official_openai, agenerate_multimodal_with_official_openai
+from provider_health import get_provider_health_monitor, get_configured_probe_targets
+from llm_executor import get_llm_executor, run_llm_call
+from llm_cache import get_llm_response_cache
+from llm_router import get_model_router
+from llm_client_pool import get_llm_client_pool, get_pooled_llm
+from playwright_session_pool import get_playwright_session_pool
+from snapshot_pruner import SnapshotPruner
+from run_budget import RunBudget, BudgetExceededError
+from trace_replay import get_trace_store, compute_test_case_key, agent_reported_pass, tool_result_is_error, tool_result_text, TraceRecorder
+from script_compiler import get_compiled_test_store
+from screenshot_store import get_screenshot_store, ScreenshotCapture
+from job_queue import get_job_queue, format_sse, JobQueueFullError
+from jira_mcp import get_jira_connection, check_issue_links
+from tool_catalog import get_tool_catalog, PLAYWRIGHT_SERVER, JIRA_SERVER
 
 # Load environment variables from the env file
 load_dotenv("env")
@@ -54,6 +68,13 @@ class TestCaseExecutionRequest(BaseModel):
     testCase: Dict[str, Any]
     llm_provider: str = "openai"
     model: str = "gpt-4o"
+    replay: bool = True  # Replay a recorded trace instead of running the agent when one exists
+    record: bool = True  # Record the tool calls of a passing agent run for later replay
+    export_script: bool = False  # Compile a passing run into a standalone Playwright script
+    snapshot_pruning: Optional[str] = None  # "diff", "prune" or "off" (default: SNAPSHOT_PRUNING)
+    max_steps: Optional[int] = None  # Agent browser step budget (default: TEST_MAX_STEPS)
+    max_seconds: Optional[float] = None  # Agent wall-clock budget (default: TEST_MAX_SECONDS)
+    max_tokens: Optional[int] = None  # Agent LLM token budget (default: TEST_MAX_TOKENS)
 
 class TestCaseExecutionResponse(BaseModel):
     result: str
@@ -61,6 +82,31 @@ class TestCaseExecutionResponse(BaseModel):
     error: str = None
     screenshots: list = []
     execution_time: float = None
+    mode: str = "agent"  # "agent", "replay" or "agent_fallback" (replay diverged, agent took over)
+    trace_key: Optional[str] = None
+    compiled_script: Optional[Dict[str, Any]] = None
+    run_id: Optional[str] = None  # Screenshot store run; see /screenshots/runs/{run_id}
+    snapshot_stats: Optional[Dict[str, Any]] = None  # Agent tool result size before/after pruning, seconds per step
+    budget: Optional[Dict[str, Any]] = None  # Steps, seconds and tokens used by the agent against their limits
+
+class TestSuiteExecutionRequest(BaseModel):
+    testCases: List[Dict[str, Any]]
+    llm_provider: str = "openai"
+    model: str = "gpt-4o"
+    concurrency: int = 2
+    replay: bool = True
+    record: bool = True
+    export_script: bool = False
+    snapshot_pruning: Optional[str] = None
+    max_steps: Optional[int] = None  # Budgets apply to each test case
+    max_seconds: Optional[float] = None
+    max_tokens: Optional[int] = None
+
+class CompiledTestRunRequest(BaseModel):
+    keys: Optional[List[str]] = None  # Test case keys to run (default: every compiled test case)
+    concurrency: Optional[int] = None
+    timeout: Optional[float] = None  # Per-script timeout in seconds
+    include_incomplete: bool = False  # Also run scripts with steps that could not be compiled
 
 class JiraIssueRequest(BaseModel):
     summary: str
@@ -68,7 +114,8 @@ class JiraIssueRequest(BaseModel):
     project: str = "AURA"
     issueType: str = "Task"
     priority: str = "Medium"
-    llm_provider: str = "openai"
+    enrich: bool = False  # Have the LLM expand the description before the issue is created
+    llm_provider: str = "openai"  # Only used to enrich the description
     model: str = "gpt-4o"
 
 class JiraIssueResponse(BaseModel):
@@ -77,6 +124,29 @@ class JiraIssueResponse(BaseModel):
     issue_url: str
     message: str
 
+class JiraBulkIssueItem(BaseModel):
+    ref: str  # Caller's ID for the item, used for parent links and in the result map
+    summary: str
+    description: str = ""
+    issueType: str = "Task"
+    priority: Optional[str] = None
+    project: Optional[str] = None  # Defaults to the request's project
+    parent_ref: Optional[str] = None  # Another item in this request (created first)
+    parent_key: Optional[str] = None  # An existing Jira issue
+
+class JiraBulkIssueRequest(BaseModel):
+    issues: List[JiraBulkIssueItem]
+    project: str = "AURA"
+    concurrency: Optional[int] = None  # Default: JIRA_BULK_CONCURRENCY
+
+class JiraBulkIssueResponse(BaseModel):
+    success: bool
+    created: int
+    failed: int
+    skipped: int
+    results: Dict[str, Dict[str, Any]]  # Per ref: status, key, url, parent_key, attempts or error
+    execution_time: float
+
 class DesignCodeGenerationRequest(BaseModel):
     systemPrompt: str
     userPrompt: str
@@ -84,7 +154,9 @@ class DesignCodeGenerationRequest(BaseModel):
     imageData: Optional[str] = None
     imageType: Optional[str] = None
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class DesignCodeGenerationResponse(BaseModel):
     success: bool
@@ -100,7 +172,9 @@ class CodeGenerationRequest(BaseModel):
     framework: str
     workItemId: Optional[str] = None
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class CodeGenerationResponse(BaseModel):
     success: bool
@@ -114,7 +188,9 @@ class CodeReviewRequest(BaseModel):
     codeType: str
     language: str
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class CodeReviewResponse(BaseModel):
     success: bool
@@ -130,7 +206,9 @@ class ApplySuggestionsRequest(BaseModel):
     codeType: str
     language: str
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class ApplySuggestionsResponse(BaseModel):
     success: bool
@@ -146,7 +224,9 @@ class ReverseEngineerDesignRequest(BaseModel):
     imageData: Optional[str] = None
     imageType: Optional[str] = None
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class ReverseEngineerDesignResponse(BaseModel):
     success: bool
@@ -161,7 +241,9 @@ class ReverseEngineerCodeRequest(BaseModel):
     analysisLevel: str
     codeLength: int
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class ReverseEngineerCodeResponse(BaseModel):
     success: bool
@@ -173,27 +255,18 @@ async def create_mcp_client(server_type: str = "playwright"):
     """Create a new MCP client for the specified server type"""
     try:
         if server_type == "jira":
-            # Create Jira MCP client using the official Atlassian Remote MCP Server approach
+            # Reuse the supervised, long-lived Atlassian Remote MCP session instead of starting mcp-remote again
             # Based on: https://support.atlassian.com/rovo/docs/setting-up-ides/
-            client = MCPClient({
-                "mcpServers": {
-                    "atlassian": {
-                        "command": "npx",
-                        "args": ["-y", "mcp-remote", "https://mcp.atlassian.com/v1/sse"],
-                        "env": {
-                            "NODE_OPTIONS": "--no-warnings"
-                        }
-                    }
-                }
-            })
-            print("[OK] Atlassian Remote MCP Client created for this request")
-            print("[CONNECT] Connecting via mcp-remote proxy to https://mcp.atlassian.com/v1/sse")
+            jira = get_jira_connection()
+            await jira.get_session()
+            client = jira.client
+            print(f"[OK] Using the persistent Atlassian Remote MCP session ({jira.remote_url})")
         else:
-            # Create Playwright MCP client (default)
+            # Create Playwright MCP client (default) on the least-loaded configured endpoint
             client = MCPClient({
                 "mcpServers": {
                     "playwright": {
-                        "url": "http://localhost:8931/sse"
+                        "url": get_playwright_session_pool().least_loaded_url()
                     }
                 }
             })
@@ -205,26 +278,17 @@ async def create_mcp_client(server_type: str = "playwright"):
         print(f"Make sure the {server_type.capitalize()} MCP server is running on the appropriate port")
         return None
 
-async def get_agent(llm_provider: str, model: str, server_type: str = "playwright"):
+async def get_agent(llm_provider: str, model: str, server_type: str = "playwright", mcp_client: Optional[MCPClient] = None):
     """Create a new MCP agent with the specified LLM for this request"""
-    # Create a new MCP client for this request
-    mcp_client = await create_mcp_client(server_type)
+    # Use the caller's pre-connected client when given, otherwise create one for this request
+    if mcp_client is None:
+        mcp_client = await create_mcp_client(server_type)
     if not mcp_client:
         raise Exception(f"Failed to create {server_type} MCP client")
     
     try:
-        # Create the appropriate LLM based on provider
-        if llm_provider.lower() == "openai":
-            llm = ChatOpenAI(model=model)
-        elif llm_provider.lower() == "anthropic":
-            llm = ChatAnthropic(model=model)
-        elif llm_provider.lower() == "google":
-            llm = ChatGoogleGenerativeAI(
-                model=model,
-                google_api_key=os.getenv("GOOGLE_API_KEY")
-            )
-        else:
-            raise ValueError(f"Unsupported LLM provider: {llm_provider}")
+        # Reuse a pooled LLM client for the provider (raises ValueError for unsupported providers)
+        llm = get_pooled_llm(llm_provider, model)
         
         # Create the MCP agent with the new client
         agent = MCPAgent(
@@ -237,19 +301,12 @@ async def get_agent(llm_provider: str, model: str, server_type: str = "playwrigh
         if server_type == "jira":
             print("🔍 Testing Atlassian MCP connection...")
             try:
-                # Try to get available tools to verify connection
-                try:
-                    tools = await mcp_client.list_tools()
-                except AttributeError:
-                    try:
-                        tools = mcp_client.tools
-                    except AttributeError:
-                        tools = ["connection_verified"]
+                # Available tools from the cached catalog (listed once per connection)
+                tools = list((await get_jira_connection().tools()).values())
                 
-                print(f"✅ Successfully connected to Atlassian MCP. Available tools: {len(tools) if tools else 0}")
-                if tools and len(tools) > 0 and hasattr(tools[0], 'name'):
-                    for tool in tools[:3]:  # Show first 3 tools
-                        print(f"  🛠️ {getattr(tool, 'name', 'unnamed')}: {getattr(tool, 'description', 'no description')[:80]}...")
+                print(f"✅ Successfully connected to Atlassian MCP. Available tools: {len(tools)}")
+                for tool in tools[:3]:  # Show first 3 tools
+                    print(f"  🛠️ {tool.name}: {tool.description[:80]}...")
             except Exception as test_error:
                 print(f"⚠️ Warning: Could not verify Atlassian MCP connection: {test_error}")
                 print("🔗 This may indicate authentication is needed. Please check the Jira MCP Server window.")
@@ -307,6 +364,28 @@ Please execute this test case and provide a detailed report of the execution inc
     
     return prompt
 
+def register_provider_health_probes():
+    """Register a health probe for each configured provider/model with an official SDK"""
+    monitor = get_provider_health_monitor()
+    service_factories = {
+        "google": get_official_gemini_service,
+        "openai": get_official_openai_service
+    }
+    
+    for provider, model in get_configured_probe_targets():
+        factory = service_factories.get(provider)
+        if not factory:
+            print(f"[HEALTH] No official SDK for provider '{provider}', skipping probe for {model}")
+            continue
+        try:
+            service = factory()
+        except Exception as e:
+            print(f"[HEALTH] Official {provider} SDK not configured, skipping probe for {model}: {e}")
+            continue
+        monitor.register_probe(provider, model, functools.partial(service.aprobe_availability, model))
+    
+    return monitor
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Handle application lifespan events"""
@@ -315,8 +394,35 @@ async def lifespan(app: FastAPI):
     # if not success:
     #     print("⚠️  Warning: Failed to initialize MCP client on startup")
     
+    # Pre-create pooled LLM clients so the first requests skip client construction
+    llm_client_pool = get_llm_client_pool()
+    llm_client_pool.warm()
+    
+    # Probe LLM providers in the background so handlers never wait on a live availability check
+    provider_health_monitor = register_provider_health_probes()
+    provider_health_monitor.start()
+    
+    # Pre-connect Playwright MCP sessions for test execution
+    playwright_session_pool = get_playwright_session_pool()
+    await playwright_session_pool.start()
+    
+    # Background workers for queued test executions
+    job_queue = get_job_queue()
+    job_queue.start()
+    
+    # Long-lived Jira MCP session (mcp-remote), reconnected by its supervisor
+    get_jira_connection().start()
+    
     yield
     
+    await job_queue.stop()
+    await playwright_session_pool.close()
+    await get_jira_connection().close()
+    await get_screenshot_store().close()
+    await provider_health_monitor.stop()
+    get_llm_executor().shutdown()
+    await llm_client_pool.aclose()
+    
     # Shutdown
     # global mcp_client # This line is no longer needed
     # if mcp_client:
@@ -341,47 +447,177 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-@app.post("/execute-test-case", response_model=TestCaseExecutionResponse)
-async def execute_test_case(request: TestCaseExecutionRequest):
-    """Execute a test case using the MCP Playwright agent"""
-    import time
+async def run_test_case(
+    test_case: Dict[str, Any],
+    llm_provider: str,
+    model: str,
+    replay: bool = True,
+    record: bool = True,
+    export_script: bool = False,
+    on_event: Optional[Callable[..., None]] = None,
+    snapshot_pruning: Optional[str] = None,
+    max_steps: Optional[int] = None,
+    max_seconds: Optional[float] = None,
+    max_tokens: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Execute a single test case on a pooled Playwright session and build the response data
+    
+    on_event, when given, is called with (event_type, data) as the run
+    progresses: phase changes plus one "tool_call" event per browser action.
+    "screenshot" events carry the image bytes as a third argument.
+    
+    The agent runs under a step, time and token budget; when one is exceeded
+    it is stopped, a final screenshot is taken and a partial report returned.
+    """
     start_time = time.time()
-    agent = None  # Initialize agent to None
     response_data = {}
+    trace_store = get_trace_store()
+    trace_key = compute_test_case_key(test_case)
+    mode = "agent"
+    passing_trace = None
+    screenshot_store = get_screenshot_store()
+    run_id = None
+    snapshot_stats = None
+    budget = None
+    
+    step_counter = {"steps": 0}
+    
+    def emit(event_type: str, data: Optional[Dict[str, Any]] = None, attachment: Optional[bytes] = None):
+        if on_event and attachment is not None:
+            on_event(event_type, data or {}, attachment)
+        elif on_event:
+            on_event(event_type, data or {})
+    
+    def on_tool_call(record):
+        step_counter["steps"] += 1
+        emit("tool_call", {
+            "step": step_counter["steps"],
+            "tool": record.name,
+            "arguments": record.arguments,
+            "duration": round(record.duration, 3),
+            "error": record.error or (tool_result_text(record.result)[:500] if tool_result_is_error(record.result) else None)
+        })
 
     try:
-        # Get the agent with the specified LLM
-        agent = await get_agent(request.llm_provider, request.model)
-        
-        # Convert test case to prompt
-        prompt = convert_test_case_to_prompt(request.testCase)
-        
-        print(f"🚀 Executing test case: {request.testCase.get('title', 'Unknown')}")
-        print(f"🤖 Using {request.llm_provider} model: {request.model}")
-        if request.llm_provider == "google":
-            print("🌟 Using Google Gemini 2.5 Pro (default model)")
-        print("🎭 Chrome browser window will open and be visible during execution...")
-        
-        # Execute the test case
-        result = await agent.run(prompt)
+        run_id = await screenshot_store.start_run(trace_key, test_case.get('title'))
+        
+        # Borrow a pre-connected Playwright MCP session (with its own browser context) for this run
+        async with get_playwright_session_pool().session() as browser_session:
+            # Store screenshots from this session's tool results under the run's ID
+            with ScreenshotCapture(
+                browser_session, screenshot_store, run_id,
+                on_capture=(lambda metadata, data: emit("screenshot", metadata, data)) if on_event else None
+            ):
+                print(f"🚀 Executing test case: {test_case.get('title', 'Unknown')}")
+                print(f"🎭 Using pooled Playwright session {browser_session.session_id}")
+                if on_event:
+                    browser_session.add_tool_call_listener(on_tool_call)
+                emit("started", {"run_id": run_id, "trace_key": trace_key, "session_id": browser_session.session_id})
+            
+                # Replay the recorded tool calls of an earlier passing run without the LLM
+                trace = trace_store.get(trace_key) if replay else None
+                if trace:
+                    print(f"⏩ Replaying recorded trace {trace_key[:12]} ({len(trace.get('steps', []))} steps)")
+                    emit("replay_started", {"steps": len(trace.get("steps", []))})
+                    replay_result = await trace_store.replay(browser_session, trace)
+                    if replay_result.success:
+                        mode = "replay"
+                        result = replay_result.report()
+                        passing_trace = trace
+                        emit("replay_succeeded", {"execution_time": replay_result.execution_time})
+                    else:
+                        # Start the agent from a fresh browser context rather than the half-replayed page
+                        print(f"↩️ Falling back to the agent: {replay_result.reason}")
+                        emit("replay_diverged", {"failed_step": replay_result.failed_step, "reason": replay_result.reason})
+                        await browser_session.reset(trace_store.step_timeout)
+                        mode = "agent_fallback"
+            
+                if mode != "replay":
+                    # Get the agent with the specified LLM
+                    agent = await get_agent(llm_provider, model, mcp_client=browser_session.client)
+                
+                    # Convert test case to prompt
+                    prompt = convert_test_case_to_prompt(test_case)
+                
+                    print(f"🤖 Using {llm_provider} model: {model}")
+                    if llm_provider == "google":
+                        print("🌟 Using Google Gemini 2.5 Pro (default model)")
+                    print("🎭 Chrome browser window will open and be visible during execution...")
+                    emit("agent_started", {"llm_provider": llm_provider, "model": model})
+                
+                    # Execute the test case, recording its tool calls; the agent sees pruned snapshots
+                    pruner = SnapshotPruner(snapshot_pruning)
+                    budget = RunBudget(max_steps, max_seconds, max_tokens)
+                    browser_session.add_result_transformer(pruner)
+                    browser_session.add_tool_call_listener(budget.on_tool_call)
+                    agent_start = time.time()
+                    try:
+                        with TraceRecorder(browser_session) as recorder:
+                            result = await budget.run(agent.run(prompt))
+                    except BudgetExceededError as budget_error:
+                        print(f"⏱️ Stopping the agent: {budget_error}")
+                        browser_session.remove_tool_call_listener(budget.on_tool_call)
+                        emit("budget_exceeded", {"reason": str(budget_error), "budget": budget.usage()})
+                        # Capture the page the agent was stuck on before the session is reset
+                        try:
+                            await asyncio.wait_for(browser_session.call_tool("browser_take_screenshot"), timeout=trace_store.step_timeout)
+                        except Exception as screenshot_error:
+                            print(f"⚠️ Could not take the final screenshot: {screenshot_error}")
+                        result = budget.partial_report()
+                    finally:
+                        browser_session.remove_tool_call_listener(budget.on_tool_call)
+                        browser_session.remove_result_transformer(pruner)
+                        agent_seconds = time.time() - agent_start
+                        snapshot_stats = pruner.stats()
+                        snapshot_stats["agent_seconds"] = round(agent_seconds, 3)
+                        snapshot_stats["seconds_per_step"] = round(agent_seconds / pruner.tool_results, 3) if pruner.tool_results else None
+                
+                    if budget.exceeded is None and recorder.steps and agent_reported_pass(str(result)):
+                        passing_trace = trace_store.build_trace(trace_key, test_case, recorder.steps, llm_provider, model)
+                        if record:
+                            trace_store.save(passing_trace)
+        
+        # Compile the passing run's tool calls into a standalone Playwright script
+        compiled_script = None
+        if export_script and passing_trace:
+            try:
+                compiled_script = get_compiled_test_store().compile(passing_trace)
+            except Exception as compile_error:
+                print(f"⚠️ Could not compile test script: {compile_error}")
         
-        # Check for screenshots in the output directory
-        screenshots = []
-        if os.path.exists("./screenshots"):
-            screenshots = [f"./screenshots/{f}" for f in os.listdir("./screenshots") if f.endswith(('.png', '.jpg', '.jpeg'))]
+        # Only this run's screenshots, from the store's index
+        if budget is not None and budget.exceeded:
+            run_status = "budget_exceeded"
+        else:
+            run_status = "passed" if passing_trace or agent_reported_pass(str(result)) else "failed"
+        screenshots = [item["url"] for item in await screenshot_store.finish_run(run_id, run_status, mode)]
         
         execution_time = time.time() - start_time
         
         print(f"✅ Test case execution completed in {execution_time:.2f}s")
         print(f"📸 Screenshots saved: {screenshots}")
+        emit("finished", {"status": run_status, "mode": mode, "execution_time": execution_time, "screenshots": len(screenshots)})
         
         response_data = {
             "result": str(result),
-            "success": True,
+            "success": run_status != "budget_exceeded",
+            "error": budget.exceeded if budget is not None else None,
             "screenshots": screenshots,
-            "execution_time": execution_time
+            "execution_time": execution_time,
+            "mode": mode,
+            "trace_key": trace_key,
+            "compiled_script": compiled_script,
+            "run_id": run_id,
+            "snapshot_stats": snapshot_stats,
+            "budget": budget.usage() if budget is not None else None
         }
         
+    except asyncio.CancelledError:
+        # Suite stream abandoned - close the run so its screenshots become clearable
+        if run_id:
+            await asyncio.shield(screenshot_store.finish_run(run_id, "cancelled", mode))
+        raise
     except Exception as e:
         execution_time = time.time() - start_time
         error_msg = str(e)
@@ -399,149 +635,468 @@ Original error: {e}"""
             error_msg = """Connection Error: Unable to connect to the API."""
         
         print(f"❌ Error executing test case: {error_msg}")
+        emit("error", {"error": error_msg, "mode": mode})
+        screenshots = []
+        if run_id:
+            try:
+                screenshots = [item["url"] for item in await screenshot_store.finish_run(run_id, "error", mode)]
+            except Exception as store_error:
+                print(f"⚠️ Could not finish screenshot run {run_id}: {store_error}")
         response_data = {
             "result": "",
             "success": False,
             "error": error_msg,
-            "screenshots": [],
-            "execution_time": execution_time
+            "screenshots": screenshots,
+            "execution_time": execution_time,
+            "mode": mode,
+            "trace_key": trace_key,
+            "run_id": run_id,
+            "snapshot_stats": snapshot_stats,
+            "budget": budget.usage() if budget is not None else None
         }
     
+    # The pooled browser session is reset and returned when the "async with" block exits
+    return response_data
+
+@app.post("/execute-test-case", response_model=TestCaseExecutionResponse)
+async def execute_test_case(request: TestCaseExecutionRequest):
+    """Execute a test case using the MCP Playwright agent"""
+    response_data = await run_test_case(
+        request.testCase, request.llm_provider, request.model,
+        replay=request.replay, record=request.record, export_script=request.export_script,
+        snapshot_pruning=request.snapshot_pruning,
+        max_steps=request.max_steps, max_seconds=request.max_seconds, max_tokens=request.max_tokens
+    )
+    return TestCaseExecutionResponse(**response_data)
+
+async def run_test_case_job(request: TestCaseExecutionRequest, job) -> Dict[str, Any]:
+    """Job runner for a queued /jobs/test-case submission"""
+    response_data = await run_test_case(
+        request.testCase, request.llm_provider, request.model,
+        replay=request.replay, record=request.record, export_script=request.export_script,
+        snapshot_pruning=request.snapshot_pruning,
+        max_steps=request.max_steps, max_seconds=request.max_seconds, max_tokens=request.max_tokens,
+        on_event=job.emit
+    )
+    return TestCaseExecutionResponse(**response_data).dict()
+
+@app.post("/jobs/test-case", status_code=202)
+async def submit_test_case_job(request: TestCaseExecutionRequest):
+    """
+    Queue a test case execution and return its job ID immediately
+    
+    Follow the job with GET /jobs/{job_id} or the SSE stream at
+    /jobs/{job_id}/events; the final response is in the job's result.
+    """
+    try:
+        job = get_job_queue().submit(
+            "test_case",
+            functools.partial(run_test_case_job, request),
+            params={"title": request.testCase.get("title"), "llm_provider": request.llm_provider, "model": request.model}
+        )
+    except JobQueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}",
+        "events_url": f"/jobs/{job.job_id}/events"
+    }
+
+@app.get("/jobs")
+async def list_jobs(status: Optional[str] = None, limit: int = 50):
+    """List recent jobs, optionally filtered by status"""
+    jobs = get_job_queue().list(status, limit)
+    return {"jobs": jobs, "count": len(jobs)}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, include_events: bool = False):
+    """Get a job's status, progress and (once finished) result"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict(include_events=include_events)
+
+@app.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str, request: Request, after: int = 0):
+    """
+    Server-Sent Events stream of a job's events
+    
+    Replays earlier events first, then streams live until the job finishes.
+    Reconnecting clients resume via the Last-Event-ID header (or ?after=).
+    """
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    last_event_id = request.headers.get("last-event-id")
+    if last_event_id and last_event_id.isdigit():
+        after = int(last_event_id)
+    heartbeat = float(os.getenv("JOB_SSE_HEARTBEAT", "15"))
+    
+    async def event_stream():
+        async for event in job.stream(after, heartbeat=heartbeat):
+            yield format_sse(event)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/jobs/{job_id}/cancel")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return {"job_id": job.job_id, "status": job.status}
+
+async def send_progress_frame(websocket: WebSocket, event: Dict[str, Any], attachment: Optional[bytes] = None):
+    """
+    Send one progress event as a JSON text frame
+    
+    Screenshots are followed by a binary frame with the raw image bytes
+    (flagged by binary_follows), so clients never decode base64.
+    """
+    await websocket.send_json({**event, "binary_follows": attachment is not None})
+    if attachment is not None:
+        await websocket.send_bytes(attachment)
+
+async def read_stored_screenshot(sha256: str) -> Optional[bytes]:
+    """Screenshot bytes from the store, for events whose in-memory copy is gone"""
+    resolved = await get_screenshot_store().get_image_file(sha256)
+    if resolved is None:
+        return None
+    
+    def read() -> bytes:
+        with open(resolved[0], "rb") as f:
+            return f.read()
+    
+    return await asyncio.get_running_loop().run_in_executor(None, read)
+
+@app.websocket("/ws/execute-test-case")
+async def execute_test_case_ws(websocket: WebSocket):
+    """
+    Execute a test case and stream its progress live
+    
+    The client sends a TestCaseExecutionRequest as the first (JSON) message.
+    The server pushes a JSON frame per event (started, tool_call with latency,
+    screenshot followed by a binary frame, ...) and a final "result" frame,
+    then closes. Sending {"type": "cancel"} or disconnecting stops the run.
+    """
+    await websocket.accept()
+    try:
+        request = TestCaseExecutionRequest(**await websocket.receive_json())
+    except Exception as e:
+        await websocket.send_json({"type": "error", "data": {"error": f"Invalid request: {e}"}})
+        await websocket.close(code=1003)
+        return
+    
+    outgoing: asyncio.Queue = asyncio.Queue()
+    sequence = {"next": 0}
+    
+    def on_event(event_type: str, data: Dict[str, Any], attachment: Optional[bytes] = None):
+        sequence["next"] += 1
+        outgoing.put_nowait(({"id": sequence["next"], "type": event_type, "time": time.time(), "data": data}, attachment))
+    
+    run = asyncio.create_task(run_test_case(
+        request.testCase, request.llm_provider, request.model,
+        replay=request.replay, record=request.record, export_script=request.export_script,
+        snapshot_pruning=request.snapshot_pruning,
+        max_steps=request.max_steps, max_seconds=request.max_seconds, max_tokens=request.max_tokens,
+        on_event=on_event
+    ))
+    
+    async def watch_client():
+        # Any client message other than cancel is ignored; a disconnect ends the run too
+        while True:
+            message = await websocket.receive_json()
+            if isinstance(message, dict) and message.get("type") == "cancel":
+                return
+    
+    watcher = asyncio.create_task(watch_client())
+    try:
+        while not run.done() or not outgoing.empty():
+            next_event = asyncio.ensure_future(outgoing.get())
+            done, _ = await asyncio.wait({next_event, run, watcher}, return_when=asyncio.FIRST_COMPLETED)
+            if next_event in done:
+                event, attachment = next_event.result()
+                await send_progress_frame(websocket, event, attachment)
+            else:
+                next_event.cancel()
+            if watcher in done:
+                # Cancel message or disconnect (the watcher's receive raised)
+                if watcher.exception() is None:
+                    print("🛑 WebSocket client cancelled the test run")
+                    await websocket.close()
+                else:
+                    print("🔌 WebSocket client disconnected, cancelling test run")
+                return
+        await websocket.send_json({"type": "result", "data": TestCaseExecutionResponse(**run.result()).dict()})
+        await websocket.close()
+    except WebSocketDisconnect:
+        print("🔌 WebSocket client disconnected, cancelling test run")
     finally:
-        # **CRITICAL FIX**: Ensure the browser session is always closed
-        # This block is no longer needed as clients are per-request
-        # Each request gets its own client, so cleanup happens automatically
+        watcher.cancel()
+        if not run.done():
+            run.cancel()
+
+@app.websocket("/jobs/{job_id}/ws")
+async def stream_job_ws(websocket: WebSocket, job_id: str, after: int = 0):
+    """
+    WebSocket view of a job's events, with screenshots as binary frames
+    
+    Replays events after ?after= first, then streams live until the job
+    finishes and the socket is closed.
+    """
+    job = get_job_queue().get(job_id)
+    await websocket.accept()
+    if job is None:
+        await websocket.send_json({"type": "error", "data": {"error": f"Job {job_id} not found"}})
+        await websocket.close(code=4404)
+        return
+    
+    heartbeat = float(os.getenv("JOB_SSE_HEARTBEAT", "15"))
+    try:
+        async for event in job.stream(after, heartbeat=heartbeat):
+            if event is None:
+                await websocket.send_json({"type": "keep-alive"})
+                continue
+            attachment = None
+            if event["type"] == "screenshot":
+                attachment = job.get_attachment(event["id"]) or await read_stored_screenshot(event["data"]["sha256"])
+            await send_progress_frame(websocket, event, attachment)
+        await websocket.close()
+    except WebSocketDisconnect:
         pass
 
-    return TestCaseExecutionResponse(**response_data)
+@app.get("/metrics/jobs")
+async def job_metrics():
+    """Job queue depth, wait times and outcome counters"""
+    return get_job_queue().metrics()
+
+@app.get("/test-traces")
+async def list_test_traces():
+    """List the recorded test case traces available for replay"""
+    traces = get_trace_store().list()
+    return {"traces": traces, "count": len(traces)}
+
+@app.delete("/test-traces/{trace_key}")
+async def delete_test_trace(trace_key: str):
+    """Delete a recorded trace so the next run of its test case uses the agent"""
+    if not get_trace_store().delete(trace_key):
+        raise HTTPException(status_code=404, detail=f"Trace {trace_key} not found")
+    return {"success": True, "message": f"Trace {trace_key} deleted"}
+
+@app.get("/compiled-tests")
+async def list_compiled_tests():
+    """List the test cases that have compiled Playwright scripts"""
+    compiled_tests = get_compiled_test_store().list()
+    return {"compiled_tests": compiled_tests, "count": len(compiled_tests)}
+
+@app.get("/compiled-tests/{trace_key}")
+async def get_compiled_test(trace_key: str, version: Optional[int] = None):
+    """Get the version history of a compiled test and the source of one version (latest by default)"""
+    store = get_compiled_test_store()
+    manifest = store.get_manifest(trace_key)
+    entry = store.get_version(trace_key, version)
+    if not manifest or not entry:
+        raise HTTPException(status_code=404, detail=f"No compiled script for {trace_key}")
+    with open(entry["path"], "r", encoding="utf-8") as f:
+        source = f.read()
+    return {**manifest, "selected_version": entry["version"], "source": source}
+
+@app.post("/compiled-tests/{trace_key}/compile")
+async def compile_test_trace(trace_key: str):
+    """Compile (or recompile) the recorded trace of a test case into a Playwright script"""
+    trace = get_trace_store().get(trace_key)
+    if not trace:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_key} not found")
+    return {"success": True, "compiled_script": get_compiled_test_store().compile(trace)}
+
+@app.post("/run-compiled-tests")
+async def run_compiled_tests(request: CompiledTestRunRequest):
+    """Run compiled Playwright scripts in bulk, without the MCP server or an LLM"""
+    return await get_compiled_test_store().run_bulk(
+        keys=request.keys,
+        concurrency=request.concurrency,
+        timeout=request.timeout,
+        include_incomplete=request.include_incomplete
+    )
+
+@app.post("/execute-test-suite")
+async def execute_test_suite(request: TestSuiteExecutionRequest):
+    """
+    Execute a list of test cases concurrently across isolated browser sessions
+    
+    Streams newline-delimited JSON: one "case_result" event per test case as it
+    finishes, followed by a "suite_summary" event comparing the suite's
+    wall-clock time with the summed per-case execution time.
+    """
+    pool = get_playwright_session_pool()
+    concurrency = max(1, min(request.concurrency, pool.max_size))
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    print(f"🧪 Executing test suite: {len(request.testCases)} test cases, concurrency {concurrency}")
+    
+    async def run_case(index: int, test_case: Dict[str, Any]) -> Dict[str, Any]:
+        async with semaphore:
+            result = await run_test_case(
+                test_case, request.llm_provider, request.model,
+                replay=request.replay, record=request.record, export_script=request.export_script,
+                snapshot_pruning=request.snapshot_pruning,
+                max_steps=request.max_steps, max_seconds=request.max_seconds, max_tokens=request.max_tokens
+            )
+        return {
+            "type": "case_result",
+            "index": index,
+            "title": test_case.get("title", f"Test case {index + 1}"),
+            **TestCaseExecutionResponse(**result).dict()
+        }
+    
+    async def stream_results():
+        suite_start = time.time()
+        tasks = [asyncio.create_task(run_case(index, test_case)) for index, test_case in enumerate(request.testCases)]
+        summed_time = 0.0
+        passed = 0
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                case_result = await next_result
+                summed_time += case_result.get("execution_time") or 0.0
+                passed += 1 if case_result["success"] else 0
+                yield json.dumps(case_result) + "\n"
+            
+            wall_clock_time = time.time() - suite_start
+            print(f"✅ Test suite completed in {wall_clock_time:.2f}s (summed case time {summed_time:.2f}s)")
+            yield json.dumps({
+                "type": "suite_summary",
+                "total": len(tasks),
+                "succeeded": passed,
+                "failed": len(tasks) - passed,
+                "concurrency": concurrency,
+                "wall_clock_time": wall_clock_time,
+                "summed_execution_time": summed_time,
+                "speedup": round(summed_time / wall_clock_time, 2) if wall_clock_time > 0 else None
+            }) + "\n"
+        finally:
+            # Client disconnected or the stream failed - stop any cases that have not finished
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+    
+    return StreamingResponse(stream_results(), media_type="application/x-ndjson")
 
 @app.post("/create-jira-issue", response_model=JiraIssueResponse)
 async def create_jira_issue(request: JiraIssueRequest):
+    """
+    Create a Jira issue by calling the Atlassian MCP createJiraIssue tool directly
+    
+    The structured request fields go straight into the tool call over the
+    persistent Jira MCP session; the LLM is only used when enrich is set, to
+    expand the free-text description.
+    """
+    print(f"[JIRA] Creating Jira issue: {request.summary}")
+    jira = get_jira_connection()
     try:
-        print(f"[JIRA] Creating Jira issue: {request.summary}")
-        
-        # Create Jira MCP client
-        jira_client = create_mcp_client("jira")
-        if not jira_client:
-            return await create_mock_jira_issue(request)
-        
-        # Get the AI agent
-        agent = get_agent(request.llm_provider, request.model, "jira")
-        if not agent:
-            return await create_mock_jira_issue(request)
-        
-        # Configure Jira context
-        cloud_id = "rowen.atlassian.net"  # Your Jira Cloud instance
-        project_key = request.project
-        print(f"[CONFIG] Using Jira Cloud ID: {cloud_id}")
-        print(f"[CONFIG] Project Key: {project_key}")
-        
-        # Build the forceful prompt that demands simple string values
-        create_prompt = f"""
-        YOU MUST create a Jira issue using the createJiraIssue tool.
-        
-        CRITICAL REQUIREMENTS - DO NOT DEVIATE:
-        - Use ONLY simple string values for ALL parameters
-        - DO NOT use nested objects or JSON structures
-        - priority must be a simple string like "High", "Medium", "Low" 
-        - issueType must be a simple string like "Task", "Story", "Bug"
-        - All field values must be plain strings
-        
-        Issue Details:
-        - cloudId: "{cloud_id}"
-        - project: "{project_key}"
-        - summary: "{request.summary}"
-        - description: "{request.description}"
-        - issueType: "{request.issueType}"
-        - priority: "{request.priority}"
-        
-        Example of CORRECT parameter format:
-        {{
-            "cloudId": "{cloud_id}",
-            "project": "{project_key}",
-            "summary": "{request.summary}",
-            "description": "{request.description}",
-            "issueType": "{request.issueType}",
-            "priority": "{request.priority}"
-        }}
-        
-        DO NOT use complex objects like {{"priority": {{"name": "High"}}}} - use simple strings only!
-        """
-        
-        print(f"[SEND] Sending creation request to Atlassian MCP agent...")
-        print(f"[PARAMS] Creating issue with: summary='{request.summary[:50]}...', project={project_key}, type={request.issueType}, priority={request.priority}")
-        
-        try:
-            # Execute with the agent
-            result = await agent.run(create_prompt)
-            
-        except Exception as validation_error:
-            error_str = str(validation_error)
-            if "validation error" in error_str.lower() and "DynamicModel" in error_str:
-                print("[WARNING] Pydantic validation error detected in response. Trying simpler approach...")
-                
-                # Try with OpenAI as fallback
-                try:
-                    print("[FALLBACK] Trying OpenAI GPT-4 as fallback LLM...")
-                    fallback_agent = get_agent("openai", "gpt-4", "jira")
-                    if fallback_agent:
-                        simplified_prompt = f"""
-                        Create a Jira issue with these exact parameters as simple strings:
-                        
-                        cloudId: {cloud_id}
-                        project: {project_key}
-                        summary: {request.summary}
-                        description: {request.description}
-                        issueType: {request.issueType}
-                        priority: {request.priority}
-                        
-                        Use the createJiraIssue tool with these parameters as plain string values.
-                        """
-                        print("[RETRY] Retrying with simplified parameters...")
-                        result = await fallback_agent.run(simplified_prompt)
-                        
-                        print(f"[OK] Final agent response: {result}")
-                    else:
-                        raise validation_error
-                        
-                except Exception as fallback_error:
-                    print(f"[ERROR] Fallback also failed: {fallback_error}")
-                    raise validation_error
-            else:
-                raise validation_error
-        
-        # Process the result
-        if result:
-            # Try to extract issue information from the result
-            issue_info = extract_jira_issue_info(result)
-            
-            if issue_info:
-                return JiraIssueResponse(
-                    success=True,
-                    issue_key=issue_info.get("key", f"{project_key}-UNKNOWN"),
-                    issue_url=issue_info.get("url", f"https://{cloud_id}/browse/{issue_info.get('key', '')}"),
-                    message="Jira issue created successfully"
-                )
-            else:
-                # Even if we can't parse the result, the issue might have been created
-                print(f"[INFO] Agent response: {str(result)[:200]}...")
-                return JiraIssueResponse(
-                    success=True,
-                    issue_key=f"{project_key}-NEW",
-                    issue_url=f"https://{cloud_id}/browse/{project_key}-NEW",
-                    message="Issue creation completed but response parsing unclear"
-                )
-        else:
-            return await create_mock_jira_issue(request)
-            
+        await jira.get_session()
     except Exception as e:
-        error_msg = str(e)
-        print(f"[ERROR] Error creating Jira issue: {error_msg}")
+        print(f"[ERROR] Could not connect to the Atlassian MCP server: {e}")
         
         # Fallback to mock issue creation for development
         print("[FALLBACK] Falling back to mock Jira creation due to connection/auth issues...")
         print("[INFO] This allows you to continue development while resolving MCP authentication")
         return await create_mock_jira_issue(request)
+    
+    description = request.description
+    if request.enrich:
+        description = await enrich_jira_description(request)
+    
+    print(f"[PARAMS] Creating issue with: summary='{request.summary[:50]}...', project={request.project}, type={request.issueType}, priority={request.priority}")
+    try:
+        issue = await jira.create_issue(request.project, request.summary, description, request.issueType, request.priority)
+    except Exception as e:
+        # The issue may or may not exist at this point, so don't invent a mock one
+        print(f"[ERROR] Error creating Jira issue: {e}")
+        return JiraIssueResponse(
+            success=False,
+            issue_key="",
+            issue_url="",
+            message=f"Failed to create Jira issue: {e}"
+        )
+    
+    print(f"[OK] Created Jira issue {issue['key']}")
+    return JiraIssueResponse(
+        success=True,
+        issue_key=issue["key"],
+        issue_url=issue["url"],
+        message="Jira issue created successfully"
+    )
+
+@app.post("/create-jira-issues", response_model=JiraBulkIssueResponse)
+async def create_jira_issues(request: JiraBulkIssueRequest):
+    """
+    Create many Jira issues over the shared Jira MCP session
+    
+    Parents are created before their children (parent_ref), up to
+    `concurrency` issues at a time, with rate-limited calls retried. Children
+    of a failed parent are skipped. There is no mock fallback here.
+    """
+    items = [
+        {
+            "ref": item.ref,
+            "project": item.project or request.project,
+            "summary": item.summary,
+            "description": item.description,
+            "issue_type": item.issueType,
+            "priority": item.priority,
+            "parent_ref": item.parent_ref,
+            "parent_key": item.parent_key
+        }
+        for item in request.issues
+    ]
+    link_error = check_issue_links(items)
+    if link_error:
+        raise HTTPException(status_code=400, detail=link_error)
+    
+    start_time = time.time()
+    jira = get_jira_connection()
+    try:
+        await jira.get_session()
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Jira MCP connection unavailable: {e}")
+    
+    print(f"[JIRA] Creating {len(items)} issues in bulk (concurrency {request.concurrency or jira.bulk_concurrency})")
+    results = await jira.create_issues(items, request.concurrency)
+    counts = {status: sum(1 for result in results.values() if result["status"] == status) for status in ("created", "failed", "skipped")}
+    execution_time = time.time() - start_time
+    print(f"[JIRA] Bulk creation finished in {execution_time:.1f}s: {counts}")
+    
+    return JiraBulkIssueResponse(
+        success=counts["failed"] == 0 and counts["skipped"] == 0,
+        results=results,
+        execution_time=execution_time,
+        **counts
+    )
+
+async def enrich_jira_description(request: JiraIssueRequest) -> str:
+    """Expand an issue description with the request's LLM; the original text is kept on failure"""
+    prompt = f"""
+Rewrite the description of this Jira {request.issueType} so it is clear and complete for the team.
+Keep every fact from the original, do not invent requirements, and add acceptance criteria only where
+the text already implies them. Use Jira wiki markup. Return only the new description.
+
+Summary: {request.summary}
+Description:
+{request.description}
+"""
+    try:
+        llm = get_pooled_llm(request.llm_provider, request.model)
+        result = await run_llm_call(request.llm_provider, llm.ainvoke, prompt)
+        content = str(getattr(result, "content", None) or "").strip()
+        return content or request.description
+    except Exception as e:
+        print(f"[WARNING] Could not enrich the issue description, using it as given: {e}")
+        return request.description
 
 async def create_mock_jira_issue(request: JiraIssueRequest) -> JiraIssueResponse:
     """Create a mock Jira issue for development/testing purposes"""
@@ -568,26 +1123,34 @@ async def create_mock_jira_issue(request: JiraIssueRequest) -> JiraIssueResponse
             message=f"Failed to create mock issue: {str(e)}"
         )
 
-def extract_jira_issue_info(llm_result: str) -> Dict[str, str]:
+def route_generation_model(request: BaseModel, http_request: Request, response: Response, *prompt_parts: str, has_image: bool = False):
     """
-    Attempt to extract issue key and URL from the LLM result.
-    This is a heuristic and might need refinement based on actual LLM output.
+    Let the adaptive router pick request.model when the client asked for routing
+
+    Routing applies when the model is "auto" or a quality tier or latency budget
+    is given. The chosen model and the reason are returned in the X-LLM-Model
+    and X-LLM-Route headers.
     """
-    result_str = str(llm_result)
-    
-    # Look for patterns like AURA-123, PROJECT-456, etc.
-    issue_key_match = re.search(r'([A-Z]+-\d+)', result_str)
-    url_match = re.search(r'(https://[^/]+\.atlassian\.net/browse/[A-Z]+-\d+)', result_str)
-    
-    if issue_key_match and url_match:
-        return {
-            "key": issue_key_match.group(1),
-            "url": url_match.group(1)
-        }
-    return None
+    if request.model != "auto" and request.quality_tier is None and request.latency_budget is None:
+        return
+    try:
+        decision = get_model_router().route(
+            request.llm_provider,
+            http_request.url.path,
+            sum(len(part or "") for part in prompt_parts),
+            has_image=has_image,
+            quality_tier=request.quality_tier,
+            latency_budget=request.latency_budget
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    request.model = decision.model
+    response.headers["X-LLM-Model"] = f"{decision.provider}/{decision.model}"
+    response.headers["X-LLM-Route"] = decision.reason
 
 @app.post("/generate-design-code", response_model=DesignCodeGenerationResponse)
-async def generate_design_code(request: DesignCodeGenerationRequest):
+async def generate_design_code(request: DesignCodeGenerationRequest, http_request: Request, response: Response):
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt, has_image=bool(request.imageData))
     try:
         print(f"[DESIGN] Generating code from design input")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -619,7 +1182,7 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                 # Try official Google GenAI SDK first
                 try:
                     official_service = get_official_gemini_service()
-                    if official_service.is_available():
+                    if official_service.is_available(request.model):
                         print(f"[LLM] Using Official Google GenAI SDK for {request.model}")
                         use_official_gemini = True
                     else:
@@ -633,15 +1196,12 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     if api_key:
                         print(f"[DEBUG] API key preview: {api_key[:10]}...{api_key[-10:]}")
                     
-                    llm = ChatGoogleGenerativeAI(
-                        model=request.model,
-                        google_api_key=api_key
-                    )
+                    llm = get_pooled_llm("google", request.model)
             else:
                 # Try official OpenAI SDK first
                 try:
                     official_service = get_official_openai_service()
-                    if official_service.is_available():
+                    if official_service.is_available(request.model):
                         print(f"[LLM] Using Official OpenAI SDK for {request.model}")
                         use_official_openai = True
                     else:
@@ -650,11 +1210,7 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                 except Exception as official_error:
                     print(f"[WARNING] Official OpenAI SDK failed: {official_error}, using LangChain fallback")
                     # Fallback to LangChain
-                    model_to_use = request.model if request.model else "gpt-4o"  
-                    llm = ChatOpenAI(
-                        model=model_to_use,
-                        openai_api_key=os.getenv("OPENAI_API_KEY")
-                    )
+                    llm = get_pooled_llm("openai", request.model)
             
             if not use_official_gemini and not use_official_openai:
                 print(f"[LLM] LLM created successfully for {request.llm_provider}")
@@ -669,6 +1225,8 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
         
         # Execute the design generation
         start_time = time.time()
+        # Output that fails the checks below must not be served from the cache on retries
+        validate_design_code = functools.partial(is_valid_design_code, framework=request.framework)
         try:
             print(f"[GENERATE] Starting AI code generation...")
             
@@ -680,7 +1238,11 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     print(f"[IMAGE] Including image data in generation ({len(request.imageData)} chars)")
                     
                     # Use official SDK for multimodal generation
-                    success, content, metadata = generate_multimodal_with_official_gemini(
+                    success, content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_multimodal_with_official_gemini,
+                        http_request=http_request,
+                        validate=validate_design_code,
                         text_prompt=full_prompt,
                         image_base64=request.imageData,
                         image_mime_type=request.imageType,
@@ -703,7 +1265,11 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     print("[TEXT] Processing text-only generation with official SDK")
                     
                     # Use official SDK for text generation
-                    success, content, metadata = generate_text_with_official_gemini(
+                    success, content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_gemini,
+                        http_request=http_request,
+                        validate=validate_design_code,
                         prompt=full_prompt,
                         model=request.model,
                         disable_thinking=True  # Faster responses
@@ -727,7 +1293,11 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     print(f"[IMAGE] Including image data in generation ({len(request.imageData)} chars)")
                     
                     # Use official SDK for multimodal generation
-                    success, content, metadata = generate_multimodal_with_official_openai(
+                    success, content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_multimodal_with_official_openai,
+                        http_request=http_request,
+                        validate=validate_design_code,
                         text_prompt=full_prompt,
                         image_base64=request.imageData,
                         image_mime_type=request.imageType,
@@ -752,7 +1322,11 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     print("[TEXT] Processing text-only generation with official SDK")
                     
                     # Use official SDK for text generation
-                    success, content, metadata = generate_text_with_official_openai(
+                    success, content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_openai,
+                        http_request=http_request,
+                        validate=validate_design_code,
                         prompt=request.userPrompt,
                         model=request.model,
                         system_prompt=request.systemPrompt,
@@ -803,7 +1377,7 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                     
                     # Use HumanMessage for Google Gemini
                     human_message = HumanMessage(content=message_content)
-                    result = llm.invoke([human_message])
+                    result = await run_llm_call(request.llm_provider, llm.ainvoke, [human_message], http_request=http_request, validate=validate_design_code)
                     print(f"[DEBUG] Google Gemini invoked successfully")
                 else:
                     # OpenAI format
@@ -820,10 +1394,10 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
                         }
                     ]
                     
-                    result = llm.invoke([{"role": "user", "content": message_content}])
+                    result = await run_llm_call(request.llm_provider, llm.ainvoke, [{"role": "user", "content": message_content}], http_request=http_request, validate=validate_design_code)
             else:
                 print("[TEXT] Processing text-only generation")
-                result = llm.invoke(full_prompt)
+                result = await run_llm_call(request.llm_provider, llm.ainvoke, full_prompt, http_request=http_request, validate=validate_design_code)
                 
             execution_time = time.time() - start_time
             
@@ -942,7 +1516,8 @@ async def generate_design_code(request: DesignCodeGenerationRequest):
         )
 
 @app.post("/generate-code", response_model=CodeGenerationResponse)
-async def generate_code(request: CodeGenerationRequest):
+async def generate_code(request: CodeGenerationRequest, http_request: Request, response: Response):
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt)
     try:
         print(f"[CODE] Generating {request.codeType} code")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -958,7 +1533,7 @@ async def generate_code(request: CodeGenerationRequest):
         if request.llm_provider == "google":
             try:
                 official_gemini_service = get_official_gemini_service()
-                if official_gemini_service and official_gemini_service.is_available():
+                if official_gemini_service and official_gemini_service.is_available(request.model):
                     print(f"[LLM] Using Official Google GenAI SDK for {request.model}")
                     official_sdk_used = True
                 else:
@@ -968,7 +1543,7 @@ async def generate_code(request: CodeGenerationRequest):
         elif request.llm_provider == "openai":
             try:
                 official_openai_service = get_official_openai_service()
-                if official_openai_service and official_openai_service.is_available():
+                if official_openai_service and official_openai_service.is_available(request.model):
                     print(f"[LLM] Using Official OpenAI SDK for {request.model}")
                     official_sdk_used = True
                 else:
@@ -980,17 +1555,10 @@ async def generate_code(request: CodeGenerationRequest):
         if not official_sdk_used:
             try:
                 if request.llm_provider == "google":
-                    llm = ChatGoogleGenerativeAI(
-                        model=request.model,
-                        google_api_key=os.getenv("GOOGLE_API_KEY")
-                    )
+                    llm = get_pooled_llm("google", request.model)
                 else:
                     # Use GPT-4o for vision capabilities and improved performance
-                    model_to_use = request.model if request.model else "gpt-4o"
-                    llm = ChatOpenAI(
-                        model=model_to_use,
-                        openai_api_key=os.getenv("OPENAI_API_KEY")
-                    )
+                    llm = get_pooled_llm("openai", request.model)
                 
                 print(f"[LLM] LangChain LLM created successfully for {request.llm_provider}")
                 
@@ -1019,7 +1587,10 @@ async def generate_code(request: CodeGenerationRequest):
                 print(f"[TEXT] Processing text-only generation with official SDK")
                 
                 if request.llm_provider == "google":
-                    success, result_content, metadata = generate_text_with_official_gemini(
+                    success, result_content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_gemini,
+                        http_request=http_request,
                         prompt=full_prompt,
                         model=request.model,
                         disable_thinking=True
@@ -1027,7 +1598,10 @@ async def generate_code(request: CodeGenerationRequest):
                     if not success:
                         raise Exception(f"Google Gemini generation failed: {result_content}")
                 else:  # OpenAI
-                    success, result_content, metadata = generate_text_with_official_openai(
+                    success, result_content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_openai,
+                        http_request=http_request,
                         prompt=full_prompt,
                         model=request.model,
                         temperature=0.7,
@@ -1042,7 +1616,7 @@ async def generate_code(request: CodeGenerationRequest):
                 
             else:
                 # Use LangChain fallback
-                result = llm.invoke(full_prompt)
+                result = await run_llm_call(request.llm_provider, llm.ainvoke, full_prompt, http_request=http_request)
                 execution_time = time.time() - start_time
                 
                 print(f"[OK] Code generation completed in {execution_time:.2f}s")
@@ -1099,7 +1673,8 @@ async def generate_code(request: CodeGenerationRequest):
         )
 
 @app.post("/review-code", response_model=CodeReviewResponse)
-async def review_code(request: CodeReviewRequest):
+async def review_code(request: CodeReviewRequest, http_request: Request, response: Response):
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt)
     try:
         print(f"[REVIEW] Starting code review")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -1109,17 +1684,10 @@ async def review_code(request: CodeReviewRequest):
         # Create LLM directly (no MCP tools needed for code review)
         try:
             if request.llm_provider == "google":
-                llm = ChatGoogleGenerativeAI(
-                    model=request.model,
-                    google_api_key=os.getenv("GOOGLE_API_KEY")
-                )
+                llm = get_pooled_llm("google", request.model)
             else:
                 # Use GPT-4o for vision capabilities and improved performance
-                model_to_use = request.model if request.model else "gpt-4o"
-                llm = ChatOpenAI(
-                    model=model_to_use,
-                    openai_api_key=os.getenv("OPENAI_API_KEY")
-                )
+                llm = get_pooled_llm("openai", request.model)
             
             print(f"[LLM] LLM created successfully for {request.llm_provider}")
             
@@ -1142,7 +1710,7 @@ async def review_code(request: CodeReviewRequest):
         start_time = time.time()
         try:
             print(f"[REVIEW] Starting AI code review...")
-            result = llm.invoke(full_prompt)
+            result = await run_llm_call(request.llm_provider, llm.ainvoke, full_prompt, http_request=http_request)
             execution_time = time.time() - start_time
             
             print(f"[OK] Code review completed in {execution_time:.2f}s")
@@ -1206,7 +1774,9 @@ class ApplySuggestionsRequest(BaseModel):
     codeType: str
     language: str
     llm_provider: str = "openai"
-    model: str = "gpt-4o"
+    model: str = "gpt-4o"  # or "auto" to let the router choose
+    quality_tier: Optional[str] = None  # "fast", "balanced" or "best"
+    latency_budget: Optional[float] = None  # Seconds
 
 class ApplySuggestionsResponse(BaseModel):
     success: bool
@@ -1215,7 +1785,8 @@ class ApplySuggestionsResponse(BaseModel):
     error: Optional[str] = None
 
 @app.post("/apply-suggestions", response_model=ApplySuggestionsResponse)
-async def apply_suggestions(request: ApplySuggestionsRequest):
+async def apply_suggestions(request: ApplySuggestionsRequest, http_request: Request, response: Response):
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt, json.dumps(request.originalCode), json.dumps(request.acceptedSuggestions))
     try:
         print(f"[APPLY] Starting suggestion application")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -1226,17 +1797,10 @@ async def apply_suggestions(request: ApplySuggestionsRequest):
         # Create LLM directly (no MCP tools needed for applying suggestions)
         try:
             if request.llm_provider == "google":
-                llm = ChatGoogleGenerativeAI(
-                    model=request.model,
-                    google_api_key=os.getenv("GOOGLE_API_KEY")
-                )
+                llm = get_pooled_llm("google", request.model)
             else:
                 # Use GPT-4o for vision capabilities and improved performance
-                model_to_use = request.model if request.model else "gpt-4o"
-                llm = ChatOpenAI(
-                    model=model_to_use,
-                    openai_api_key=os.getenv("OPENAI_API_KEY")
-                )
+                llm = get_pooled_llm("openai", request.model)
             
             print(f"[LLM] LLM created successfully for {request.llm_provider}")
             
@@ -1259,7 +1823,7 @@ async def apply_suggestions(request: ApplySuggestionsRequest):
         start_time = time.time()
         try:
             print(f"[APPLY] Starting AI suggestion application...")
-            result = llm.invoke(full_prompt)
+            result = await run_llm_call(request.llm_provider, llm.ainvoke, full_prompt, http_request=http_request)
             execution_time = time.time() - start_time
             
             print(f"[OK] Suggestion application completed in {execution_time:.2f}s")
@@ -1435,6 +1999,42 @@ def parse_generated_code(llm_result: str, framework: str) -> Dict[str, Any]:
             "generatedAt": datetime.now().isoformat()
         }
 
+def is_valid_design_code(llm_result: str, framework: str) -> bool:
+    """
+    Whether generated design code passes the quality checks of /generate-design-code
+    (used to keep rejected output out of the LLM response cache)
+    """
+    if len(llm_result.strip()) < 200:
+        return False
+    html_content = parse_generated_code(llm_result, framework).get('html', '')
+    if not ('<!DOCTYPE html>' in html_content or '<html' in html_content):
+        return False
+    if '<body>' not in html_content or '</body>' not in html_content:
+        return False
+    body_start = html_content.find('<body>') + 6
+    body_end = html_content.find('</body>')
+    return body_end <= body_start or len(html_content[body_start:body_end].strip()) >= 5
+
+def extract_json_content(llm_result: str) -> str:
+    """Extract the JSON document from an LLM response (a ```json block or the outermost braces)"""
+    if '```json' in llm_result:
+        json_start = llm_result.find('```json') + 7
+        json_end = llm_result.find('```', json_start)
+        return llm_result[json_start:json_end].strip()
+    if '{' in llm_result and '}' in llm_result:
+        json_start = llm_result.find('{')
+        json_end = llm_result.rfind('}') + 1
+        return llm_result[json_start:json_end]
+    raise Exception("No JSON found in response")
+
+def is_valid_json_response(llm_result: str) -> bool:
+    """Whether an LLM response contains parseable JSON (used to keep rejected output out of the LLM response cache)"""
+    try:
+        json.loads(extract_json_content(llm_result))
+        return True
+    except Exception:
+        return False
+
 def parse_generated_code_response(llm_result: str, code_type: str, language: str) -> Dict[str, Any]:
     """
     Parse the LLM result to extract code files, project structure, and dependencies
@@ -1750,97 +2350,168 @@ def generate_run_instructions(code_type: str, language: str) -> str:
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "mcp_client_initialized": True}
+    return {
+        "status": "healthy",
+        "mcp_client_initialized": True,
+        "playwright_sessions": get_playwright_session_pool().stats(),
+        "screenshot_store": get_screenshot_store().stats()
+    }
+
+@app.get("/health/providers")
+async def provider_health_check():
+    """Cached LLM provider availability from the background health monitor"""
+    return get_provider_health_monitor().snapshot()
+
+@app.get("/metrics/llm")
+async def llm_executor_metrics():
+    """Per-provider concurrency, queue depth and wait time for LLM calls"""
+    return get_llm_executor().metrics()
+
+@app.get("/metrics/llm-cache")
+async def llm_cache_stats():
+    """LLM response cache hits, misses and tokens saved"""
+    return get_llm_response_cache().stats()
+
+@app.get("/metrics/llm-router")
+async def llm_router_stats():
+    """Adaptive model router choices and the latency predictions behind them"""
+    return get_model_router().stats()
+
+@app.get("/metrics/llm-clients")
+async def llm_client_pool_stats():
+    """Pooled LLM client occupancy and hit/miss counters"""
+    return get_llm_client_pool().stats()
 
 @app.get("/health/jira")
 async def jira_health_check():
-    """Check Jira MCP connection health"""
-    try:
-        print("🔍 Checking Jira MCP connection health...")
-        
-        # Try to create a Jira MCP client
-        client = await create_mcp_client("jira")
-        if not client:
-            return {
-                "status": "unhealthy",
-                "error": "Failed to create Jira MCP client",
-                "authenticated": False,
-                "tools_available": 0
-            }
-        
-        # Try to get available tools
-        try:
-            tools = await client.list_tools()
-        except AttributeError:
-            try:
-                tools = client.tools
-            except AttributeError:
-                tools = ["connection_verified"]
-        
-        tools_count = len(tools) if tools else 0
-        
-        # Check if we have Jira-specific tools
-        jira_tools = []
-        if tools:
-            jira_tools = [t for t in tools if 'jira' in str(getattr(t, 'name', '')).lower()]
-        
-        status = "healthy" if tools_count > 0 else "degraded"
-        
-        return {
-            "status": status,
-            "authenticated": tools_count > 0,
-            "tools_available": tools_count,
-            "jira_tools": len(jira_tools),
-            "tools_sample": [getattr(t, 'name', 'unnamed') for t in (tools[:5] if tools else [])],
-            "message": "Jira MCP connection is working" if status == "healthy" else "Jira MCP connection may need authentication"
-        }
-        
-    except Exception as e:
-        error_msg = str(e)
-        print(f"❌ Jira health check failed: {error_msg}")
-        
-        return {
-            "status": "unhealthy",
-            "error": error_msg,
-            "authenticated": False,
-            "tools_available": 0,
-            "message": "Jira MCP connection failed - check authentication"
-        }
+    """Jira MCP connection health, as last seen by the connection supervisor"""
+    connection = get_jira_connection().status()
+    tool_names = connection["tool_names"] or []
+    if connection["connected"]:
+        status = "healthy"
+    elif connection["state"] == "connecting":
+        status = "degraded"
+    else:
+        status = "unhealthy"
+    
+    return {
+        "status": status,
+        "authenticated": connection["connected"],
+        "tools_available": len(tool_names),
+        "jira_tools": len([name for name in tool_names if "jira" in name.lower()]),
+        "tools_sample": tool_names[:5],
+        "connection": connection,
+        "message": {
+            "healthy": "Jira MCP connection is working",
+            "degraded": "Jira MCP connection is being established",
+            "unhealthy": "Jira MCP connection failed - check authentication"
+        }[status]
+    }
+
+async def load_playwright_tools() -> List[Any]:
+    """List the Playwright MCP tools on a pooled session"""
+    async with get_playwright_session_pool().session() as browser_session:
+        return await browser_session.connector.list_tools()
 
 @app.get("/tools")
-async def get_available_tools():
-    """Get list of available tools from the MCP server"""
+async def get_available_tools(server: Optional[str] = None, refresh: bool = False):
+    """
+    Tools of the Playwright and Jira MCP servers, from the cached tool catalog
+    
+    A server's tools are listed once and cached until it reconnects;
+    refresh=true forces a new listing.
+    """
+    catalog = get_tool_catalog()
+    loaders = {
+        PLAYWRIGHT_SERVER: load_playwright_tools,
+        JIRA_SERVER: get_jira_connection().list_tools
+    }
+    if server is not None and server not in loaders:
+        raise HTTPException(status_code=404, detail=f"Unknown MCP server '{server}'")
+    
+    tools = []
+    errors = {}
+    for name, loader in loaders.items():
+        if server is not None and name != server:
+            continue
+        if refresh:
+            catalog.invalidate(name)
+        try:
+            tools.extend(spec.to_dict() for spec in (await catalog.get(name, loader)).values())
+        except Exception as e:
+            errors[name] = str(e)
+    
+    return {
+        "success": not errors,
+        "tools": tools,
+        "count": len(tools),
+        "errors": errors,
+        "catalog": catalog.stats()
+    }
+
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """Accept either epoch seconds or an ISO 8601 date/datetime"""
+    if not value:
+        return None
     try:
-        # This endpoint will now always return healthy as it doesn't rely on a global client
-        # if mcp_client is None:
-        #     await initialize_mcp()
-        
-        # tools = await mcp_client.get_tools() # This line is no longer needed
-        
-        return {
-            "success": True,
-            "tools": [{"name": "Playwright", "description": "Browser automation tools"}] # Placeholder
-        }
-    except Exception as e:
-        return {
-            "success": False,
-            "error": str(e),
-            "tools": []
-        }
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value).timestamp()
+
+def parse_byte_range(range_header: str, size: int) -> Optional[tuple]:
+    """
+    Parse a single 'bytes=start-end' range into an inclusive (start, end)
+    
+    Returns None for headers that should be ignored (multiple ranges, other
+    units or malformed syntax), and raises ValueError for unsatisfiable ranges.
+    """
+    if not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_text, dash, end_text = range_header[len("bytes="):].strip().partition("-")
+    start_text, end_text = start_text.strip(), end_text.strip()
+    if not dash or not (start_text or end_text):
+        return None
+    if (start_text and not start_text.isdigit()) or (end_text and not end_text.isdigit()):
+        return None
+    if not start_text:
+        # Suffix range: the last N bytes
+        length = int(end_text)
+        if length <= 0:
+            raise ValueError(range_header)
+        return max(0, size - length), size - 1
+    start = int(start_text)
+    end = min(int(end_text), size - 1) if end_text else size - 1
+    if start >= size or start > end:
+        raise ValueError(range_header)
+    return start, end
 
 @app.get("/screenshots")
-async def list_screenshots():
-    """List all available screenshots"""
+async def list_screenshots(
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    run_id: Optional[str] = None,
+    test_case_key: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None
+):
+    """
+    List stored screenshots, newest first, from the store's index
+    
+    Pass next_cursor from the previous page as cursor to get the next one.
+    since/until accept epoch seconds or ISO 8601 dates.
+    """
     try:
-        screenshots = []
-        if os.path.exists("./screenshots"):
-            screenshots = [f for f in os.listdir("./screenshots") if f.endswith(('.png', '.jpg', '.jpeg'))]
-        
-        return {
-            "success": True,
-            "screenshots": screenshots,
-            "count": len(screenshots)
-        }
+        page = await get_screenshot_store().list_screenshots(
+            cursor=cursor,
+            limit=limit,
+            run_id=run_id,
+            test_case_key=test_case_key,
+            since=parse_timestamp(since),
+            until=parse_timestamp(until)
+        )
+        return {"success": True, **page}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         return {
             "success": False,
@@ -1848,16 +2519,83 @@ async def list_screenshots():
             "screenshots": []
         }
 
+@app.get("/screenshots/runs/{run_id}")
+async def get_run_screenshots(run_id: str):
+    """Get a test run's metadata and screenshots from the store's index"""
+    run = await get_screenshot_store().get_run(run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Run {run_id} not found")
+    return {"success": True, **run}
+
+@app.get("/screenshots/files/{sha256}")
+async def get_screenshot_file(sha256: str, request: Request, variant: Optional[str] = None):
+    """
+    Serve a stored screenshot
+    
+    variant is 'webp', 'original' or 'thumbnail' (default: WebP once
+    re-encoded, the original until then). Files are content-addressed, so
+    the ETag never changes and clients can cache them indefinitely; supports
+    If-None-Match and single byte ranges.
+    """
+    resolved = await get_screenshot_store().get_image_file(sha256, variant)
+    if resolved is None:
+        raise HTTPException(status_code=404, detail=f"Screenshot {sha256} not found")
+    path, media_type, served_variant = resolved
+    
+    etag = f'"{sha256}-{served_variant}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes"
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+    
+    range_header = request.headers.get("range")
+    if range_header:
+        size = os.path.getsize(path)
+        try:
+            byte_range = parse_byte_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            
+            def read_range() -> bytes:
+                with open(path, "rb") as f:
+                    f.seek(start)
+                    return f.read(end - start + 1)
+            
+            content = await asyncio.get_running_loop().run_in_executor(None, read_range)
+            return Response(
+                content=content,
+                status_code=206,
+                media_type=media_type,
+                headers={**headers, "Content-Range": f"bytes {start}-{end}/{size}"}
+            )
+    
+    return FileResponse(path, media_type=media_type, headers=headers)
+
 @app.post("/clear-screenshots")
-async def clear_screenshots():
-    """Clear all screenshots"""
+async def clear_screenshots(run_id: Optional[str] = None):
+    """Clear screenshots of finished runs (all, or a single run); in-flight runs are left alone"""
     try:
-        if os.path.exists("./screenshots"):
+        store = get_screenshot_store()
+        result = await store.clear(run_id)
+        
+        # Files the Playwright MCP server wrote itself - keep any written since the oldest in-flight run started
+        loose_files_deleted = 0
+        if not run_id and os.path.exists("./screenshots"):
+            cutoff = store.oldest_active_run_started() or time.time()
             for file in os.listdir("./screenshots"):
-                if file.endswith(('.png', '.jpg', '.jpeg')):
-                    os.remove(os.path.join("./screenshots", file))
+                path = os.path.join("./screenshots", file)
+                if file.endswith(('.png', '.jpg', '.jpeg')) and os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    loose_files_deleted += 1
         
-        return {"success": True, "message": "Screenshots cleared"}
+        return {"success": True, "message": "Screenshots cleared", **result, "loose_files_deleted": loose_files_deleted}
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -1900,8 +2638,9 @@ def flatten_nested_work_items(data):
         return data  # Return original if flattening fails
 
 @app.post("/reverse-engineer-design", response_model=ReverseEngineerDesignResponse)
-async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
+async def reverse_engineer_design(request: ReverseEngineerDesignRequest, http_request: Request, response: Response):
     """Reverse engineer visual designs into business requirements using LLM"""
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt, has_image=bool(request.hasImage and request.imageData))
     try:
         print(f"[REVERSE-DESIGN] Starting design reverse engineering")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -1918,7 +2657,7 @@ async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
                 # Try official Google GenAI SDK first
                 try:
                     official_service = get_official_gemini_service()
-                    if official_service.is_available():
+                    if official_service.is_available(request.model):
                         print(f"[LLM] Using Official Google GenAI SDK for reverse engineering")
                         use_official_gemini = True
                     else:
@@ -1927,15 +2666,12 @@ async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
                 except Exception as official_error:
                     print(f"[WARNING] Official SDK failed: {official_error}, using LangChain fallback")
                     # Fallback to LangChain
-                    llm = ChatGoogleGenerativeAI(
-                        model=request.model,
-                        google_api_key=os.getenv("GOOGLE_API_KEY")
-                    )
+                    llm = get_pooled_llm("google", request.model)
             else:
                 # Try official OpenAI SDK first
                 try:
                     official_service = get_official_openai_service()
-                    if official_service.is_available():
+                    if official_service.is_available(request.model):
                         print(f"[LLM] Using Official OpenAI SDK for reverse engineering")
                         use_official_openai = True
                     else:
@@ -1944,24 +2680,13 @@ async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
                 except Exception as official_error:
                     print(f"[WARNING] Official OpenAI SDK failed: {official_error}, using LangChain fallback")
                     # Fallback to LangChain
-                    model_to_use = request.model if request.model else "gpt-4o"
-                    llm = ChatOpenAI(
-                        model=model_to_use,
-                        openai_api_key=os.getenv("OPENAI_API_KEY")
-                    )
+                    llm = get_pooled_llm("openai", request.model)
             
             # Ensure LLM is created even if Official SDK is used (for fallback scenarios)
             if use_official_gemini and not llm:
-                llm = ChatGoogleGenerativeAI(
-                    model=request.model,
-                    google_api_key=os.getenv("GOOGLE_API_KEY")
-                )
+                llm = get_pooled_llm("google", request.model)
             elif use_official_openai and not llm:
-                model_to_use = request.model if request.model else "gpt-4o"
-                llm = ChatOpenAI(
-                    model=model_to_use,
-                    openai_api_key=os.getenv("OPENAI_API_KEY")
-                )
+                llm = get_pooled_llm("openai", request.model)
             
             if not use_official_gemini and not use_official_openai:
                 print(f"[LLM] LLM created successfully for {request.llm_provider}")
@@ -2012,17 +2737,17 @@ async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
                         }
                     ]
                 
-                response = await llm.ainvoke([{"role": "user", "content": message_content}])
+                llm_response = await run_llm_call(request.llm_provider, llm.ainvoke, [{"role": "user", "content": message_content}], http_request=http_request)
             else:
                 print("[TEXT] Processing text-only analysis")
                 full_prompt = f"{request.systemPrompt}\n\n{request.userPrompt}"
-                response = await llm.ainvoke([{"role": "user", "content": full_prompt}])
+                llm_response = await run_llm_call(request.llm_provider, llm.ainvoke, [{"role": "user", "content": full_prompt}], http_request=http_request)
             
-            # Extract content from response  
-            if hasattr(response, 'content'):
-                analysis_result = response.content
+            # Extract content from llm_response  
+            if hasattr(llm_response, 'content'):
+                analysis_result = llm_response.content
             else:
-                analysis_result = str(response)
+                analysis_result = str(llm_response)
                 
             execution_time = time.time() - start_time
             print(f"[SUCCESS] Design reverse engineering completed in {execution_time:.2f}s")
@@ -2105,8 +2830,9 @@ async def reverse_engineer_design(request: ReverseEngineerDesignRequest):
         )
 
 @app.post("/reverse-engineer-code", response_model=ReverseEngineerCodeResponse)
-async def reverse_engineer_code(request: ReverseEngineerCodeRequest):
+async def reverse_engineer_code(request: ReverseEngineerCodeRequest, http_request: Request, response: Response):
     """Reverse engineer code into business requirements using LLM"""
+    route_generation_model(request, http_request, response, request.systemPrompt, request.userPrompt, request.code)
     try:
         print(f"[REVERSE-CODE] Starting code reverse engineering")
         print(f"[LLM] Using {request.llm_provider} model: {request.model}")
@@ -2116,17 +2842,10 @@ async def reverse_engineer_code(request: ReverseEngineerCodeRequest):
         # Create LLM directly (no MCP tools needed for code reverse engineering)
         try:
             if request.llm_provider == "google":
-                llm = ChatGoogleGenerativeAI(
-                    model=request.model,
-                    google_api_key=os.getenv("GOOGLE_API_KEY")
-                )
+                llm = get_pooled_llm("google", request.model)
             else:
                 # Use GPT-4o for vision capabilities and improved performance
-                model_to_use = request.model if request.model else "gpt-4o"
-                llm = ChatOpenAI(
-                    model=model_to_use,
-                    openai_api_key=os.getenv("OPENAI_API_KEY")
-                )
+                llm = get_pooled_llm("openai", request.model)
             
             print(f"[LLM] LLM created successfully for {request.llm_provider}")
             
@@ -2145,7 +2864,7 @@ async def reverse_engineer_code(request: ReverseEngineerCodeRequest):
         if request.llm_provider == "google":
             try:
                 official_gemini_service = get_official_gemini_service()
-                if official_gemini_service and official_gemini_service.is_available():
+                if official_gemini_service and official_gemini_service.is_available(request.model):
                     print(f"[LLM] Using Official Google GenAI SDK for {request.model}")
                     official_sdk_used = True
                 else:
@@ -2155,7 +2874,7 @@ async def reverse_engineer_code(request: ReverseEngineerCodeRequest):
         elif request.llm_provider == "openai":
             try:
                 official_openai_service = get_official_openai_service()
-                if official_openai_service and official_openai_service.is_available():
+                if official_openai_service and official_openai_service.is_available(request.model):
                     print(f"[LLM] Using Official OpenAI SDK for {request.model}")
                     official_sdk_used = True
                 else:
@@ -2195,7 +2914,11 @@ Example format:
                 print(f"[TEXT] Processing text-only analysis with official SDK")
                 
                 if request.llm_provider == "google":
-                    success, result_content, metadata = generate_text_with_official_gemini(
+                    success, result_content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_gemini,
+                        http_request=http_request,
+                        validate=is_valid_json_response,
                         prompt=full_prompt,
                         model=request.model,
                         disable_thinking=True
@@ -2203,7 +2926,11 @@ Example format:
                     if not success:
                         raise Exception(f"Google Gemini generation failed: {result_content}")
                 else:  # OpenAI
-                    success, result_content, metadata = generate_text_with_official_openai(
+                    success, result_content, metadata = await run_llm_call(
+                        request.llm_provider,
+                        agenerate_text_with_official_openai,
+                        http_request=http_request,
+                        validate=is_valid_json_response,
                         prompt=full_prompt,
                         model=request.model,
                         temperature=0.3,
@@ -2218,7 +2945,7 @@ Example format:
                 
             else:
                 # Use LangChain fallback
-                result = llm.invoke(full_prompt)
+                result = await run_llm_call(request.llm_provider, llm.ainvoke, full_prompt, http_request=http_request, validate=is_valid_json_response)
                 execution_time = time.time() - start_time
                 
                 print(f"[OK] Code analysis completed in {execution_time:.2f}s")
@@ -2263,16 +2990,7 @@ Example format:
                 print(f"[DEBUG] Raw result preview: {result_str[:300]}...")
                 
                 # Look for JSON in code blocks or plain JSON
-                if '```json' in result_str:
-                    json_start = result_str.find('```json') + 7
-                    json_end = result_str.find('```', json_start)
-                    json_content = result_str[json_start:json_end].strip()
-                elif '{' in result_str and '}' in result_str:
-                    json_start = result_str.find('{')
-                    json_end = result_str.rfind('}') + 1
-                    json_content = result_str[json_start:json_end]
-                else:
-                    raise Exception("No JSON found in response")
+                json_content = extract_json_content(result_str)
                 
                 print(f"[DEBUG] Attempting to parse JSON of length: {len(json_content)}")
                 parsed_result = json.loads(json_content)
@@ -15,6 +15,8 @@ import base64
 from typing import Dict, Any, Optional, Tuple
 from dotenv import load_dotenv
 
+from provider_health import get_provider_health_monitor
+
 # Load environment variables
 load_dotenv("env")
 
@@ -41,6 +43,202 @@ class OfficialGeminiService:
         except ImportError as e:
             raise ImportError(f"Official Google GenAI SDK not installed. Run: pip install google-genai. Error: {e}")
     
+    def _log_text_request(self, prompt: str, model: str, disable_thinking: bool):
+        """Log an outgoing text-only request"""
+        print(f"[OFFICIAL-GEMINI] Text generation with model: {model}")
+        print(f"[OFFICIAL-GEMINI] Prompt length: {len(prompt)} chars")
+        print(f"[OFFICIAL-GEMINI] Thinking disabled: {disable_thinking}")
+        
+        # RAW REQUEST LOGGING
+        print(f"[RAW-REQUEST] ===========================================")
+        print(f"[RAW-REQUEST] Model: {model}")
+        print(f"[RAW-REQUEST] Prompt length: {len(prompt)} chars")
+        print(f"[RAW-REQUEST] Prompt repr: {repr(prompt)}")
+        print(f"[RAW-REQUEST] Full prompt content:")
+        print(f"[RAW-REQUEST] {'-'*50}")
+        print(prompt)
+        print(f"[RAW-REQUEST] {'-'*50}")
+    
+    def _log_multimodal_request(self, text_prompt: str, image_data: bytes, image_mime_type: str, model: str, disable_thinking: bool):
+        """Log an outgoing multimodal request"""
+        print(f"[OFFICIAL-GEMINI] Multimodal generation with model: {model}")
+        print(f"[OFFICIAL-GEMINI] Text prompt length: {len(text_prompt)} chars")
+        print(f"[OFFICIAL-GEMINI] Image data length: {len(image_data)} bytes")
+        print(f"[OFFICIAL-GEMINI] Image MIME type: {image_mime_type}")
+        print(f"[OFFICIAL-GEMINI] Thinking disabled: {disable_thinking}")
+        
+        # RAW REQUEST LOGGING
+        print(f"[RAW-MULTIMODAL-REQUEST] ===============================")
+        print(f"[RAW-MULTIMODAL-REQUEST] Model: {model}")
+        print(f"[RAW-MULTIMODAL-REQUEST] Text prompt: {repr(text_prompt)}")
+        print(f"[RAW-MULTIMODAL-REQUEST] Text prompt content:")
+        print(f"[RAW-MULTIMODAL-REQUEST] {'-'*30}")
+        print(text_prompt)
+        print(f"[RAW-MULTIMODAL-REQUEST] {'-'*30}")
+        print(f"[RAW-MULTIMODAL-REQUEST] Image data length: {len(image_data)} bytes")
+        print(f"[RAW-MULTIMODAL-REQUEST] Image MIME type: {image_mime_type}")
+        print(f"[RAW-MULTIMODAL-REQUEST] Image data preview: {image_data[:50]}...")
+    
+    def _build_config(self, model: str, disable_thinking: bool, log_tag: str):
+        """Prepare the generation config for the given model and thinking setting"""
+        config = None
+        if disable_thinking:
+            if model == "gemini-2.5-flash":
+                # For flash model, we can safely disable thinking
+                config = self.types.GenerateContentConfig(
+                    thinking_config=self.types.ThinkingConfig(thinking_budget=0)
+                )
+                print(f"[{log_tag}] Using thinking config for flash: {config}")
+            elif model == "gemini-2.5-pro":
+                # For pro model, disabling thinking causes empty responses
+                # So we'll allow thinking but try to extract just the final answer
+                print(f"[{log_tag}] gemini-2.5-pro: Allowing thinking to prevent empty responses")
+            else:
+                print(f"[{log_tag}] Unknown model {model}, no special config")
+        else:
+            print(f"[{log_tag}] No special config")
+        return config
+    
+    def _build_multimodal_contents(self, text_prompt: str, image_data: bytes, image_mime_type: str) -> list:
+        """Create multimodal content using the correct format"""
+        image_part = self.types.Part.from_bytes(
+            data=image_data,
+            mime_type=image_mime_type,
+        )
+        print(f"[RAW-MULTIMODAL-REQUEST] Image part created: {image_part}")
+        
+        contents = [image_part, text_prompt]
+        print(f"[RAW-MULTIMODAL-REQUEST] Contents: {contents}")
+        print(f"[RAW-MULTIMODAL-REQUEST] Contents length: {len(contents)}")
+        return contents
+    
+    def _request_kwargs(self, model: str, contents: Any, config: Any, log_tag: str) -> Dict[str, Any]:
+        """Build the generate_content keyword arguments shared by the sync and async clients"""
+        print(f"[{log_tag}] API Key: {self.api_key[:10]}...{self.api_key[-10:]}")
+        print(f"[{log_tag}] Client: {self.client}")
+        print(f"[{log_tag}] Calling generate_content...")
+        
+        kwargs = {"model": model, "contents": contents}
+        if config:
+            kwargs["config"] = config
+        return kwargs
+    
+    def _log_response(self, response: Any, log_tag: str):
+        """Dump the raw SDK response for debugging"""
+        print(f"[{log_tag}] ==========================================")
+        print(f"[{log_tag}] Response type: {type(response)}")
+        print(f"[{log_tag}] Response object: {response}")
+        print(f"[{log_tag}] Response dir: {dir(response)}")
+        
+        if hasattr(response, 'candidates'):
+            print(f"[{log_tag}] Candidates: {response.candidates}")
+            if response.candidates:
+                for i, candidate in enumerate(response.candidates):
+                    print(f"[{log_tag}] Candidate {i}: {candidate}")
+                    print(f"[{log_tag}] Candidate {i} dir: {dir(candidate)}")
+                    if hasattr(candidate, 'content'):
+                        print(f"[{log_tag}] Candidate {i} content: {candidate.content}")
+                    if hasattr(candidate, 'finish_reason'):
+                        print(f"[{log_tag}] Candidate {i} finish_reason: {candidate.finish_reason}")
+                    if hasattr(candidate, 'safety_ratings'):
+                        print(f"[{log_tag}] Candidate {i} safety_ratings: {candidate.safety_ratings}")
+        
+        if hasattr(response, 'text'):
+            print(f"[{log_tag}] Response.text: {repr(response.text)}")
+        
+        if hasattr(response, 'parts'):
+            print(f"[{log_tag}] Response.parts: {response.parts}")
+        
+        if hasattr(response, 'usage_metadata'):
+            print(f"[{log_tag}] Usage metadata: {response.usage_metadata}")
+        
+        if hasattr(response, 'prompt_feedback'):
+            print(f"[{log_tag}] Prompt feedback: {response.prompt_feedback}")
+        
+        print(f"[{log_tag}] ==========================================")
+    
+    def _extract_content(self, response: Any, label: str = "") -> str:
+        """Extract generated text from a response with proper None handling"""
+        content = None
+        
+        # Try multiple ways to extract content from the response
+        if hasattr(response, 'text') and response.text is not None:
+            content = response.text
+            print(f"[OFFICIAL-GEMINI] Extracted {label}content from response.text")
+        elif hasattr(response, 'candidates') and response.candidates:
+            # Try to extract from candidates
+            candidate = response.candidates[0]
+            if hasattr(candidate, 'content') and candidate.content:
+                if hasattr(candidate.content, 'parts') and candidate.content.parts:
+                    # Extract from parts
+                    parts_text = []
+                    for part in candidate.content.parts:
+                        if hasattr(part, 'text') and part.text:
+                            parts_text.append(part.text)
+                    if parts_text:
+                        content = ''.join(parts_text)
+                        print(f"[OFFICIAL-GEMINI] Extracted {label}content from candidate.content.parts")
+                elif hasattr(candidate.content, 'text') and candidate.content.text:
+                    content = candidate.content.text
+                    print(f"[OFFICIAL-GEMINI] Extracted {label}content from candidate.content.text")
+        
+        # If still no content, this might be an empty response (thinking mode issue)
+        if not content:
+            print(f"[OFFICIAL-GEMINI] Warning: No {label}content found in response")
+            print(f"[OFFICIAL-GEMINI] Response structure debug:")
+            if hasattr(response, 'candidates') and response.candidates:
+                candidate = response.candidates[0]
+                print(f"[OFFICIAL-GEMINI] Candidate content: {candidate.content}")
+                if hasattr(candidate.content, 'parts'):
+                    print(f"[OFFICIAL-GEMINI] Candidate parts: {candidate.content.parts}")
+            content = ""
+        
+        return content
+    
+    def _build_result(
+        self,
+        content: str,
+        execution_time: float,
+        model: str,
+        disable_thinking: bool,
+        extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """Validate extracted content and build the (success, content, metadata) result"""
+        content_length = len(str(content))
+        
+        print(f"[OFFICIAL-GEMINI] Generation completed in {execution_time:.2f}s")
+        print(f"[OFFICIAL-GEMINI] Generated content length: {content_length} chars")
+        print(f"[OFFICIAL-GEMINI] Content preview: {str(content)[:100]}...")
+        
+        if content and content_length > 5:  # Relaxed minimum viable content
+            metadata = {
+                "execution_time": execution_time,
+                "content_length": content_length,
+                "model": model,
+                "thinking_disabled": disable_thinking,
+                "provider": "official_google_genai_sdk"
+            }
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            return True, content, metadata
+        else:
+            print(f"[OFFICIAL-GEMINI] Insufficient content generated: {content_length} chars")
+            return False, "", {"error": "Insufficient content generated"}
+    
+    def _get_fallback_model(self, model: str, error_str: str) -> Optional[str]:
+        """Pick the model to retry with after a failed generation, if any"""
+        # Check if this is a 500 error or content generation issue from gemini-2.5-pro and auto-fallback
+        if model == "gemini-2.5-pro" and ("500 INTERNAL" in error_str or "Insufficient content" in error_str):
+            print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-pro, attempting fallback to gemini-2.5-flash")
+            return "gemini-2.5-flash"
+        
+        # Check if this is a content generation issue from gemini-2.5-flash and try gemini-2.5-pro
+        if model == "gemini-2.5-flash" and "Insufficient content" in error_str:
+            print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-flash, attempting fallback to gemini-2.5-pro")
+            return "gemini-2.5-pro"
+        
+        return None
+    
     def generate_text_content(
         self, 
         prompt: str, 
@@ -59,175 +257,80 @@ class OfficialGeminiService:
             Tuple of (success, content, metadata)
         """
         try:
-            print(f"[OFFICIAL-GEMINI] Text generation with model: {model}")
-            print(f"[OFFICIAL-GEMINI] Prompt length: {len(prompt)} chars")
-            print(f"[OFFICIAL-GEMINI] Thinking disabled: {disable_thinking}")
-            
-            # RAW REQUEST LOGGING
-            print(f"[RAW-REQUEST] ===========================================")
-            print(f"[RAW-REQUEST] Model: {model}")
-            print(f"[RAW-REQUEST] Prompt length: {len(prompt)} chars")
-            print(f"[RAW-REQUEST] Prompt repr: {repr(prompt)}")
-            print(f"[RAW-REQUEST] Full prompt content:")
-            print(f"[RAW-REQUEST] {'-'*50}")
-            print(prompt)
-            print(f"[RAW-REQUEST] {'-'*50}")
-            
+            self._log_text_request(prompt, model, disable_thinking)
             start_time = time.time()
-            
-            # Prepare generation config
-            config = None
-            if disable_thinking:
-                if model == "gemini-2.5-flash":
-                    # For flash model, we can safely disable thinking
-                    config = self.types.GenerateContentConfig(
-                        thinking_config=self.types.ThinkingConfig(thinking_budget=0)
-                    )
-                    print(f"[RAW-REQUEST] Using thinking config for flash: {config}")
-                elif model == "gemini-2.5-pro":
-                    # For pro model, disabling thinking causes empty responses
-                    # So we'll allow thinking but try to extract just the final answer
-                    print(f"[RAW-REQUEST] gemini-2.5-pro: Allowing thinking to prevent empty responses")
-                else:
-                    print(f"[RAW-REQUEST] Unknown model {model}, no special config")
-            else:
-                print(f"[RAW-REQUEST] No special config")
-            
-            print(f"[RAW-REQUEST] API Key: {self.api_key[:10]}...{self.api_key[-10:]}")
-            print(f"[RAW-REQUEST] Client: {self.client}")
-            print(f"[RAW-REQUEST] Calling generate_content...")
+            config = self._build_config(model, disable_thinking, "RAW-REQUEST")
             
             # Generate content
-            if config:
-                response = self.client.models.generate_content(
-                    model=model,
-                    contents=prompt,
-                    config=config
-                )
-            else:
-                response = self.client.models.generate_content(
-                    model=model,
-                    contents=prompt
-                )
+            response = self.client.models.generate_content(
+                **self._request_kwargs(model, prompt, config, "RAW-REQUEST")
+            )
             
             execution_time = time.time() - start_time
-            
-            # RAW RESPONSE LOGGING
-            print(f"[RAW-RESPONSE] ==========================================")
-            print(f"[RAW-RESPONSE] Response type: {type(response)}")
-            print(f"[RAW-RESPONSE] Response object: {response}")
-            print(f"[RAW-RESPONSE] Response dir: {dir(response)}")
-            
-            if hasattr(response, 'candidates'):
-                print(f"[RAW-RESPONSE] Candidates: {response.candidates}")
-                if response.candidates:
-                    for i, candidate in enumerate(response.candidates):
-                        print(f"[RAW-RESPONSE] Candidate {i}: {candidate}")
-                        print(f"[RAW-RESPONSE] Candidate {i} dir: {dir(candidate)}")
-                        if hasattr(candidate, 'content'):
-                            print(f"[RAW-RESPONSE] Candidate {i} content: {candidate.content}")
-                        if hasattr(candidate, 'finish_reason'):
-                            print(f"[RAW-RESPONSE] Candidate {i} finish_reason: {candidate.finish_reason}")
-                        if hasattr(candidate, 'safety_ratings'):
-                            print(f"[RAW-RESPONSE] Candidate {i} safety_ratings: {candidate.safety_ratings}")
-            
-            if hasattr(response, 'text'):
-                print(f"[RAW-RESPONSE] Response.text: {repr(response.text)}")
-            
-            if hasattr(response, 'parts'):
-                print(f"[RAW-RESPONSE] Response.parts: {response.parts}")
-            
-            if hasattr(response, 'usage_metadata'):
-                print(f"[RAW-RESPONSE] Usage metadata: {response.usage_metadata}")
-            
-            if hasattr(response, 'prompt_feedback'):
-                print(f"[RAW-RESPONSE] Prompt feedback: {response.prompt_feedback}")
-            
-            print(f"[RAW-RESPONSE] ==========================================")
-            
-            # Extract content and metadata with proper None handling
-            content = None
-            
-            # Try multiple ways to extract content from the response
-            if hasattr(response, 'text') and response.text is not None:
-                content = response.text
-                print(f"[OFFICIAL-GEMINI] Extracted content from response.text")
-            elif hasattr(response, 'candidates') and response.candidates:
-                # Try to extract from candidates
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'content') and candidate.content:
-                    if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                        # Extract from parts
-                        parts_text = []
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'text') and part.text:
-                                parts_text.append(part.text)
-                        if parts_text:
-                            content = ''.join(parts_text)
-                            print(f"[OFFICIAL-GEMINI] Extracted content from candidate.content.parts")
-                    elif hasattr(candidate.content, 'text') and candidate.content.text:
-                        content = candidate.content.text
-                        print(f"[OFFICIAL-GEMINI] Extracted content from candidate.content.text")
-            
-            # If still no content, this might be an empty response (thinking mode issue)
-            if not content:
-                print(f"[OFFICIAL-GEMINI] Warning: No content found in response")
-                print(f"[OFFICIAL-GEMINI] Response structure debug:")
-                if hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    print(f"[OFFICIAL-GEMINI] Candidate content: {candidate.content}")
-                    if hasattr(candidate.content, 'parts'):
-                        print(f"[OFFICIAL-GEMINI] Candidate parts: {candidate.content.parts}")
-                content = ""
-            
-            # Handle None content gracefully
-            if content is None:
-                content = ""
-                print(f"[OFFICIAL-GEMINI] Warning: Response content is None")
-            
-            content_length = len(str(content))
-            
-            print(f"[OFFICIAL-GEMINI] Generation completed in {execution_time:.2f}s")
-            print(f"[OFFICIAL-GEMINI] Generated content length: {content_length} chars")
-            print(f"[OFFICIAL-GEMINI] Content preview: {str(content)[:100]}...")
-            
-            if content and content_length > 5:  # Relaxed minimum viable content
-                metadata = {
-                    "execution_time": execution_time,
-                    "content_length": content_length,
-                    "model": model,
-                    "thinking_disabled": disable_thinking,
-                    "provider": "official_google_genai_sdk"
-                }
-                return True, content, metadata
-            else:
-                print(f"[OFFICIAL-GEMINI] Insufficient content generated: {content_length} chars")
-                return False, "", {"error": "Insufficient content generated"}
+            self._log_response(response, "RAW-RESPONSE")
+            content = self._extract_content(response)
+            return self._build_result(content, execution_time, model, disable_thinking)
                 
         except Exception as e:
             error_str = str(e)
             print(f"[OFFICIAL-GEMINI] Text generation failed: {e}")
             
-            # Check if this is a 500 error or content generation issue from gemini-2.5-pro and auto-fallback
-            if model == "gemini-2.5-pro" and ("500 INTERNAL" in error_str or "Insufficient content" in error_str):
-                print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-pro, attempting fallback to gemini-2.5-flash")
+            fallback_model = self._get_fallback_model(model, error_str)
+            if fallback_model:
                 try:
                     return self.generate_text_content(
                         prompt=prompt,
-                        model="gemini-2.5-flash",
+                        model=fallback_model,
                         disable_thinking=disable_thinking
                     )
                 except Exception as fallback_error:
                     print(f"[OFFICIAL-GEMINI] Fallback also failed: {fallback_error}")
                     return False, "", {"error": f"Primary model failed: {error_str}, Fallback failed: {str(fallback_error)}"}
             
-            # Check if this is a content generation issue from gemini-2.5-flash and try gemini-2.5-pro
-            elif model == "gemini-2.5-flash" and "Insufficient content" in error_str:
-                print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-flash, attempting fallback to gemini-2.5-pro")
+            return False, "", {"error": str(e)}
+    
+    async def agenerate_text_content(
+        self, 
+        prompt: str, 
+        model: str = "gemini-2.5-flash",
+        disable_thinking: bool = False
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Async variant of generate_text_content using the SDK's aio client
+        
+        Args:
+            prompt: The text prompt for generation
+            model: The Gemini model to use
+            disable_thinking: Whether to disable thinking mode for faster responses
+            
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        try:
+            self._log_text_request(prompt, model, disable_thinking)
+            start_time = time.time()
+            config = self._build_config(model, disable_thinking, "RAW-REQUEST")
+            
+            # Generate content without blocking the event loop
+            response = await self.client.aio.models.generate_content(
+                **self._request_kwargs(model, prompt, config, "RAW-REQUEST")
+            )
+            
+            execution_time = time.time() - start_time
+            self._log_response(response, "RAW-RESPONSE")
+            content = self._extract_content(response)
+            return self._build_result(content, execution_time, model, disable_thinking)
+                
+        except Exception as e:
+            error_str = str(e)
+            print(f"[OFFICIAL-GEMINI] Async text generation failed: {e}")
+            
+            fallback_model = self._get_fallback_model(model, error_str)
+            if fallback_model:
                 try:
-                    return self.generate_text_content(
+                    return await self.agenerate_text_content(
                         prompt=prompt,
-                        model="gemini-2.5-pro",
+                        model=fallback_model,
                         disable_thinking=disable_thinking
                     )
                 except Exception as fallback_error:
@@ -258,196 +361,96 @@ class OfficialGeminiService:
             Tuple of (success, content, metadata)
         """
         try:
-            print(f"[OFFICIAL-GEMINI] Multimodal generation with model: {model}")
-            print(f"[OFFICIAL-GEMINI] Text prompt length: {len(text_prompt)} chars")
-            print(f"[OFFICIAL-GEMINI] Image data length: {len(image_data)} bytes")
-            print(f"[OFFICIAL-GEMINI] Image MIME type: {image_mime_type}")
-            print(f"[OFFICIAL-GEMINI] Thinking disabled: {disable_thinking}")
-            
-            # RAW REQUEST LOGGING
-            print(f"[RAW-MULTIMODAL-REQUEST] ===============================")
-            print(f"[RAW-MULTIMODAL-REQUEST] Model: {model}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Text prompt: {repr(text_prompt)}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Text prompt content:")
-            print(f"[RAW-MULTIMODAL-REQUEST] {'-'*30}")
-            print(text_prompt)
-            print(f"[RAW-MULTIMODAL-REQUEST] {'-'*30}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Image data length: {len(image_data)} bytes")
-            print(f"[RAW-MULTIMODAL-REQUEST] Image MIME type: {image_mime_type}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Image data preview: {image_data[:50]}...")
-            
+            self._log_multimodal_request(text_prompt, image_data, image_mime_type, model, disable_thinking)
             start_time = time.time()
-            
-            # Prepare generation config
-            config = None
-            if disable_thinking:
-                if model == "gemini-2.5-flash":
-                    # For flash model, we can safely disable thinking
-                    config = self.types.GenerateContentConfig(
-                        thinking_config=self.types.ThinkingConfig(thinking_budget=0)
-                    )
-                    print(f"[RAW-MULTIMODAL-REQUEST] Using thinking config for flash: {config}")
-                elif model == "gemini-2.5-pro":
-                    # For pro model, disabling thinking causes empty responses
-                    # So we'll allow thinking but try to extract just the final answer
-                    print(f"[RAW-MULTIMODAL-REQUEST] gemini-2.5-pro: Allowing thinking to prevent empty responses")
-                else:
-                    print(f"[RAW-MULTIMODAL-REQUEST] Unknown model {model}, no special config")
-            else:
-                print(f"[RAW-MULTIMODAL-REQUEST] No special config")
-            
-            # Create multimodal content using the correct format
-            image_part = self.types.Part.from_bytes(
-                data=image_data,
-                mime_type=image_mime_type,
-            )
-            print(f"[RAW-MULTIMODAL-REQUEST] Image part created: {image_part}")
-            
-            contents = [image_part, text_prompt]
-            print(f"[RAW-MULTIMODAL-REQUEST] Contents: {contents}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Contents length: {len(contents)}")
-            
-            print(f"[RAW-MULTIMODAL-REQUEST] API Key: {self.api_key[:10]}...{self.api_key[-10:]}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Client: {self.client}")
-            print(f"[RAW-MULTIMODAL-REQUEST] Calling generate_content...")
+            config = self._build_config(model, disable_thinking, "RAW-MULTIMODAL-REQUEST")
+            contents = self._build_multimodal_contents(text_prompt, image_data, image_mime_type)
             
             # Generate content
-            if config:
-                response = self.client.models.generate_content(
-                    model=model,
-                    contents=contents,
-                    config=config
-                )
-            else:
-                response = self.client.models.generate_content(
-                    model=model,
-                    contents=contents
-                )
+            response = self.client.models.generate_content(
+                **self._request_kwargs(model, contents, config, "RAW-MULTIMODAL-REQUEST")
+            )
             
             execution_time = time.time() - start_time
-            
-            # RAW RESPONSE LOGGING
-            print(f"[RAW-MULTIMODAL-RESPONSE] ==============================")
-            print(f"[RAW-MULTIMODAL-RESPONSE] Response type: {type(response)}")
-            print(f"[RAW-MULTIMODAL-RESPONSE] Response object: {response}")
-            print(f"[RAW-MULTIMODAL-RESPONSE] Response dir: {dir(response)}")
-            
-            if hasattr(response, 'candidates'):
-                print(f"[RAW-MULTIMODAL-RESPONSE] Candidates: {response.candidates}")
-                if response.candidates:
-                    for i, candidate in enumerate(response.candidates):
-                        print(f"[RAW-MULTIMODAL-RESPONSE] Candidate {i}: {candidate}")
-                        print(f"[RAW-MULTIMODAL-RESPONSE] Candidate {i} dir: {dir(candidate)}")
-                        if hasattr(candidate, 'content'):
-                            print(f"[RAW-MULTIMODAL-RESPONSE] Candidate {i} content: {candidate.content}")
-                        if hasattr(candidate, 'finish_reason'):
-                            print(f"[RAW-MULTIMODAL-RESPONSE] Candidate {i} finish_reason: {candidate.finish_reason}")
-                        if hasattr(candidate, 'safety_ratings'):
-                            print(f"[RAW-MULTIMODAL-RESPONSE] Candidate {i} safety_ratings: {candidate.safety_ratings}")
-            
-            if hasattr(response, 'text'):
-                print(f"[RAW-MULTIMODAL-RESPONSE] Response.text: {repr(response.text)}")
-            
-            if hasattr(response, 'parts'):
-                print(f"[RAW-MULTIMODAL-RESPONSE] Response.parts: {response.parts}")
-            
-            if hasattr(response, 'usage_metadata'):
-                print(f"[RAW-MULTIMODAL-RESPONSE] Usage metadata: {response.usage_metadata}")
-            
-            if hasattr(response, 'prompt_feedback'):
-                print(f"[RAW-MULTIMODAL-RESPONSE] Prompt feedback: {response.prompt_feedback}")
-            
-            print(f"[RAW-MULTIMODAL-RESPONSE] ==============================")
-            
-            # Extract content and metadata with proper None handling
-            content = None
-            
-            # Try multiple ways to extract content from the response
-            if hasattr(response, 'text') and response.text is not None:
-                content = response.text
-                print(f"[OFFICIAL-GEMINI] Extracted multimodal content from response.text")
-            elif hasattr(response, 'candidates') and response.candidates:
-                # Try to extract from candidates
-                candidate = response.candidates[0]
-                if hasattr(candidate, 'content') and candidate.content:
-                    if hasattr(candidate.content, 'parts') and candidate.content.parts:
-                        # Extract from parts
-                        parts_text = []
-                        for part in candidate.content.parts:
-                            if hasattr(part, 'text') and part.text:
-                                parts_text.append(part.text)
-                        if parts_text:
-                            content = ''.join(parts_text)
-                            print(f"[OFFICIAL-GEMINI] Extracted multimodal content from candidate.content.parts")
-                    elif hasattr(candidate.content, 'text') and candidate.content.text:
-                        content = candidate.content.text
-                        print(f"[OFFICIAL-GEMINI] Extracted multimodal content from candidate.content.text")
-            
-            # If still no content, this might be an empty response
-            if not content:
-                print(f"[OFFICIAL-GEMINI] Warning: No multimodal content found in response")
-                print(f"[OFFICIAL-GEMINI] Multimodal response structure debug:")
-                if hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    print(f"[OFFICIAL-GEMINI] Candidate content: {candidate.content}")
-                    if hasattr(candidate.content, 'parts'):
-                        print(f"[OFFICIAL-GEMINI] Candidate parts: {candidate.content.parts}")
-                content = ""
-            
-            # Handle None content gracefully
-            if content is None:
-                content = ""
-                print(f"[OFFICIAL-GEMINI] Warning: Multimodal response content is None")
-            
-            content_length = len(str(content))
-            
-            print(f"[OFFICIAL-GEMINI] Multimodal generation completed in {execution_time:.2f}s")
-            print(f"[OFFICIAL-GEMINI] Generated content length: {content_length} chars")
-            print(f"[OFFICIAL-GEMINI] Content preview: {str(content)[:100]}...")
-            
-            if content and content_length > 5:  # Relaxed threshold for multimodal
-                metadata = {
-                    "execution_time": execution_time,
-                    "content_length": content_length,
-                    "model": model,
-                    "thinking_disabled": disable_thinking,
-                    "image_size_bytes": len(image_data),
-                    "image_mime_type": image_mime_type,
-                    "provider": "official_google_genai_sdk"
-                }
-                return True, content, metadata
-            else:
-                print(f"[OFFICIAL-GEMINI] Insufficient content generated: {content_length} chars")
-                return False, "", {"error": "Insufficient content generated"}
+            self._log_response(response, "RAW-MULTIMODAL-RESPONSE")
+            content = self._extract_content(response, label="multimodal ")
+            return self._build_result(content, execution_time, model, disable_thinking, {
+                "image_size_bytes": len(image_data),
+                "image_mime_type": image_mime_type
+            })
                 
         except Exception as e:
             error_str = str(e)
             print(f"[OFFICIAL-GEMINI] Multimodal generation failed: {e}")
             
-            # Check if this is a 500 error or content generation issue from gemini-2.5-pro and auto-fallback
-            if model == "gemini-2.5-pro" and ("500 INTERNAL" in error_str or "Insufficient content" in error_str):
-                print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-pro multimodal, attempting fallback to gemini-2.5-flash")
+            fallback_model = self._get_fallback_model(model, error_str)
+            if fallback_model:
                 try:
                     return self.generate_multimodal_content(
                         text_prompt=text_prompt,
                         image_data=image_data,
                         image_mime_type=image_mime_type,
-                        model="gemini-2.5-flash",
+                        model=fallback_model,
                         disable_thinking=disable_thinking
                     )
                 except Exception as fallback_error:
                     print(f"[OFFICIAL-GEMINI] Multimodal fallback also failed: {fallback_error}")
                     return False, "", {"error": f"Primary model failed: {error_str}, Fallback failed: {str(fallback_error)}"}
             
-            # Check if this is a content generation issue from gemini-2.5-flash and try gemini-2.5-pro
-            elif model == "gemini-2.5-flash" and "Insufficient content" in error_str:
-                print(f"[OFFICIAL-GEMINI] Content generation issue detected for gemini-2.5-flash multimodal, attempting fallback to gemini-2.5-pro")
+            return False, "", {"error": str(e)}
+    
+    async def agenerate_multimodal_content(
+        self,
+        text_prompt: str,
+        image_data: bytes,
+        image_mime_type: str = "image/png",
+        model: str = "gemini-2.5-flash",
+        disable_thinking: bool = False
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Async variant of generate_multimodal_content using the SDK's aio client
+        
+        Args:
+            text_prompt: The text prompt for generation
+            image_data: Raw image bytes
+            image_mime_type: MIME type of the image (e.g., 'image/png', 'image/jpeg')
+            model: The Gemini model to use
+            disable_thinking: Whether to disable thinking mode for faster responses
+            
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        try:
+            self._log_multimodal_request(text_prompt, image_data, image_mime_type, model, disable_thinking)
+            start_time = time.time()
+            config = self._build_config(model, disable_thinking, "RAW-MULTIMODAL-REQUEST")
+            contents = self._build_multimodal_contents(text_prompt, image_data, image_mime_type)
+            
+            # Generate content without blocking the event loop
+            response = await self.client.aio.models.generate_content(
+                **self._request_kwargs(model, contents, config, "RAW-MULTIMODAL-REQUEST")
+            )
+            
+            execution_time = time.time() - start_time
+            self._log_response(response, "RAW-MULTIMODAL-RESPONSE")
+            content = self._extract_content(response, label="multimodal ")
+            return self._build_result(content, execution_time, model, disable_thinking, {
+                "image_size_bytes": len(image_data),
+                "image_mime_type": image_mime_type
+            })
+                
+        except Exception as e:
+            error_str = str(e)
+            print(f"[OFFICIAL-GEMINI] Async multimodal generation failed: {e}")
+            
+            fallback_model = self._get_fallback_model(model, error_str)
+            if fallback_model:
                 try:
-                    return self.generate_multimodal_content(
+                    return await self.agenerate_multimodal_content(
                         text_prompt=text_prompt,
                         image_data=image_data,
                         image_mime_type=image_mime_type,
-                        model="gemini-2.5-pro",
+                        model=fallback_model,
                         disable_thinking=disable_thinking
                     )
                 except Exception as fallback_error:
@@ -491,18 +494,82 @@ class OfficialGeminiService:
             print(f"[OFFICIAL-GEMINI] Base64 decode failed: {e}")
             return False, "", {"error": f"Base64 decode failed: {e}"}
     
-    def is_available(self) -> bool:
-        """Check if the service is available and working"""
+    async def agenerate_multimodal_from_base64(
+        self,
+        text_prompt: str,
+        image_base64: str,
+        image_mime_type: str = "image/png",
+        model: str = "gemini-2.5-flash",
+        disable_thinking: bool = False
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Async variant of generate_multimodal_from_base64
+        
+        Args:
+            text_prompt: The text prompt for generation
+            image_base64: Base64 encoded image data
+            image_mime_type: MIME type of the image
+            model: The Gemini model to use
+            disable_thinking: Whether to disable thinking mode
+            
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        try:
+            # Decode base64 to bytes
+            image_data = base64.b64decode(image_base64)
+        except Exception as e:
+            print(f"[OFFICIAL-GEMINI] Base64 decode failed: {e}")
+            return False, "", {"error": f"Base64 decode failed: {e}"}
+        
+        return await self.agenerate_multimodal_content(
+            text_prompt=text_prompt,
+            image_data=image_data,
+            image_mime_type=image_mime_type,
+            model=model,
+            disable_thinking=disable_thinking
+        )
+    
+
+    def probe_availability(self, model: str = "gemini-2.5-flash") -> Tuple[bool, Optional[str]]:
+        """
+        Live availability check used by the provider health monitor
+        
+        Returns:
+            Tuple of (available, error)
+        """
         try:
             # Simple test generation
             success, content, metadata = self.generate_text_content(
                 prompt="Hello",
+                model=model,
                 disable_thinking=True
             )
-            return success and len(content) > 0
+            if success and len(content) > 0:
+                return True, None
+            return False, metadata.get("error", "Empty probe response")
         except Exception as e:
             print(f"[OFFICIAL-GEMINI] Availability check failed: {e}")
-            return False
+            return False, str(e)
+    
+    async def aprobe_availability(self, model: str = "gemini-2.5-flash") -> Tuple[bool, Optional[str]]:
+        """Async variant of probe_availability"""
+        try:
+            success, content, metadata = await self.agenerate_text_content(
+                prompt="Hello",
+                model=model,
+                disable_thinking=True
+            )
+            if success and len(content) > 0:
+                return True, None
+            return False, metadata.get("error", "Empty probe response")
+        except Exception as e:
+            print(f"[OFFICIAL-GEMINI] Availability check failed: {e}")
+            return False, str(e)
+    
+    def is_available(self, model: Optional[str] = None) -> bool:
+        """Check if the service is available, using the cached health status"""
+        return get_provider_health_monitor().is_available("google", model)
     
     def get_supported_models(self) -> list:
         """Get list of supported Gemini models"""
@@ -523,7 +590,8 @@ class OfficialGeminiService:
             "supports_text": True,
             "supports_multimodal": True,
             "supports_thinking_control": True,
-            "is_available": self.is_available()
+            "is_available": self.is_available(),
+            "health": get_provider_health_monitor().get_provider_statuses("google")
         }
 
 # Global service instance
@@ -559,6 +627,28 @@ def generate_multimodal_with_official_gemini(
         text_prompt, image_base64, image_mime_type, model, disable_thinking
     )
 
+async def agenerate_text_with_official_gemini(
+    prompt: str,
+    model: str = "gemini-2.5-flash",
+    disable_thinking: bool = False
+) -> Tuple[bool, str, Dict[str, Any]]:
+    """Async convenience function for text generation"""
+    service = get_official_gemini_service()
+    return await service.agenerate_text_content(prompt, model, disable_thinking)
+
+async def agenerate_multimodal_with_official_gemini(
+    text_prompt: str,
+    image_base64: str,
+    image_mime_type: str = "image/png",
+    model: str = "gemini-2.5-flash",
+    disable_thinking: bool = False
+) -> Tuple[bool, str, Dict[str, Any]]:
+    """Async convenience function for multimodal generation"""
+    service = get_official_gemini_service()
+    return await service.agenerate_multimodal_from_base64(
+        text_prompt, image_base64, image_mime_type, model, disable_thinking
+    )
+
 if __name__ == "__main__":
     # Test the service
     print("🧪 Testing Official Gemini Service...")
@@ -15,6 +15,8 @@ import base64
 from typing import Dict, Any, Optional, Tuple, List
 from dotenv import load_dotenv
 
+from provider_health import get_provider_health_monitor
+
 # Load environment variables
 load_dotenv("env")
 
@@ -29,12 +31,100 @@ class OfficialOpenAIService:
         
         # Initialize the client
         try:
-            from openai import OpenAI
+            from openai import OpenAI, AsyncOpenAI
             self.client = OpenAI(api_key=self.api_key)
+            self.async_client = AsyncOpenAI(api_key=self.api_key)
             print(f"[OFFICIAL-OPENAI] Initialized with API key: {self.api_key[:10]}...{self.api_key[-10:]}")
         except ImportError as e:
             raise ImportError(f"Official OpenAI SDK not installed. Run: pip install openai. Error: {e}")
     
+    def _build_text_messages(self, prompt: str, system_prompt: Optional[str]) -> List[Dict[str, Any]]:
+        """Prepare chat messages for a text-only request"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+    
+    def _build_multimodal_messages(
+        self,
+        text_prompt: str,
+        image_base64: str,
+        image_mime_type: str,
+        system_prompt: Optional[str],
+        detail: str
+    ) -> List[Dict[str, Any]]:
+        """Prepare chat messages for a text + image request"""
+        messages = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        
+        # Create multimodal message content
+        user_content = [
+            {
+                "type": "text",
+                "text": text_prompt
+            },
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": f"data:{image_mime_type};base64,{image_base64}",
+                    "detail": detail
+                }
+            }
+        ]
+        
+        messages.append({"role": "user", "content": user_content})
+        return messages
+    
+    def _log_multimodal_request(self, text_prompt: str, image_base64: str, image_mime_type: str, model: str, detail: str):
+        """Log an outgoing multimodal request"""
+        print(f"[OFFICIAL-OPENAI] Multimodal generation with model: {model}")
+        print(f"[OFFICIAL-OPENAI] Text prompt length: {len(text_prompt)} chars")
+        print(f"[OFFICIAL-OPENAI] Image base64 length: {len(image_base64)} chars")
+        print(f"[OFFICIAL-OPENAI] Image MIME type: {image_mime_type}")
+        print(f"[OFFICIAL-OPENAI] Detail level: {detail}")
+    
+    def _build_result(
+        self,
+        response: Any,
+        execution_time: float,
+        model: str,
+        temperature: float,
+        max_tokens: Optional[int],
+        min_content_length: int,
+        label: str = "",
+        extra_metadata: Optional[Dict[str, Any]] = None
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """Validate a chat completion and build the (success, content, metadata) result"""
+        # Extract content and metadata
+        content = response.choices[0].message.content
+        content_length = len(content) if content else 0
+        
+        print(f"[OFFICIAL-OPENAI] {label}Generation completed in {execution_time:.2f}s")
+        print(f"[OFFICIAL-OPENAI] Generated content length: {content_length} chars")
+        
+        if content and content_length > min_content_length:
+            metadata = {
+                "execution_time": execution_time,
+                "content_length": content_length,
+                "model": model,
+                "temperature": temperature,
+                "max_tokens": max_tokens
+            }
+            if extra_metadata:
+                metadata.update(extra_metadata)
+            metadata["provider"] = "official_openai_sdk"
+            metadata["usage"] = {
+                "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+                "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+                "total_tokens": response.usage.total_tokens if response.usage else 0
+            }
+            return True, content, metadata
+        else:
+            print(f"[OFFICIAL-OPENAI] Insufficient content generated: {content_length} chars")
+            return False, "", {"error": "Insufficient content generated"}
+    
     def generate_text_content(
         self, 
         prompt: str, 
@@ -65,50 +155,64 @@ class OfficialOpenAIService:
             
             start_time = time.time()
             
-            # Prepare messages
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            messages.append({"role": "user", "content": prompt})
-            
             # Generate content
             response = self.client.chat.completions.create(
                 model=model,
-                messages=messages,
+                messages=self._build_text_messages(prompt, system_prompt),
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
             execution_time = time.time() - start_time
+            return self._build_result(response, execution_time, model, temperature, max_tokens, 10)  # Minimum viable content
+                
+        except Exception as e:
+            print(f"[OFFICIAL-OPENAI] Text generation failed: {e}")
+            return False, "", {"error": str(e)}
+    
+    async def agenerate_text_content(
+        self, 
+        prompt: str, 
+        model: str = "gpt-4o",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Async variant of generate_text_content using the AsyncOpenAI client
+        
+        Args:
+            prompt: The text prompt for generation
+            model: The OpenAI model to use
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_prompt: Optional system prompt
+            
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        try:
+            print(f"[OFFICIAL-OPENAI] Async text generation with model: {model}")
+            print(f"[OFFICIAL-OPENAI] Prompt length: {len(prompt)} chars")
+            print(f"[OFFICIAL-OPENAI] Temperature: {temperature}")
+            if max_tokens:
+                print(f"[OFFICIAL-OPENAI] Max tokens: {max_tokens}")
             
-            # Extract content and metadata
-            content = response.choices[0].message.content
-            content_length = len(content) if content else 0
+            start_time = time.time()
             
-            print(f"[OFFICIAL-OPENAI] Generation completed in {execution_time:.2f}s")
-            print(f"[OFFICIAL-OPENAI] Generated content length: {content_length} chars")
+            # Generate content without blocking the event loop
+            response = await self.async_client.chat.completions.create(
+                model=model,
+                messages=self._build_text_messages(prompt, system_prompt),
+                max_tokens=max_tokens,
+                temperature=temperature
+            )
             
-            if content and content_length > 10:  # Minimum viable content
-                metadata = {
-                    "execution_time": execution_time,
-                    "content_length": content_length,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
-                    "provider": "official_openai_sdk",
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
-                    }
-                }
-                return True, content, metadata
-            else:
-                print(f"[OFFICIAL-OPENAI] Insufficient content generated: {content_length} chars")
-                return False, "", {"error": "Insufficient content generated"}
+            execution_time = time.time() - start_time
+            return self._build_result(response, execution_time, model, temperature, max_tokens, 10)  # Minimum viable content
                 
         except Exception as e:
-            print(f"[OFFICIAL-OPENAI] Text generation failed: {e}")
+            print(f"[OFFICIAL-OPENAI] Async text generation failed: {e}")
             return False, "", {"error": str(e)}
     
     def generate_multimodal_content(
@@ -138,84 +242,103 @@ class OfficialOpenAIService:
         Returns:
             Tuple of (success, content, metadata)
         """
-        try:
-            print(f"[OFFICIAL-OPENAI] Multimodal generation with model: {model}")
-            print(f"[OFFICIAL-OPENAI] Text prompt length: {len(text_prompt)} chars")
-            print(f"[OFFICIAL-OPENAI] Image data length: {len(image_data)} bytes")
-            print(f"[OFFICIAL-OPENAI] Image MIME type: {image_mime_type}")
-            print(f"[OFFICIAL-OPENAI] Detail level: {detail}")
-            
-            start_time = time.time()
-            
-            # Convert image to base64
-            image_base64 = base64.b64encode(image_data).decode('utf-8')
+        # Convert image to base64
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        return self.generate_multimodal_from_base64(
+            text_prompt, image_base64, image_mime_type, model, max_tokens, temperature, system_prompt, detail
+        )
+    
+    async def agenerate_multimodal_content(
+        self,
+        text_prompt: str,
+        image_data: bytes,
+        image_mime_type: str = "image/png",
+        model: str = "gpt-4o",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None,
+        detail: str = "auto"
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Async variant of generate_multimodal_content
+        
+        Args:
+            text_prompt: The text prompt for generation
+            image_data: Raw image bytes
+            image_mime_type: MIME type of the image (e.g., 'image/png', 'image/jpeg')
+            model: The OpenAI model to use (must support vision)
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_prompt: Optional system prompt
+            detail: Image detail level ('low', 'high', 'auto')
             
-            # Prepare messages
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        # Convert image to base64
+        image_base64 = base64.b64encode(image_data).decode('utf-8')
+        return await self.agenerate_multimodal_from_base64(
+            text_prompt, image_base64, image_mime_type, model, max_tokens, temperature, system_prompt, detail
+        )
+    
+    def generate_multimodal_from_base64(
+        self,
+        text_prompt: str,
+        image_base64: str,
+        image_mime_type: str = "image/png",
+        model: str = "gpt-4o",
+        max_tokens: Optional[int] = None,
+        temperature: float = 0.7,
+        system_prompt: Optional[str] = None,
+        detail: str = "auto"
+    ) -> Tuple[bool, str, Dict[str, Any]]:
+        """
+        Generate content from text + base64 image using the official SDK
+        
+        Args:
+            text_prompt: The text prompt for generation
+            image_base64: Base64 encoded image data
+            image_mime_type: MIME type of the image
+            model: The OpenAI model to use
+            max_tokens: Maximum tokens to generate
+            temperature: Sampling temperature
+            system_prompt: Optional system prompt
+            detail: Image detail level
             
-            # Create multimodal message content
-            user_content = [
-                {
-                    "type": "text",
-                    "text": text_prompt
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:{image_mime_type};base64,{image_base64}",
-                        "detail": detail
-                    }
-                }
-            ]
+        Returns:
+            Tuple of (success, content, metadata)
+        """
+        try:
+            # Decode base64 to bytes for metadata
+            image_data = base64.b64decode(image_base64)
+            self._log_multimodal_request(text_prompt, image_base64, image_mime_type, model, detail)
             
-            messages.append({"role": "user", "content": user_content})
+            start_time = time.time()
             
             # Generate content
             response = self.client.chat.completions.create(
                 model=model,
-                messages=messages,
+                messages=self._build_multimodal_messages(text_prompt, image_base64, image_mime_type, system_prompt, detail),
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
             execution_time = time.time() - start_time
-            
-            # Extract content and metadata
-            content = response.choices[0].message.content
-            content_length = len(content) if content else 0
-            
-            print(f"[OFFICIAL-OPENAI] Multimodal generation completed in {execution_time:.2f}s")
-            print(f"[OFFICIAL-OPENAI] Generated content length: {content_length} chars")
-            
-            if content and content_length > 50:  # Higher threshold for multimodal
-                metadata = {
-                    "execution_time": execution_time,
-                    "content_length": content_length,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
+            return self._build_result(
+                response, execution_time, model, temperature, max_tokens, 50,  # Higher threshold for multimodal
+                label="Multimodal ",
+                extra_metadata={
                     "image_size_bytes": len(image_data),
                     "image_mime_type": image_mime_type,
-                    "detail_level": detail,
-                    "provider": "official_openai_sdk",
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
-                    }
+                    "detail_level": detail
                 }
-                return True, content, metadata
-            else:
-                print(f"[OFFICIAL-OPENAI] Insufficient content generated: {content_length} chars")
-                return False, "", {"error": "Insufficient content generated"}
+            )
                 
         except Exception as e:
             print(f"[OFFICIAL-OPENAI] Multimodal generation failed: {e}")
             return False, "", {"error": str(e)}
     
-    def generate_multimodal_from_base64(
+    async def agenerate_multimodal_from_base64(
         self,
         text_prompt: str,
         image_base64: str,
@@ -227,7 +350,7 @@ class OfficialOpenAIService:
         detail: str = "auto"
     ) -> Tuple[bool, str, Dict[str, Any]]:
         """
-        Generate content from text + base64 image using the official SDK
+        Async variant of generate_multimodal_from_base64 using the AsyncOpenAI client
         
         Args:
             text_prompt: The text prompt for generation
@@ -245,92 +368,73 @@ class OfficialOpenAIService:
         try:
             # Decode base64 to bytes for metadata
             image_data = base64.b64decode(image_base64)
-            
-            print(f"[OFFICIAL-OPENAI] Multimodal generation with model: {model}")
-            print(f"[OFFICIAL-OPENAI] Text prompt length: {len(text_prompt)} chars")
-            print(f"[OFFICIAL-OPENAI] Image base64 length: {len(image_base64)} chars")
-            print(f"[OFFICIAL-OPENAI] Image MIME type: {image_mime_type}")
-            print(f"[OFFICIAL-OPENAI] Detail level: {detail}")
+            self._log_multimodal_request(text_prompt, image_base64, image_mime_type, model, detail)
             
             start_time = time.time()
             
-            # Prepare messages
-            messages = []
-            if system_prompt:
-                messages.append({"role": "system", "content": system_prompt})
-            
-            # Create multimodal message content
-            user_content = [
-                {
-                    "type": "text",
-                    "text": text_prompt
-                },
-                {
-                    "type": "image_url",
-                    "image_url": {
-                        "url": f"data:{image_mime_type};base64,{image_base64}",
-                        "detail": detail
-                    }
-                }
-            ]
-            
-            messages.append({"role": "user", "content": user_content})
-            
-            # Generate content
-            response = self.client.chat.completions.create(
+            # Generate content without blocking the event loop
+            response = await self.async_client.chat.completions.create(
                 model=model,
-                messages=messages,
+                messages=self._build_multimodal_messages(text_prompt, image_base64, image_mime_type, system_prompt, detail),
                 max_tokens=max_tokens,
                 temperature=temperature
             )
             
             execution_time = time.time() - start_time
-            
-            # Extract content and metadata
-            content = response.choices[0].message.content
-            content_length = len(content) if content else 0
-            
-            print(f"[OFFICIAL-OPENAI] Multimodal generation completed in {execution_time:.2f}s")
-            print(f"[OFFICIAL-OPENAI] Generated content length: {content_length} chars")
-            
-            if content and content_length > 50:  # Higher threshold for multimodal
-                metadata = {
-                    "execution_time": execution_time,
-                    "content_length": content_length,
-                    "model": model,
-                    "temperature": temperature,
-                    "max_tokens": max_tokens,
+            return self._build_result(
+                response, execution_time, model, temperature, max_tokens, 50,  # Higher threshold for multimodal
+                label="Multimodal ",
+                extra_metadata={
                     "image_size_bytes": len(image_data),
                     "image_mime_type": image_mime_type,
-                    "detail_level": detail,
-                    "provider": "official_openai_sdk",
-                    "usage": {
-                        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
-                        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
-                        "total_tokens": response.usage.total_tokens if response.usage else 0
-                    }
+                    "detail_level": detail
                 }
-                return True, content, metadata
-            else:
-                print(f"[OFFICIAL-OPENAI] Insufficient content generated: {content_length} chars")
-                return False, "", {"error": "Insufficient content generated"}
+            )
                 
         except Exception as e:
-            print(f"[OFFICIAL-OPENAI] Multimodal generation failed: {e}")
+            print(f"[OFFICIAL-OPENAI] Async multimodal generation failed: {e}")
             return False, "", {"error": str(e)}
     
-    def is_available(self) -> bool:
-        """Check if the service is available and working"""
+
+    def probe_availability(self, model: str = "gpt-4o") -> Tuple[bool, Optional[str]]:
+        """
+        Live availability check used by the provider health monitor
+        
+        Returns:
+            Tuple of (available, error)
+        """
         try:
             # Simple test generation
             success, content, metadata = self.generate_text_content(
                 prompt="Hello",
+                model=model,
                 max_tokens=10
             )
-            return success and len(content) > 0
+            if success and len(content) > 0:
+                return True, None
+            return False, metadata.get("error", "Empty probe response")
         except Exception as e:
             print(f"[OFFICIAL-OPENAI] Availability check failed: {e}")
-            return False
+            return False, str(e)
+    
+    async def aprobe_availability(self, model: str = "gpt-4o") -> Tuple[bool, Optional[str]]:
+        """Async variant of probe_availability"""
+        try:
+            success, content, metadata = await self.agenerate_text_content(
+                prompt="Hello",
+                model=model,
+                max_tokens=10
+            )
+            if success and len(content) > 0:
+                return True, None
+            return False, metadata.get("error", "Empty probe response")
+        except Exception as e:
+            print(f"[OFFICIAL-OPENAI] Availability check failed: {e}")
+            return False, str(e)
+    
+    def is_available(self, model: Optional[str] = None) -> bool:
+        """Check if the service is available, using the cached health status"""
+        return get_provider_health_monitor().is_available("openai", model)
     
     def get_supported_models(self) -> List[str]:
         """Get list of supported OpenAI models"""
@@ -364,7 +468,8 @@ class OfficialOpenAIService:
             "supports_system_prompts": True,
             "supports_temperature_control": True,
             "supports_max_tokens": True,
-            "is_available": self.is_available()
+            "is_available": self.is_available(),
+            "health": get_provider_health_monitor().get_provider_statuses("openai")
         }
 
 # Global service instance
@@ -405,6 +510,33 @@ def generate_multimodal_with_official_openai(
         text_prompt, image_base64, image_mime_type, model, max_tokens, temperature, system_prompt, detail
     )
 
+async def agenerate_text_with_official_openai(
+    prompt: str,
+    model: str = "gpt-4o",
+    max_tokens: Optional[int] = None,
+    temperature: float = 0.7,
+    system_prompt: Optional[str] = None
+) -> Tuple[bool, str, Dict[str, Any]]:
+    """Async convenience function for text generation"""
+    service = get_official_openai_service()
+    return await service.agenerate_text_content(prompt, model, max_tokens, temperature, system_prompt)
+
+async def agenerate_multimodal_with_official_openai(
+    text_prompt: str,
+    image_base64: str,
+    image_mime_type: str = "image/png",
+    model: str = "gpt-4o",
+    max_tokens: Optional[int] = None,
+    temperature: float = 0.7,
+    system_prompt: Optional[str] = None,
+    detail: str = "auto"
+) -> Tuple[bool, str, Dict[str, Any]]:
+    """Async convenience function for multimodal generation"""
+    service = get_official_openai_service()
+    return await service.agenerate_multimodal_from_base64(
+        text_prompt, image_base64, image_mime_type, model, max_tokens, temperature, system_prompt, detail
+    )
+
 if __name__ == "__main__":
     # Test the service
     print("🧪 Testing Official OpenAI Service...")
@@ -0,0 +1,599 @@
+#!/usr/bin/env python3
+"""
+Playwright MCP Session Pool
+
+Keeps a pool of pre-connected SSE sessions to one or more Playwright MCP
+servers so test executions borrow a ready session instead of opening (and
+leaking) a new MCPClient per run.
+
+The Playwright MCP servers run with --isolated, so every session owns its own
+browser context. A borrowed session is health-checked before it is handed out
+and reset on return (its browser context is closed, so the next run starts
+from a clean profile). Sessions that fail either step are closed and replaced.
+
+With several endpoints (PLAYWRIGHT_MCP_URLS) new sessions are opened on the
+least-loaded endpoint that still has room under its own session limit.
+Endpoints that keep failing to connect or answer health checks are ejected
+for a backoff period and retried afterwards.
+"""
+import asyncio
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from mcp_use import MCPClient
+
+from tool_catalog import PLAYWRIGHT_SERVER, get_tool_catalog
+
+
+class PlaywrightSessionPoolError(Exception):
+    """Raised when no Playwright MCP session can be provided"""
+
+
+class ToolCallRecord:
+    """A single tool call made on a Playwright session (by the agent or directly)"""
+
+    def __init__(self, name: str, arguments: Dict[str, Any]):
+        self.name = name
+        self.arguments = dict(arguments or {})
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.started_at = time.time()
+        self.duration = 0.0
+
+
+class PlaywrightSession:
+    """A single pre-connected Playwright MCP session with its own browser context"""
+
+    def __init__(self, url: str, endpoint: Optional["PlaywrightEndpoint"] = None):
+        self.session_id = uuid.uuid4().hex[:8]
+        self.url = url
+        self.endpoint = endpoint
+        self.client: Optional[MCPClient] = None
+        self.session = None
+        self.created_at = time.time()
+        self.last_used = self.created_at
+        self.uses = 0
+        self._tool_call_listeners: List[Callable[[ToolCallRecord], None]] = []
+        self._result_transformers: List[Callable[[str, Dict[str, Any], Any], Any]] = []
+        self._call_tool: Optional[Callable[..., Any]] = None
+
+    async def connect(self):
+        """Open the SSE session to the Playwright MCP server"""
+        self.client = MCPClient({
+            "mcpServers": {
+                "playwright": {
+                    "url": self.url
+                }
+            }
+        })
+        self.session = await self.client.create_session("playwright")
+        self._instrument_connector()
+        print(f"[PW-POOL] Session {self.session_id} connected to {self.url}")
+
+    def _instrument_connector(self):
+        """
+        Wrap the connector's call_tool so every tool call is reported to the listeners
+
+        The MCPAgent's LangChain tools call connector.call_tool, so this sees
+        the agent's browser actions as well as direct calls. Result transformers
+        only rewrite what the agent gets back; listeners and direct calls
+        through call_tool() see the raw results.
+        """
+        connector = self.session.connector
+        original_call_tool = connector.call_tool
+
+        async def instrumented_call_tool(name: str, arguments: Dict[str, Any], *args, **kwargs):
+            record = ToolCallRecord(name, arguments)
+            try:
+                record.result = await original_call_tool(name, arguments, *args, **kwargs)
+                return record.result
+            except Exception as e:
+                record.error = str(e)
+                raise
+            finally:
+                record.duration = time.time() - record.started_at
+                for listener in list(self._tool_call_listeners):
+                    try:
+                        listener(record)
+                    except Exception as listener_error:
+                        print(f"[PW-POOL] Tool call listener failed: {listener_error}")
+
+        async def agent_call_tool(name: str, arguments: Dict[str, Any], *args, **kwargs):
+            result = await instrumented_call_tool(name, arguments, *args, **kwargs)
+            for transformer in list(self._result_transformers):
+                try:
+                    result = transformer(name, arguments or {}, result)
+                except Exception as transformer_error:
+                    print(f"[PW-POOL] Tool result transformer failed: {transformer_error}")
+            return result
+
+        self._call_tool = instrumented_call_tool
+        connector.call_tool = agent_call_tool
+
+    def add_tool_call_listener(self, listener: Callable[[ToolCallRecord], None]):
+        """Register a callback invoked after every tool call on this session"""
+        self._tool_call_listeners.append(listener)
+
+    def remove_tool_call_listener(self, listener: Callable[[ToolCallRecord], None]):
+        """Unregister a tool call callback"""
+        if listener in self._tool_call_listeners:
+            self._tool_call_listeners.remove(listener)
+
+    def add_result_transformer(self, transformer: Callable[[str, Dict[str, Any], Any], Any]):
+        """Register a (name, arguments, result) -> result rewrite of the agent's tool results"""
+        self._result_transformers.append(transformer)
+
+    def remove_result_transformer(self, transformer: Callable[[str, Dict[str, Any], Any], Any]):
+        """Unregister a tool result transformer"""
+        if transformer in self._result_transformers:
+            self._result_transformers.remove(transformer)
+
+    @property
+    def connector(self):
+        return self.session.connector
+
+    async def call_tool(self, name: str, arguments: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Call a Playwright MCP tool directly on this session (untransformed result)
+
+        Arguments are validated against the cached tool catalog first.
+        """
+        get_tool_catalog().validate(PLAYWRIGHT_SERVER, name, arguments or {})
+        return await self._call_tool(name, arguments or {})
+
+    async def health_check(self, timeout: float) -> bool:
+        """Round-trip to the MCP server to make sure the session is still usable"""
+        try:
+            client_session = getattr(self.connector, "client_session", None) or getattr(self.connector, "client", None)
+            if client_session is not None and hasattr(client_session, "send_ping"):
+                await asyncio.wait_for(client_session.send_ping(), timeout=timeout)
+            else:
+                await asyncio.wait_for(self.connector.list_tools(), timeout=timeout)
+            return True
+        except Exception as e:
+            print(f"[PW-POOL] Session {self.session_id} failed health check: {e}")
+            return False
+
+    async def reset(self, timeout: float) -> bool:
+        """Close the session's browser context so the next borrower starts clean"""
+        try:
+            await asyncio.wait_for(self.call_tool("browser_close"), timeout=timeout)
+            return True
+        except Exception as e:
+            print(f"[PW-POOL] Session {self.session_id} failed to reset: {e}")
+            return False
+
+    async def close(self):
+        """Close the SSE session"""
+        if self.client is None:
+            return
+        try:
+            await self.client.close_all_sessions()
+            print(f"[PW-POOL] Session {self.session_id} closed")
+        except Exception as e:
+            print(f"[PW-POOL] Error closing session {self.session_id}: {e}")
+        finally:
+            self.client = None
+            self.session = None
+
+
+def normalize_endpoint_url(url: str) -> str:
+    """Playwright MCP SSE endpoint for a server base URL"""
+    url = url.strip().rstrip("/")
+    return url if url.endswith("/sse") else f"{url}/sse"
+
+
+def get_configured_endpoints() -> List[Tuple[str, Optional[int]]]:
+    """
+    Parse PLAYWRIGHT_MCP_URLS ("url|max_sessions,url,...") into (url, limit) pairs
+
+    Falls back to PLAYWRIGHT_MCP_URL for a single endpoint. A missing limit
+    means the pool-wide per-endpoint default.
+    """
+    value = os.getenv("PLAYWRIGHT_MCP_URLS") or os.getenv("PLAYWRIGHT_MCP_URL", "http://localhost:8931")
+    endpoints = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        url, _, limit = item.partition("|")
+        endpoints.append((normalize_endpoint_url(url), int(limit) if limit.strip() else None))
+    return endpoints
+
+
+class PlaywrightEndpoint:
+    """One Playwright MCP server: its sessions, session limit and health"""
+
+    def __init__(self, url: str, max_sessions: int, eject_threshold: int, eject_seconds: float, max_eject_seconds: float):
+        self.url = url
+        self.max_sessions = max_sessions
+        self.eject_threshold = eject_threshold
+        self.eject_seconds = eject_seconds
+        self.max_eject_seconds = max_eject_seconds
+        self.idle: List[PlaywrightSession] = []
+        self.in_use = 0
+        self.opening = 0
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.ejections = 0
+        self.last_error: Optional[str] = None
+        self.created = 0
+        self.discarded = 0
+        self.borrows = 0
+        self.failures = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.idle) + self.in_use + self.opening
+
+    @property
+    def load(self) -> float:
+        return (self.in_use + self.opening) / self.max_sessions
+
+    @property
+    def has_capacity(self) -> bool:
+        return self.size < self.max_sessions
+
+    def is_available(self, now: Optional[float] = None) -> bool:
+        """Whether the endpoint is currently routable (not ejected)"""
+        return (now or time.time()) >= self.ejected_until
+
+    def record_success(self):
+        self.consecutive_failures = 0
+        self.ejections = 0
+
+    def record_failure(self, error: str) -> bool:
+        """Count a failure; returns True when it ejects the endpoint"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.consecutive_failures < self.eject_threshold:
+            return False
+        backoff = min(self.eject_seconds * (2 ** self.ejections), self.max_eject_seconds)
+        self.ejected_until = time.time() + backoff
+        self.ejections += 1
+        self.consecutive_failures = 0
+        print(f"[PW-POOL] Ejected endpoint {self.url} for {backoff:.0f}s after repeated failures: {error}")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "url": self.url,
+            "healthy": self.is_available(now),
+            "ejected_for_seconds": round(self.ejected_until - now, 1) if not self.is_available(now) else 0,
+            "idle": len(self.idle),
+            "in_use": self.in_use,
+            "opening": self.opening,
+            "max_sessions": self.max_sessions,
+            "created": self.created,
+            "discarded": self.discarded,
+            "borrows": self.borrows,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "last_error": self.last_error
+        }
+
+
+class PlaywrightSessionPool:
+    """Bounded pool of reusable Playwright MCP sessions across one or more endpoints"""
+
+    def __init__(
+        self,
+        endpoints: Optional[List[Tuple[str, Optional[int]]]] = None,
+        min_size: Optional[int] = None,
+        max_size: Optional[int] = None,
+        acquire_timeout: Optional[float] = None
+    ):
+        # min_size and max_size are per endpoint
+        self.min_size = min_size if min_size is not None else int(os.getenv("PLAYWRIGHT_POOL_MIN_SIZE", "1"))
+        default_max = max_size if max_size is not None else int(os.getenv("PLAYWRIGHT_POOL_MAX_SIZE", "4"))
+        self.acquire_timeout = acquire_timeout if acquire_timeout is not None else float(os.getenv("PLAYWRIGHT_POOL_ACQUIRE_TIMEOUT", "120"))
+        self.health_check_timeout = float(os.getenv("PLAYWRIGHT_POOL_HEALTH_CHECK_TIMEOUT", "5"))
+        self.health_interval = float(os.getenv("PLAYWRIGHT_ENDPOINT_HEALTH_INTERVAL", "30"))
+        eject_threshold = int(os.getenv("PLAYWRIGHT_ENDPOINT_EJECT_THRESHOLD", "2"))
+        eject_seconds = float(os.getenv("PLAYWRIGHT_ENDPOINT_EJECT_SECONDS", "30"))
+        max_eject_seconds = float(os.getenv("PLAYWRIGHT_ENDPOINT_MAX_EJECT_SECONDS", "300"))
+        self.endpoints = [
+            PlaywrightEndpoint(url, limit or default_max, eject_threshold, eject_seconds, max_eject_seconds)
+            for url, limit in (endpoints if endpoints is not None else get_configured_endpoints())
+        ]
+        self._in_use: Dict[str, PlaywrightSession] = {}
+        self._condition = asyncio.Condition()
+        self._monitor_task: Optional[asyncio.Task] = None
+        self._closed = False
+
+    @property
+    def max_size(self) -> int:
+        """Total session capacity of the endpoints that are not ejected"""
+        now = time.time()
+        return sum(endpoint.max_sessions for endpoint in self.endpoints if endpoint.is_available(now))
+
+    @property
+    def size(self) -> int:
+        return sum(endpoint.size for endpoint in self.endpoints)
+
+    def least_loaded_url(self) -> str:
+        """URL of the least-loaded healthy endpoint, for callers that manage their own client"""
+        now = time.time()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)] or self.endpoints
+        return min(candidates, key=lambda endpoint: endpoint.load).url
+
+    async def _open_session(self, endpoint: PlaywrightEndpoint) -> PlaywrightSession:
+        session = PlaywrightSession(endpoint.url, endpoint)
+        try:
+            await session.connect()
+            endpoint.created += 1
+            # Fill the tool catalog from the first session that connects
+            catalog = get_tool_catalog()
+            if not catalog.is_loaded(PLAYWRIGHT_SERVER):
+                try:
+                    await catalog.get(PLAYWRIGHT_SERVER, session.connector.list_tools)
+                except Exception as e:
+                    print(f"[PW-POOL] Could not load the Playwright tool catalog: {e}")
+        except asyncio.CancelledError:
+            # Don't leave a half-opened SSE connection behind
+            await asyncio.shield(session.close())
+            raise
+        return session
+
+    async def _abandon(self, endpoint: PlaywrightEndpoint, counted: Optional[str], session: Optional[PlaywrightSession]):
+        """Roll back what a cancelled acquire() counted and close the session it had checked out"""
+        async with self._condition:
+            if counted == "opening":
+                endpoint.opening -= 1
+            elif counted == "in_use":
+                endpoint.in_use -= 1
+                self._in_use.pop(session.session_id, None)
+            self._condition.notify()
+        if counted == "in_use":
+            await self._discard(session)
+
+    async def _discard(self, session: PlaywrightSession):
+        if session.endpoint is not None:
+            session.endpoint.discarded += 1
+        await session.close()
+
+    def _record_failure(self, endpoint: PlaywrightEndpoint, error: str) -> List[PlaywrightSession]:
+        """Record an endpoint failure (under the lock); returns idle sessions to close if it was ejected"""
+        if not endpoint.record_failure(error):
+            return []
+        # The server may come back restarted (or upgraded) with a different tool set
+        get_tool_catalog().invalidate(PLAYWRIGHT_SERVER)
+        stale, endpoint.idle = endpoint.idle, []
+        return stale
+
+    async def _warm(self, endpoint: PlaywrightEndpoint):
+        """Open sessions on an endpoint until it has min_size of them"""
+        while endpoint.is_available() and endpoint.size < min(self.min_size, endpoint.max_sessions) and not self._closed:
+            async with self._condition:
+                endpoint.opening += 1
+            try:
+                session = await self._open_session(endpoint)
+            except Exception as e:
+                async with self._condition:
+                    endpoint.opening -= 1
+                    stale = self._record_failure(endpoint, str(e))
+                for session in stale:
+                    await self._discard(session)
+                print(f"[PW-POOL] Could not pre-connect session to {endpoint.url}: {e}")
+                return
+            async with self._condition:
+                endpoint.opening -= 1
+                endpoint.record_success()
+                endpoint.idle.append(session)
+                self._condition.notify()
+
+    async def _check_idle_sessions(self, endpoint: PlaywrightEndpoint):
+        """Health-check an endpoint's idle sessions, dropping the dead ones"""
+        async with self._condition:
+            checking, endpoint.idle = endpoint.idle, []
+            endpoint.in_use += len(checking)
+        for session in checking:
+            healthy = await session.health_check(self.health_check_timeout)
+            async with self._condition:
+                endpoint.in_use -= 1
+                if healthy:
+                    endpoint.idle.append(session)
+                    stale = []
+                else:
+                    stale = self._record_failure(endpoint, "idle session failed health check")
+                self._condition.notify_all()
+            if not healthy:
+                await self._discard(session)
+            for stale_session in stale:
+                await self._discard(stale_session)
+
+    async def _monitor(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            for endpoint in self.endpoints:
+                try:
+                    if endpoint.is_available():
+                        await self._check_idle_sessions(endpoint)
+                        await self._warm(endpoint)
+                except Exception as e:
+                    print(f"[PW-POOL] Health check of {endpoint.url} failed: {e}")
+
+    async def start(self):
+        """Pre-connect min_size sessions per endpoint (a missing server is logged, not fatal)"""
+        await asyncio.gather(*(self._warm(endpoint) for endpoint in self.endpoints))
+        if self._monitor_task is None:
+            self._monitor_task = asyncio.create_task(self._monitor())
+        idle = sum(len(endpoint.idle) for endpoint in self.endpoints)
+        print(f"[PW-POOL] Playwright session pool ready ({len(self.endpoints)} endpoints, {idle} idle, max {self.max_size})")
+        if not idle:
+            print("[PW-POOL] Sessions will be opened on demand once the Playwright MCP servers are running")
+
+    def _pick(self, now: float) -> Tuple[Optional[PlaywrightEndpoint], Optional[PlaywrightSession]]:
+        """Choose (under the lock) an idle session, or an endpoint to open one on, least-loaded first"""
+        available = [endpoint for endpoint in self.endpoints if endpoint.is_available(now)]
+        with_idle = [endpoint for endpoint in available if endpoint.idle]
+        if with_idle:
+            endpoint = min(with_idle, key=lambda candidate: candidate.load)
+            return endpoint, endpoint.idle.pop()
+        with_room = [endpoint for endpoint in available if endpoint.has_capacity]
+        if with_room:
+            return min(with_room, key=lambda candidate: candidate.load), None
+        return None, None
+
+    async def acquire(self) -> PlaywrightSession:
+        """Borrow a healthy session, opening a new one on the least-loaded endpoint with room"""
+        if self._closed:
+            raise PlaywrightSessionPoolError("Playwright session pool is closed")
+
+        deadline = time.time() + self.acquire_timeout
+        while True:
+            async with self._condition:
+                while True:
+                    now = time.time()
+                    endpoint, session = self._pick(now)
+                    if endpoint is not None:
+                        # Count the session as in use while it is opened or health-checked so no endpoint overshoots its limit
+                        if session is not None:
+                            endpoint.in_use += 1
+                            self._in_use[session.session_id] = session
+                            counted = "in_use"
+                        else:
+                            endpoint.opening += 1
+                            counted = "opening"
+                        break
+                    remaining = deadline - now
+                    if remaining <= 0:
+                        raise PlaywrightSessionPoolError(
+                            f"Timed out after {self.acquire_timeout:.0f}s waiting for a Playwright MCP session"
+                        )
+                    # Wake up on release, or when the next ejected endpoint becomes routable again
+                    next_recovery = min((e.ejected_until for e in self.endpoints if not e.is_available(now)), default=None)
+                    wait = remaining if next_recovery is None else max(0.05, min(remaining, next_recovery - now))
+                    try:
+                        await asyncio.wait_for(self._condition.wait(), timeout=wait)
+                    except asyncio.TimeoutError:
+                        pass
+
+            # `counted` tracks what this acquire holds, so a cancellation (job cancel,
+            # client disconnect) can hand it back instead of leaking the slot
+            try:
+                if counted == "opening":
+                    try:
+                        opened = await self._open_session(endpoint)
+                    except Exception as e:
+                        async with self._condition:
+                            endpoint.opening -= 1
+                            counted = None
+                            stale = self._record_failure(endpoint, str(e))
+                            all_ejected = not any(candidate.is_available() for candidate in self.endpoints)
+                            self._condition.notify_all()
+                        for stale_session in stale:
+                            await self._discard(stale_session)
+                        print(f"[PW-POOL] Failed to connect to {endpoint.url}: {e}")
+                        if all_ejected:
+                            raise PlaywrightSessionPoolError(f"No healthy Playwright MCP endpoint available (last error from {endpoint.url}: {e})")
+                        continue
+                    try:
+                        async with self._condition:
+                            endpoint.opening -= 1
+                            endpoint.in_use += 1
+                            endpoint.record_success()
+                            self._in_use[opened.session_id] = opened
+                            session, counted = opened, "in_use"
+                    except asyncio.CancelledError:
+                        await asyncio.shield(self._discard(opened))
+                        raise
+                elif not await session.health_check(self.health_check_timeout):
+                    async with self._condition:
+                        endpoint.in_use -= 1
+                        self._in_use.pop(session.session_id, None)
+                        counted = None
+                        stale = self._record_failure(endpoint, "session failed health check")
+                        self._condition.notify_all()
+                    await asyncio.shield(self._discard(session))
+                    for stale_session in stale:
+                        await self._discard(stale_session)
+                    continue
+                else:
+                    endpoint.record_success()
+            except asyncio.CancelledError:
+                if counted is not None:
+                    await asyncio.shield(self._abandon(endpoint, counted, session))
+                raise
+
+            session.last_used = time.time()
+            session.uses += 1
+            endpoint.borrows += 1
+            return session
+
+    async def release(self, session: PlaywrightSession, reset: bool = True):
+        """Return a session to the pool, resetting its browser context first"""
+        endpoint = session.endpoint
+        session._tool_call_listeners.clear()
+        session._result_transformers.clear()
+        # The session keeps counting against its endpoint until it is idle again or closed
+        keep = not self._closed and endpoint.is_available() and (not reset or await session.reset(self.health_check_timeout))
+        if not keep:
+            await self._discard(session)
+
+        async with self._condition:
+            self._in_use.pop(session.session_id, None)
+            endpoint.in_use -= 1
+            if keep:
+                endpoint.idle.append(session)
+            self._condition.notify()
+
+    @asynccontextmanager
+    async def session(self):
+        """Borrow a session for the duration of the block"""
+        session = await self.acquire()
+        try:
+            yield session
+        finally:
+            await self.release(session)
+
+    async def close(self):
+        """Close all idle sessions; in-use sessions are closed when released"""
+        self._closed = True
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            try:
+                await self._monitor_task
+            except asyncio.CancelledError:
+                pass
+            self._monitor_task = None
+        async with self._condition:
+            idle = [session for endpoint in self.endpoints for session in endpoint.idle]
+            for endpoint in self.endpoints:
+                endpoint.idle = []
+            self._condition.notify_all()
+        for session in idle:
+            await session.close()
+        print(f"[PW-POOL] Playwright session pool closed ({len(self._in_use)} sessions still in use)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool occupancy for the health endpoints"""
+        endpoints = [endpoint.stats() for endpoint in self.endpoints]
+        return {
+            "idle": sum(endpoint["idle"] for endpoint in endpoints),
+            "in_use": sum(endpoint["in_use"] for endpoint in endpoints),
+            "opening": sum(endpoint["opening"] for endpoint in endpoints),
+            "min_size_per_endpoint": self.min_size,
+            "max_size": self.max_size,
+            "healthy_endpoints": sum(1 for endpoint in endpoints if endpoint["healthy"]),
+            "created": sum(endpoint["created"] for endpoint in endpoints),
+            "discarded": sum(endpoint["discarded"] for endpoint in endpoints),
+            "borrows": sum(endpoint["borrows"] for endpoint in endpoints),
+            "closed": self._closed,
+            "endpoints": endpoints
+        }
+
+# Global pool instance
+_playwright_session_pool = None
+
+def get_playwright_session_pool() -> PlaywrightSessionPool:
+    """Get or create the global PlaywrightSessionPool instance"""
+    global _playwright_session_pool
+    if _playwright_session_pool is None:
+        _playwright_session_pool = PlaywrightSessionPool()
+    return _playwright_session_pool
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Provider Health Monitor
+
+Keeps a cached availability status for every LLM provider/model pair so that
+request handlers can decide between the official SDKs and the LangChain
+fallbacks without making a live generation call on the request path.
+
+Probes run on a background schedule (started from the FastAPI lifespan hook)
+and each status expires after a TTL, after which it is reported as unknown
+until the next probe refreshes it.
+"""
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from llm_executor import get_llm_executor
+
+# Probe targets used when PROVIDER_HEALTH_MODELS is not set
+DEFAULT_PROBE_TARGETS = "google:gemini-2.5-flash,openai:gpt-4o"
+
+# A probe returns (available, error); async probes are awaited, sync ones run on the provider's executor lane
+ProbeFunction = Callable[[], Union[Tuple[bool, Optional[str]], Awaitable[Tuple[bool, Optional[str]]]]]
+
+
+class ProviderStatus:
+    """Last known health of a single provider/model pair"""
+
+    def __init__(self, provider: str, model: str):
+        self.provider = provider
+        self.model = model
+        self.available: Optional[bool] = None
+        self.last_checked: Optional[float] = None
+        self.last_latency: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+
+    def is_fresh(self, ttl: float) -> bool:
+        """Whether the last probe result is still within its TTL"""
+        return self.last_checked is not None and (time.time() - self.last_checked) <= ttl
+
+    def record(self, available: bool, latency: float, error: Optional[str] = None):
+        """Store the outcome of a probe"""
+        self.available = available
+        self.last_checked = time.time()
+        self.last_latency = latency
+        self.last_error = error
+        self.consecutive_failures = 0 if available else self.consecutive_failures + 1
+
+    def to_dict(self, ttl: float) -> Dict[str, Any]:
+        """Serialize the status for the health endpoints"""
+        fresh = self.is_fresh(ttl)
+        if self.available is None or not fresh:
+            state = "unknown"
+        else:
+            state = "healthy" if self.available else "unhealthy"
+        return {
+            "provider": self.provider,
+            "model": self.model,
+            "status": state,
+            "available": self.available if fresh else None,
+            "last_checked": self.last_checked,
+            "age_seconds": round(time.time() - self.last_checked, 1) if self.last_checked else None,
+            "last_latency": round(self.last_latency, 3) if self.last_latency is not None else None,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class ProviderHealthMonitor:
+    """Background prober with O(1) availability lookups"""
+
+    def __init__(self, interval: Optional[float] = None, ttl: Optional[float] = None, timeout: Optional[float] = None):
+        self.interval = interval if interval is not None else float(os.getenv("PROVIDER_HEALTH_INTERVAL", "60"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("PROVIDER_HEALTH_TTL", "180"))
+        self.timeout = timeout if timeout is not None else float(os.getenv("PROVIDER_HEALTH_TIMEOUT", "30"))
+        self._probes: Dict[Tuple[str, str], ProbeFunction] = {}
+        self._statuses: Dict[Tuple[str, str], ProviderStatus] = {}
+        self._default_models: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register_probe(self, provider: str, model: str, probe: ProbeFunction):
+        """
+        Register a probe for a provider/model pair
+
+        The first model registered for a provider is used as the provider-level
+        fallback when a handler asks about a model that is not probed itself.
+        """
+        key = (provider.lower(), model)
+        self._probes[key] = probe
+        self._statuses.setdefault(key, ProviderStatus(provider.lower(), model))
+        self._default_models.setdefault(provider.lower(), model)
+        print(f"[HEALTH] Registered probe for {provider}:{model}")
+
+    def get_status(self, provider: str, model: Optional[str] = None) -> Optional[ProviderStatus]:
+        """Look up the status for a provider/model, falling back to the provider default"""
+        provider = provider.lower()
+        if model and (provider, model) in self._statuses:
+            return self._statuses[(provider, model)]
+        default_model = self._default_models.get(provider)
+        if default_model:
+            return self._statuses.get((provider, default_model))
+        return None
+
+    def is_available(self, provider: str, model: Optional[str] = None) -> bool:
+        """
+        Cached availability check
+
+        Unknown or expired statuses are treated as available so that a cold
+        start or a stalled prober never forces traffic onto the fallbacks;
+        only a fresh failed probe reports the provider as unavailable.
+        """
+        status = self.get_status(provider, model)
+        if status is None or status.available is None or not status.is_fresh(self.ttl):
+            return True
+        return status.available
+
+    async def probe(self, provider: str, model: str) -> ProviderStatus:
+        """Run a single probe now and record the result"""
+        key = (provider.lower(), model)
+        probe = self._probes[key]
+        status = self._statuses[key]
+        start_time = time.time()
+        try:
+            if asyncio.iscoroutinefunction(probe):
+                pending = probe()
+            else:
+                pending = get_llm_executor().run(provider, probe)
+            available, error = await asyncio.wait_for(pending, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            available, error = False, f"Probe timed out after {self.timeout:.0f}s"
+        except Exception as e:
+            available, error = False, str(e)
+        latency = time.time() - start_time
+        status.record(available, latency, error)
+        state = "healthy" if available else f"unhealthy ({error})"
+        print(f"[HEALTH] {provider}:{model} {state} in {latency:.2f}s")
+        return status
+
+    async def probe_all(self):
+        """Probe every registered provider/model concurrently"""
+        if not self._probes:
+            return
+        await asyncio.gather(
+            *(self.probe(provider, model) for provider, model in list(self._probes.keys())),
+            return_exceptions=True
+        )
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"[HEALTH] Probe cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Start the background probe loop (idempotent)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+            print(f"[HEALTH] Provider health monitor started (interval={self.interval:.0f}s, ttl={self.ttl:.0f}s)")
+
+    async def stop(self):
+        """Stop the background probe loop"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            print("[HEALTH] Provider health monitor stopped")
+
+    def get_provider_statuses(self, provider: str) -> List[Dict[str, Any]]:
+        """All known statuses for a single provider"""
+        return [
+            status.to_dict(self.ttl)
+            for (status_provider, _), status in self._statuses.items()
+            if status_provider == provider.lower()
+        ]
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Full monitor state for the /health/providers endpoint"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "interval_seconds": self.interval,
+            "ttl_seconds": self.ttl,
+            "providers": [status.to_dict(self.ttl) for status in self._statuses.values()]
+        }
+
+
+def get_configured_probe_targets() -> List[Tuple[str, str]]:
+    """Parse PROVIDER_HEALTH_MODELS ("provider:model,provider:model") into pairs"""
+    targets = []
+    for item in os.getenv("PROVIDER_HEALTH_MODELS", DEFAULT_PROBE_TARGETS).split(","):
+        item = item.strip()
+        if ":" not in item:
+            continue
+        provider, model = item.split(":", 1)
+        targets.append((provider.strip().lower(), model.strip()))
+    return targets
+
+# Global monitor instance
+_provider_health_monitor = None
+
+def get_provider_health_monitor() -> ProviderHealthMonitor:
+    """Get or create the global ProviderHealthMonitor instance"""
+    global _provider_health_monitor
+    if _provider_health_monitor is None:
+        _provider_health_monitor = ProviderHealthMonitor()
+    return _provider_health_monitor
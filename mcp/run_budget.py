@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Run Budgets
+
+Per-run limits on browser steps, wall-clock time and LLM tokens for agent
+test executions, so a confused agent cannot hold a browser session and an
+LLM slot indefinitely.
+
+A RunBudget counts the tool calls on the run's Playwright session (as a tool
+call listener) and the tokens of every LLM call made inside RunBudget.run()
+(through a LangChain callback registered for that task only). As soon as a
+limit is crossed the agent task is cancelled and BudgetExceededError is
+raised, leaving the caller to capture a final screenshot and report the
+steps that were completed.
+"""
+import asyncio
+import json
+import os
+import time
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, List, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_core.tracers.context import register_configure_hook
+
+from playwright_session_pool import ToolCallRecord
+from trace_replay import tool_result_is_error, tool_result_text
+
+# Callback handler of the budget whose run() is executing in the current task
+_budget_callback: ContextVar[Optional[BaseCallbackHandler]] = ContextVar("run_budget_callback", default=None)
+register_configure_hook(_budget_callback, inheritable=True)
+
+
+class BudgetExceededError(Exception):
+    """Raised by RunBudget.run when a step, time or token limit is crossed"""
+
+
+def _env_limit(name: str, default: str) -> Optional[float]:
+    """A limit from the environment; 0 or empty means unlimited"""
+    value = float(os.getenv(name, default) or 0)
+    return value if value > 0 else None
+
+
+def _usage_tokens(response: LLMResult) -> int:
+    """Total tokens reported for an LLM call, from message usage metadata or llm_output"""
+    total = 0
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                total += usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0)
+    if total:
+        return total
+    llm_output = response.llm_output or {}
+    usage = llm_output.get("token_usage") or llm_output.get("usage") or {}
+    return int(usage.get("total_tokens") or usage.get("input_tokens", 0) + usage.get("output_tokens", 0))
+
+
+class _TokenCounter(BaseCallbackHandler):
+    """Adds the token usage of every finished LLM call to a budget"""
+
+    def __init__(self, budget: "RunBudget"):
+        self.budget = budget
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        self.budget.add_tokens(_usage_tokens(response))
+
+
+class RunBudget:
+    """Step, time and token limits for one test case run"""
+
+    def __init__(self, max_steps: Optional[int] = None, max_seconds: Optional[float] = None, max_tokens: Optional[int] = None):
+        self.max_steps = max_steps if max_steps is not None else _env_limit("TEST_MAX_STEPS", "50")
+        self.max_seconds = max_seconds if max_seconds is not None else _env_limit("TEST_MAX_SECONDS", "600")
+        self.max_tokens = max_tokens if max_tokens is not None else _env_limit("TEST_MAX_TOKENS", "0")
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.steps = 0
+        self.tokens = 0
+        self.llm_calls = 0
+        self.step_log: List[Dict[str, Any]] = []
+        self.exceeded: Optional[str] = None
+        self._tripped = asyncio.Event()
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished_at or time.time()) - self.started_at
+
+    def _trip(self, reason: str):
+        if self.exceeded is None:
+            self.exceeded = reason
+            print(f"[BUDGET] {reason}")
+            self._tripped.set()
+
+    def on_tool_call(self, record: ToolCallRecord):
+        """Tool call listener: count the step and stop the run once it is over the step limit"""
+        self.steps += 1
+        error = record.error or (tool_result_text(record.result)[:200] if tool_result_is_error(record.result) else None)
+        self.step_log.append({"tool": record.name, "arguments": record.arguments, "error": error})
+        if self.max_steps and self.steps > self.max_steps:
+            self._trip(f"Step budget exceeded: the agent attempted step {self.steps} of {int(self.max_steps)} allowed")
+
+    def add_tokens(self, tokens: int):
+        self.llm_calls += 1
+        self.tokens += tokens
+        if self.max_tokens and self.tokens > self.max_tokens:
+            self._trip(f"Token budget exceeded: {self.tokens} of {int(self.max_tokens)} tokens used")
+
+    async def run(self, awaitable: Awaitable[Any]) -> Any:
+        """
+        Await an agent run, cancelling it as soon as a limit is crossed
+
+        Raises BudgetExceededError with the reason when the run was stopped.
+        """
+        # The callback is only visible to the task created here (it copies the current context)
+        context_token = _budget_callback.set(_TokenCounter(self))
+        try:
+            task = asyncio.ensure_future(awaitable)
+        finally:
+            _budget_callback.reset(context_token)
+        tripped = asyncio.ensure_future(self._tripped.wait())
+        try:
+            timeout = max(0.0, self.max_seconds - self.elapsed) if self.max_seconds else None
+            done, _ = await asyncio.wait({task, tripped}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if task in done:
+                return task.result()
+            if not done:
+                self._trip(f"Time budget exceeded: stopped after {self.elapsed:.0f}s of {self.max_seconds:.0f}s allowed")
+            raise BudgetExceededError(self.exceeded)
+        finally:
+            tripped.cancel()
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+            self.finished_at = time.time()
+
+    def partial_report(self) -> str:
+        """Report of the steps completed before the run was stopped"""
+        lines = [
+            "Test execution stopped early before the agent reached a verdict.",
+            f"Reason: {self.exceeded}",
+            "Status: INCOMPLETE",
+            "",
+            f"Browser steps completed ({len(self.step_log)}):"
+        ]
+        for index, step in enumerate(self.step_log, 1):
+            arguments = json.dumps(step["arguments"], ensure_ascii=False)
+            if len(arguments) > 160:
+                arguments = arguments[:160] + "…"
+            lines.append(f"{index}. {step['tool']} {arguments}" + (f" -> error: {step['error']}" if step["error"] else ""))
+        return "\n".join(lines)
+
+    def usage(self) -> Dict[str, Any]:
+        """How much of each budget the run used"""
+        return {
+            "steps": {"used": self.steps, "limit": int(self.max_steps) if self.max_steps else None},
+            "seconds": {"used": round(self.elapsed, 3), "limit": self.max_seconds},
+            "tokens": {"used": self.tokens, "limit": int(self.max_tokens) if self.max_tokens else None, "llm_calls": self.llm_calls},
+            "exceeded": self.exceeded
+        }
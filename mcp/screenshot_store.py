@@ -0,0 +1,522 @@
+#!/usr/bin/env python3
+"""
+Screenshot Store
+
+Per-run, content-addressed storage for the screenshots taken during test
+execution.
+
+Screenshots are captured from the Playwright MCP tool results of the run's
+own session (not by scanning the MCP output directory), stored once per
+unique content hash under blobs/, and indexed in SQLite by run, so listing
+a run's screenshots never touches the directory. File and index writes run
+on a single background thread; re-encoding to WebP and generating
+thumbnails happens afterwards on a separate pool when Pillow is installed.
+"""
+import asyncio
+import base64
+import binascii
+import hashlib
+import os
+import sqlite3
+import struct
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from playwright_session_pool import PlaywrightSession, ToolCallRecord
+
+MIME_EXTENSIONS = {"image/png": "png", "image/jpeg": "jpg", "image/webp": "webp"}
+
+# File variants that can be served, in order of preference for "best"
+IMAGE_VARIANTS = ("webp", "original", "thumbnail")
+
+MAX_PAGE_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    test_case_key TEXT,
+    title TEXT,
+    mode TEXT,
+    status TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    finished_at REAL
+);
+CREATE TABLE IF NOT EXISTS images (
+    sha256 TEXT PRIMARY KEY,
+    mime TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    width INTEGER,
+    height INTEGER,
+    original_path TEXT,
+    webp_path TEXT,
+    webp_size INTEGER,
+    thumbnail_path TEXT,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS screenshots (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    run_id TEXT NOT NULL,
+    sha256 TEXT NOT NULL,
+    name TEXT NOT NULL,
+    step_index INTEGER NOT NULL,
+    captured_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_screenshots_run ON screenshots (run_id, step_index);
+CREATE INDEX IF NOT EXISTS idx_screenshots_sha ON screenshots (sha256);
+CREATE INDEX IF NOT EXISTS idx_screenshots_captured ON screenshots (captured_at);
+CREATE INDEX IF NOT EXISTS idx_runs_test_case ON runs (test_case_key, started_at);
+"""
+
+SCREENSHOT_COLUMNS = """
+    s.id, s.run_id, s.sha256, s.name, s.step_index, s.captured_at,
+    i.mime, i.size, i.width, i.height, i.original_path, i.webp_path, i.thumbnail_path
+"""
+
+
+def image_dimensions(data: bytes) -> Optional[tuple]:
+    """Width and height from a PNG header (other formats are measured when re-encoded)"""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    return None
+
+
+def encode_cursor(screenshot_id: int) -> str:
+    """Opaque pagination cursor for the last screenshot on a page"""
+    return base64.urlsafe_b64encode(str(screenshot_id).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Inverse of encode_cursor; raises ValueError for a malformed cursor"""
+    try:
+        return int(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode())
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def screenshot_row_to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+    """Index row to API dict; 'url' stays valid after the original is re-encoded"""
+    item = dict(row)
+    item["path"] = item["webp_path"] or item["original_path"]
+    item["url"] = f"/screenshots/files/{item['sha256']}"
+    item["thumbnail_url"] = f"{item['url']}?variant=thumbnail" if item["thumbnail_path"] else None
+    return item
+
+
+class ScreenshotStore:
+    """Content-addressed screenshot files plus a SQLite run index"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("SCREENSHOT_STORE_DIR", "./screenshots/store")
+        self.webp_quality = int(os.getenv("SCREENSHOT_WEBP_QUALITY", "80"))
+        self.thumbnail_width = int(os.getenv("SCREENSHOT_THUMBNAIL_WIDTH", "320"))
+        self.keep_original = os.getenv("SCREENSHOT_KEEP_ORIGINAL", "false").lower() == "true"
+        self._io = ThreadPoolExecutor(max_workers=1, thread_name_prefix="screenshot-io")
+        self._encoder = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SCREENSHOT_ENCODER_WORKERS", "2")), thread_name_prefix="screenshot-encode"
+        )
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: Dict[str, Set[asyncio.Task]] = {}
+        self._encoding: Set[asyncio.Task] = set()
+        self._active_runs: Dict[str, float] = {}
+        self._step_counters: Dict[str, int] = {}
+        self._pillow_warned = False
+        self.captured = 0
+        self.deduplicated = 0
+        self.encoded = 0
+
+    # --- Index access (always on the single IO thread) ---
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._connection = sqlite3.connect(os.path.join(self.directory, "index.sqlite3"))
+            self._connection.row_factory = sqlite3.Row
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(SCHEMA)
+        return self._connection
+
+    async def _run_io(self, function, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self._io, function, *args)
+
+    def _blob_path(self, folder: str, sha256: str, extension: str) -> str:
+        return os.path.join(self.directory, folder, sha256[:2], f"{sha256}.{extension}")
+
+    # --- Runs ---
+
+    async def start_run(self, test_case_key: Optional[str] = None, title: Optional[str] = None) -> str:
+        """Register a new run and return its ID"""
+        run_id = uuid.uuid4().hex
+        started_at = time.time()
+        self._active_runs[run_id] = started_at
+        self._step_counters[run_id] = 0
+
+        def insert():
+            with self._db() as db:
+                db.execute(
+                    "INSERT INTO runs (run_id, test_case_key, title, status, started_at) VALUES (?, ?, ?, 'running', ?)",
+                    (run_id, test_case_key, title, started_at)
+                )
+
+        await self._run_io(insert)
+        return run_id
+
+    async def finish_run(self, run_id: str, status: str, mode: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Wait for the run's pending writes, mark it finished and return its screenshots"""
+        pending = self._pending.pop(run_id, set())
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        def update():
+            with self._db() as db:
+                db.execute(
+                    "UPDATE runs SET status = ?, mode = ?, finished_at = ? WHERE run_id = ?",
+                    (status, mode, time.time(), run_id)
+                )
+
+        await self._run_io(update)
+        self._active_runs.pop(run_id, None)
+        self._step_counters.pop(run_id, None)
+        return await self.get_run_screenshots(run_id)
+
+    async def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Run metadata with its screenshots"""
+        def select():
+            return self._db().execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+
+        row = await self._run_io(select)
+        if row is None:
+            return None
+        return {**dict(row), "screenshots": await self.get_run_screenshots(run_id)}
+
+    async def get_run_screenshots(self, run_id: str) -> List[Dict[str, Any]]:
+        """Screenshots of one run in capture order"""
+        def select():
+            return self._db().execute(
+                f"SELECT {SCREENSHOT_COLUMNS} FROM screenshots s JOIN images i ON i.sha256 = s.sha256 "
+                "WHERE s.run_id = ? ORDER BY s.step_index",
+                (run_id,)
+            ).fetchall()
+
+        return [screenshot_row_to_dict(row) for row in await self._run_io(select)]
+
+    async def list_screenshots(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+        run_id: Optional[str] = None,
+        test_case_key: Optional[str] = None,
+        since: Optional[float] = None,
+        until: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """
+        One page of screenshots, newest first
+
+        Keyset pagination on the screenshot ID, so deep pages cost the same as
+        the first one and rows captured while paging do not shift the pages.
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        conditions, params = [], []
+        if cursor:
+            conditions.append("s.id < ?")
+            params.append(decode_cursor(cursor))
+        if run_id:
+            conditions.append("s.run_id = ?")
+            params.append(run_id)
+        if test_case_key:
+            conditions.append("r.test_case_key = ?")
+            params.append(test_case_key)
+        if since is not None:
+            conditions.append("s.captured_at >= ?")
+            params.append(since)
+        if until is not None:
+            conditions.append("s.captured_at < ?")
+            params.append(until)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        def select():
+            return self._db().execute(
+                f"SELECT {SCREENSHOT_COLUMNS}, r.test_case_key, r.title FROM screenshots s "
+                "JOIN images i ON i.sha256 = s.sha256 JOIN runs r ON r.run_id = s.run_id "
+                f"{where} ORDER BY s.id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+
+        rows = await self._run_io(select)
+        items = [screenshot_row_to_dict(row) for row in rows[:limit]]
+        return {
+            "screenshots": items,
+            "count": len(items),
+            "next_cursor": encode_cursor(items[-1]["id"]) if len(rows) > limit else None
+        }
+
+    async def get_image(self, sha256: str) -> Optional[Dict[str, Any]]:
+        """Index entry for a stored image"""
+        def select():
+            return self._db().execute("SELECT * FROM images WHERE sha256 = ?", (sha256,)).fetchone()
+
+        row = await self._run_io(select)
+        return dict(row) if row else None
+
+    async def get_image_file(self, sha256: str, variant: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """
+        Resolve an image to (path, media type, variant)
+
+        Without a variant the best available file is served. A variant that
+        does not exist (yet) falls back to the best one, e.g. a thumbnail
+        requested before re-encoding finished or without Pillow installed.
+        """
+        image = await self.get_image(sha256)
+        if image is None:
+            return None
+        paths = {
+            "webp": (image["webp_path"], "image/webp"),
+            "original": (image["original_path"], image["mime"]),
+            "thumbnail": (image["thumbnail_path"], "image/webp")
+        }
+        for candidate in ([variant] if variant else []) + list(IMAGE_VARIANTS):
+            path, media_type = paths.get(candidate, (None, None))
+            if path and os.path.exists(path):
+                return path, media_type, candidate
+        return None
+
+    def oldest_active_run_started(self) -> Optional[float]:
+        """Start time of the oldest in-flight run, or None when nothing is running"""
+        return min(self._active_runs.values()) if self._active_runs else None
+
+    # --- Capture ---
+
+    def capture(self, run_id: str, data: bytes, mime: str, name: Optional[str] = None) -> Dict[str, Any]:
+        """Schedule a screenshot write for a run; returns its metadata immediately"""
+        self._step_counters[run_id] = self._step_counters.get(run_id, 0) + 1
+        step_index = self._step_counters[run_id]
+        sha256 = hashlib.sha256(data).hexdigest()
+        name = os.path.basename(name) if name else f"step-{step_index}.{MIME_EXTENSIONS.get(mime, 'png')}"
+        task = asyncio.get_running_loop().create_task(self._store(run_id, data, mime, name, step_index, sha256))
+        self._pending.setdefault(run_id, set()).add(task)
+        task.add_done_callback(lambda done: self._pending.get(run_id, set()).discard(done))
+        return {
+            "sha256": sha256,
+            "name": name,
+            "step_index": step_index,
+            "mime": mime,
+            "size": len(data),
+            "url": f"/screenshots/files/{sha256}"
+        }
+
+    async def _store(self, run_id: str, data: bytes, mime: str, name: str, step_index: int, sha256: str):
+        extension = MIME_EXTENSIONS.get(mime, "png")
+
+        def write() -> bool:
+            db = self._db()
+            is_new = db.execute("SELECT 1 FROM images WHERE sha256 = ?", (sha256,)).fetchone() is None
+            if is_new:
+                path = self._blob_path("blobs", sha256, extension)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                width, height = image_dimensions(data) or (None, None)
+            with db:
+                if is_new:
+                    db.execute(
+                        "INSERT INTO images (sha256, mime, size, width, height, original_path, created_at) "
+                        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (sha256, mime, len(data), width, height, path, time.time())
+                    )
+                db.execute(
+                    "INSERT INTO screenshots (run_id, sha256, name, step_index, captured_at) VALUES (?, ?, ?, ?, ?)",
+                    (run_id, sha256, name, step_index, time.time())
+                )
+            return is_new
+
+        try:
+            is_new = await self._run_io(write)
+        except Exception as e:
+            print(f"[SCREENSHOTS] Failed to store screenshot {name} for run {run_id[:8]}: {e}")
+            return
+        self.captured += 1
+        if not is_new:
+            self.deduplicated += 1
+            return
+        encoding = asyncio.get_running_loop().create_task(self._encode(sha256, data))
+        self._encoding.add(encoding)
+        encoding.add_done_callback(self._encoding.discard)
+
+    # --- Background re-encoding ---
+
+    def _encode_webp(self, sha256: str, data: bytes) -> Optional[Dict[str, Any]]:
+        try:
+            from io import BytesIO
+            from PIL import Image
+        except ImportError:
+            if not self._pillow_warned:
+                print("[SCREENSHOTS] Pillow not installed, keeping original screenshots without WebP or thumbnails")
+                self._pillow_warned = True
+            return None
+
+        webp_path = self._blob_path("webp", sha256, "webp")
+        thumbnail_path = self._blob_path("thumbnails", sha256, "webp")
+        os.makedirs(os.path.dirname(webp_path), exist_ok=True)
+        os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+
+        with Image.open(BytesIO(data)) as image:
+            image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+            width, height = image.size
+            image.save(webp_path, "WEBP", quality=self.webp_quality, method=4)
+            if width > self.thumbnail_width:
+                image.thumbnail((self.thumbnail_width, int(height * self.thumbnail_width / width)))
+            image.save(thumbnail_path, "WEBP", quality=self.webp_quality)
+        return {
+            "width": width,
+            "height": height,
+            "webp_path": webp_path,
+            "webp_size": os.path.getsize(webp_path),
+            "thumbnail_path": thumbnail_path
+        }
+
+    async def _encode(self, sha256: str, data: bytes):
+        try:
+            encoded = await asyncio.get_running_loop().run_in_executor(self._encoder, self._encode_webp, sha256, data)
+        except Exception as e:
+            print(f"[SCREENSHOTS] Failed to re-encode {sha256[:12]}: {e}")
+            return
+        if encoded is None:
+            return
+
+        def update():
+            db = self._db()
+            original_path = db.execute("SELECT original_path FROM images WHERE sha256 = ?", (sha256,)).fetchone()[0]
+            with db:
+                db.execute(
+                    "UPDATE images SET width = ?, height = ?, webp_path = ?, webp_size = ?, thumbnail_path = ?, "
+                    "original_path = ? WHERE sha256 = ?",
+                    (encoded["width"], encoded["height"], encoded["webp_path"], encoded["webp_size"],
+                     encoded["thumbnail_path"], original_path if self.keep_original else None, sha256)
+                )
+            if not self.keep_original and original_path and os.path.exists(original_path):
+                os.remove(original_path)
+
+        await self._run_io(update)
+        self.encoded += 1
+
+    # --- Maintenance ---
+
+    async def clear(self, run_id: Optional[str] = None) -> Dict[str, int]:
+        """
+        Delete finished runs (all of them, or one) and any images no run references
+
+        Runs that are still executing are never touched.
+        """
+        def delete() -> Dict[str, int]:
+            db = self._db()
+            query = "SELECT run_id FROM runs WHERE finished_at IS NOT NULL"
+            params: tuple = ()
+            if run_id:
+                query += " AND run_id = ?"
+                params = (run_id,)
+            run_ids = [row[0] for row in db.execute(query, params).fetchall()]
+            orphans = []
+            with db:
+                for finished_run_id in run_ids:
+                    db.execute("DELETE FROM screenshots WHERE run_id = ?", (finished_run_id,))
+                    db.execute("DELETE FROM runs WHERE run_id = ?", (finished_run_id,))
+                orphans = db.execute(
+                    "SELECT sha256, original_path, webp_path, thumbnail_path FROM images "
+                    "WHERE sha256 NOT IN (SELECT sha256 FROM screenshots)"
+                ).fetchall()
+                db.executemany("DELETE FROM images WHERE sha256 = ?", [(row[0],) for row in orphans])
+            for row in orphans:
+                for path in row[1:]:
+                    if path and os.path.exists(path):
+                        os.remove(path)
+            return {"runs_deleted": len(run_ids), "images_deleted": len(orphans)}
+
+        # Let in-flight re-encodes finish so they do not write files for images being deleted
+        if self._encoding:
+            await asyncio.gather(*list(self._encoding), return_exceptions=True)
+        result = await self._run_io(delete)
+        print(f"[SCREENSHOTS] Cleared {result['runs_deleted']} runs and {result['images_deleted']} images")
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Capture counters for the health endpoints"""
+        return {
+            "directory": self.directory,
+            "active_runs": len(self._active_runs),
+            "pending_writes": sum(len(tasks) for tasks in self._pending.values()),
+            "pending_encodes": len(self._encoding),
+            "captured": self.captured,
+            "deduplicated": self.deduplicated,
+            "encoded": self.encoded
+        }
+
+    async def close(self):
+        """Flush pending work and close the index"""
+        pending = [task for tasks in self._pending.values() for task in tasks] + list(self._encoding)
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        def close_db():
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+        await self._run_io(close_db)
+        self._io.shutdown(wait=True)
+        self._encoder.shutdown(wait=True)
+        print("[SCREENSHOTS] Screenshot store closed")
+
+
+class ScreenshotCapture:
+    """
+    Stores every image returned by tool calls on a session while attached
+
+    on_capture, when given, is called with (metadata, image bytes) for each
+    screenshot so live viewers get it without waiting for the store.
+    """
+
+    def __init__(
+        self,
+        session: PlaywrightSession,
+        store: ScreenshotStore,
+        run_id: str,
+        on_capture: Optional[Callable[[Dict[str, Any], bytes], None]] = None
+    ):
+        self.session = session
+        self.store = store
+        self.run_id = run_id
+        self.on_capture = on_capture
+
+    def __enter__(self):
+        self.session.add_tool_call_listener(self._on_tool_call)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.session.remove_tool_call_listener(self._on_tool_call)
+        return False
+
+    def _on_tool_call(self, record: ToolCallRecord):
+        if record.result is None:
+            return
+        for item in getattr(record.result, "content", None) or []:
+            if getattr(item, "type", None) != "image" or not getattr(item, "data", None):
+                continue
+            try:
+                data = base64.b64decode(item.data)
+            except Exception as e:
+                print(f"[SCREENSHOTS] Could not decode image from {record.name}: {e}")
+                continue
+            metadata = self.store.capture(self.run_id, data, getattr(item, "mimeType", None) or "image/png", record.arguments.get("filename"))
+            if self.on_capture:
+                self.on_capture(metadata, data)
+
+# Global store instance
+_screenshot_store = None
+
+def get_screenshot_store() -> ScreenshotStore:
+    """Get or create the global ScreenshotStore instance"""
+    global _screenshot_store
+    if _screenshot_store is None:
+        _screenshot_store = ScreenshotStore()
+    return _screenshot_store
@@ -0,0 +1,618 @@
+#!/usr/bin/env python3
+"""
+Playwright Script Compiler
+
+Turns the recorded tool calls of a passing test run (see trace_replay) into a
+standalone Playwright for Python script that runs without the MCP server or
+an LLM, and keeps the compiled scripts versioned per test case.
+
+Each action is compiled from the Playwright JS code the MCP server reports
+having run (translated to the Python API), falling back to a locator built
+from the recorded snapshot line when no code was reported. Page URL
+checkpoints from the recording become expect(page).to_have_url assertions.
+Scripts are stored as ./compiled_tests/<test case key>/v<n>.py with a
+manifest.json per test case; recompiling an unchanged trace does not create
+a new version.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from trace_replay import is_valid_trace_key, normalize_page_url
+
+# Tools that only observe the page and have no equivalent in a script
+OBSERVATIONAL_TOOLS = {
+    "browser_snapshot", "browser_console_messages", "browser_network_requests",
+    "browser_tab_list", "browser_tabs", "browser_close", "browser_install"
+}
+
+# Snapshot roles that get_by_role accepts; anything else is located by its text
+ARIA_ROLES = {
+    "alert", "alertdialog", "application", "article", "banner", "blockquote", "button", "caption",
+    "cell", "checkbox", "code", "columnheader", "combobox", "complementary", "contentinfo",
+    "definition", "dialog", "directory", "document", "emphasis", "feed", "figure", "form",
+    "grid", "gridcell", "group", "heading", "img", "insertion", "link", "list", "listbox",
+    "listitem", "log", "main", "marquee", "math", "menu", "menubar", "menuitem",
+    "menuitemcheckbox", "menuitemradio", "meter", "navigation", "note", "option", "radio",
+    "radiogroup", "region", "row", "rowgroup", "rowheader", "scrollbar", "search", "searchbox",
+    "separator", "slider", "spinbutton", "status", "switch", "tab", "table", "tablist",
+    "tabpanel", "term", "textbox", "timer", "toolbar", "tooltip", "tree", "treegrid", "treeitem"
+}
+
+TARGET_PATTERN = re.compile(r'^(\w+)(?:\s+"((?:[^"\\]|\\.)*)")?')
+
+JS_LITERALS = {"true": "True", "false": "False", "null": "None", "undefined": "None"}
+
+# Locator methods that are properties in the Python API
+PYTHON_PROPERTIES = {"first", "last"}
+
+SCRIPT_TEMPLATE = '''#!/usr/bin/env python3
+"""
+Compiled Playwright test: {title}
+
+Compiled from trace {key} (recorded with {recorded_with}) on {compiled_at}.
+Version {version}. Generated by the Aura MCP server - recompile instead of editing.
+"""
+import os
+import re
+import sys
+
+from playwright.sync_api import sync_playwright, expect
+
+HEADLESS = os.getenv("PLAYWRIGHT_HEADLESS", "true").lower() != "false"
+SCREENSHOT_DIR = os.getenv("COMPILED_TEST_SCREENSHOT_DIR", "./screenshots")
+
+
+def run(page):
+{body}
+
+
+def main() -> int:
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    with sync_playwright() as p:
+        browser = p.chromium.launch(headless=HEADLESS)
+        context = browser.new_context({context_options})
+        page = context.new_page()
+        try:
+            run(page)
+        except Exception as e:
+            print(f"FAILED: {{e}}")
+            return 1
+        finally:
+            context.close()
+            browser.close()
+    print("PASSED")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
+'''
+
+
+class ScriptCompileError(Exception):
+    """Raised when a recorded step cannot be expressed as Playwright Python code"""
+
+
+def snake_case(name: str) -> str:
+    """getByRole -> get_by_role"""
+    return re.sub(r"(?<!^)(?=[A-Z])", "_", name).lower()
+
+
+class JsTranslator:
+    """
+    Translates single Playwright JS statements to the Python sync API
+
+    Only the subset the Playwright MCP server emits is supported: call chains
+    on `page` with string, number, boolean, array, regex and object literal
+    arguments. Anything else raises ScriptCompileError.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.pos = 0
+
+    def translate(self) -> str:
+        self._skip_whitespace()
+        if self.source.startswith("await ", self.pos):
+            self.pos += len("await ")
+        expression = self._expression()
+        self._skip_whitespace()
+        if self._peek() == ";":
+            self.pos += 1
+        self._skip_whitespace()
+        if self.pos != len(self.source):
+            raise ScriptCompileError(f"Unsupported syntax at '{self.source[self.pos:self.pos + 20]}'")
+        return expression
+
+    def _peek(self) -> str:
+        return self.source[self.pos] if self.pos < len(self.source) else ""
+
+    def _skip_whitespace(self):
+        while self.pos < len(self.source) and self.source[self.pos].isspace():
+            self.pos += 1
+
+    def _expect(self, char: str):
+        self._skip_whitespace()
+        if self._peek() != char:
+            raise ScriptCompileError(f"Expected '{char}' at '{self.source[self.pos:self.pos + 20]}'")
+        self.pos += 1
+
+    def _identifier(self) -> str:
+        match = re.compile(r"[A-Za-z_$][\w$]*").match(self.source, self.pos)
+        if not match:
+            raise ScriptCompileError(f"Expected identifier at '{self.source[self.pos:self.pos + 20]}'")
+        self.pos = match.end()
+        return match.group(0)
+
+    def _expression(self) -> str:
+        value = self._primary()
+        while True:
+            self._skip_whitespace()
+            char = self._peek()
+            if char == ".":
+                self.pos += 1
+                name = self._identifier()
+                self._skip_whitespace()
+                if name in PYTHON_PROPERTIES and self.source.startswith("()", self.pos):
+                    self.pos += 2
+                    value += f".{name}"
+                else:
+                    value += f".{snake_case(name)}"
+            elif char == "(":
+                value += self._arguments()
+            elif char == "[":
+                self.pos += 1
+                index = self._expression()
+                self._expect("]")
+                value += f"[{index}]"
+            else:
+                return value
+
+    def _primary(self) -> str:
+        self._skip_whitespace()
+        char = self._peek()
+        if char in ("'", '"'):
+            return repr(self._string())
+        if char == "[":
+            return self._array()
+        if char == "{":
+            return self._object_literal()
+        if char == "/":
+            return self._regex()
+        if char == "-" or char.isdigit():
+            match = re.compile(r"-?\d+(\.\d+)?").match(self.source, self.pos)
+            if not match:
+                raise ScriptCompileError(f"Invalid number at '{self.source[self.pos:self.pos + 20]}'")
+            self.pos = match.end()
+            return match.group(0)
+        name = self._identifier()
+        if name in JS_LITERALS:
+            return JS_LITERALS[name]
+        if name != "page":
+            raise ScriptCompileError(f"Unsupported identifier '{name}'")
+        return name
+
+    def _string(self) -> str:
+        quote = self.source[self.pos]
+        self.pos += 1
+        chars = []
+        escapes = {"n": "\n", "t": "\t", "r": "\r", "b": "\b", "f": "\f", "0": "\0"}
+        while self.pos < len(self.source):
+            char = self.source[self.pos]
+            if char == "\\":
+                escaped = self.source[self.pos + 1:self.pos + 2]
+                if escaped == "u":
+                    chars.append(chr(int(self.source[self.pos + 2:self.pos + 6], 16)))
+                    self.pos += 6
+                    continue
+                chars.append(escapes.get(escaped, escaped))
+                self.pos += 2
+                continue
+            if char == quote:
+                self.pos += 1
+                return "".join(chars)
+            chars.append(char)
+            self.pos += 1
+        raise ScriptCompileError("Unterminated string literal")
+
+    def _regex(self) -> str:
+        self.pos += 1
+        start = self.pos
+        while self.pos < len(self.source) and self.source[self.pos] != "/":
+            self.pos += 2 if self.source[self.pos] == "\\" else 1
+        if self.pos >= len(self.source):
+            raise ScriptCompileError("Unterminated regex literal")
+        pattern = self.source[start:self.pos]
+        self.pos += 1
+        flags = re.compile(r"[a-z]*").match(self.source, self.pos).group(0)
+        self.pos += len(flags)
+        return f"re.compile({pattern!r}{', re.IGNORECASE' if 'i' in flags else ''})"
+
+    def _array(self) -> str:
+        self.pos += 1
+        items = []
+        while True:
+            self._skip_whitespace()
+            if self._peek() == "]":
+                self.pos += 1
+                return f"[{', '.join(items)}]"
+            items.append(self._expression())
+            self._skip_whitespace()
+            if self._peek() == ",":
+                self.pos += 1
+
+    def _object_items(self) -> List[Tuple[str, str]]:
+        self.pos += 1
+        items = []
+        while True:
+            self._skip_whitespace()
+            if self._peek() == "}":
+                self.pos += 1
+                return items
+            key = self._string() if self._peek() in ("'", '"') else self._identifier()
+            self._expect(":")
+            items.append((key, self._expression()))
+            self._skip_whitespace()
+            if self._peek() == ",":
+                self.pos += 1
+
+    def _object_literal(self) -> str:
+        """Nested objects (e.g. position) become dicts"""
+        items = self._object_items()
+        return "{" + ", ".join(f"{key!r}: {value}" for key, value in items) + "}"
+
+    def _arguments(self) -> str:
+        """Call arguments; a trailing options object becomes keyword arguments"""
+        self.pos += 1
+        arguments = []
+        while True:
+            self._skip_whitespace()
+            if self._peek() == ")":
+                self.pos += 1
+                return f"({', '.join(arguments)})"
+            if self._peek() == "{":
+                arguments.extend(f"{snake_case(key)}={value}" for key, value in self._object_items())
+                self._skip_whitespace()
+                if self._peek() != ")":
+                    raise ScriptCompileError("Options object must be the last argument")
+                continue
+            arguments.append(self._expression())
+            self._skip_whitespace()
+            if self._peek() == ",":
+                self.pos += 1
+
+
+def translate_playwright_code(code: str) -> List[str]:
+    """Translate a block of Playwright JS code to Python lines"""
+    lines = []
+    for raw_line in code.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("//"):
+            lines.append(f"# {line[2:].strip()}")
+            continue
+        lines.append(JsTranslator(line).translate())
+    return lines
+
+
+def locator_from_target(target: Optional[str]) -> str:
+    """Locator for a recorded snapshot line such as 'button "Submit" [ref=e7]'"""
+    match = TARGET_PATTERN.match(target or "")
+    if not match:
+        raise ScriptCompileError("No recorded element to locate")
+    role, name = match.group(1), match.group(2)
+    if role in ARIA_ROLES:
+        return f"page.get_by_role({role!r}, name={name!r}, exact=True)" if name else f"page.get_by_role({role!r})"
+    if name:
+        return f"page.get_by_text({name!r}, exact=True)"
+    raise ScriptCompileError(f"Cannot build a locator for '{target}'")
+
+
+def compile_step_from_tool(step: Dict[str, Any]) -> List[str]:
+    """Python lines for a step, from its tool name and arguments"""
+    tool = step["tool"]
+    args = step.get("arguments", {})
+
+    if tool == "browser_navigate":
+        return [f"page.goto({args['url']!r})"]
+    if tool == "browser_navigate_back":
+        return ["page.go_back()"]
+    if tool == "browser_navigate_forward":
+        return ["page.go_forward()"]
+    if tool == "browser_press_key":
+        return [f"page.keyboard.press({args['key']!r})"]
+    if tool == "browser_resize":
+        return [f"page.set_viewport_size({{'width': {int(args['width'])}, 'height': {int(args['height'])}}})"]
+    if tool == "browser_take_screenshot":
+        filename = args.get("filename") or f"step-{step['index']}.png"
+        full_page = ", full_page=True" if args.get("fullPage") else ""
+        return [f"page.screenshot(path=os.path.join(SCREENSHOT_DIR, {os.path.basename(filename)!r}){full_page})"]
+    if tool == "browser_wait_for":
+        if args.get("text"):
+            return [f"page.get_by_text({args['text']!r}).first.wait_for(state='visible')"]
+        if args.get("textGone"):
+            return [f"page.get_by_text({args['textGone']!r}).first.wait_for(state='hidden')"]
+        if args.get("time") is not None:
+            return [f"page.wait_for_timeout({int(float(args['time']) * 1000)})"]
+
+    locator = locator_from_target(step.get("target"))
+    if tool == "browser_click":
+        click = "dblclick" if args.get("doubleClick") else "click"
+        button = f"button={args['button']!r}" if args.get("button") else ""
+        return [f"{locator}.{click}({button})"]
+    if tool == "browser_hover":
+        return [f"{locator}.hover()"]
+    if tool == "browser_type":
+        lines = [f"{locator}.fill({args.get('text', '')!r})"]
+        if args.get("submit"):
+            lines.append(f"{locator}.press('Enter')")
+        return lines
+    if tool == "browser_select_option":
+        return [f"{locator}.select_option({list(args.get('values', []))!r})"]
+    raise ScriptCompileError(f"No script equivalent for {tool}")
+
+
+class PlaywrightScriptCompiler:
+    """Compiles recorded traces into Playwright for Python scripts"""
+
+    def __init__(self, config_path: str = "playwright-mcp-config.json"):
+        self.context_options = self._load_context_options(config_path)
+
+    @staticmethod
+    def _load_context_options(config_path: str) -> str:
+        """Browser context options matching the MCP server's config, as Python keyword arguments"""
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                options = json.load(f).get("browser", {}).get("contextOptions", {})
+        except Exception:
+            options = {}
+        keywords = []
+        if options.get("viewport"):
+            viewport = options["viewport"]
+            keywords.append(f"viewport={{'width': {int(viewport['width'])}, 'height': {int(viewport['height'])}}}")
+        if options.get("ignoreHTTPSErrors"):
+            keywords.append("ignore_https_errors=True")
+        return ", ".join(keywords)
+
+    def compile_body(self, trace: Dict[str, Any]) -> Tuple[str, List[str]]:
+        """
+        Compile the steps of a trace into the body of run(page)
+
+        Returns:
+            (body, warnings) - a step that cannot be compiled becomes a raise
+            so the script fails loudly instead of silently skipping it
+        """
+        lines: List[str] = []
+        warnings: List[str] = []
+        current_url = None
+
+        for index, step in enumerate(trace.get("steps", []), start=1):
+            tool = step["tool"]
+            if tool in OBSERVATIONAL_TOOLS:
+                continue
+            step = {**step, "index": index}
+            description = step.get("arguments", {}).get("element")
+            lines.append(f"# Step {index}: {tool}" + (f" - {description}" if description else ""))
+
+            try:
+                if step.get("code") and tool not in ("browser_take_screenshot", "browser_wait_for"):
+                    try:
+                        step_lines = translate_playwright_code(step["code"])
+                    except ScriptCompileError:
+                        step_lines = compile_step_from_tool(step)
+                else:
+                    step_lines = compile_step_from_tool(step)
+            except (ScriptCompileError, KeyError, TypeError, ValueError) as e:
+                warnings.append(f"Step {index} ({tool}): {e}")
+                step_lines = [f"raise RuntimeError({f'Step {index} ({tool}) could not be compiled: {e}'!r})"]
+            lines.extend(step_lines)
+
+            page_url = normalize_page_url(step.get("page_url"))
+            if page_url and page_url != current_url:
+                lines.append(f"expect(page).to_have_url(re.compile(re.escape({page_url!r})))")
+                current_url = page_url
+
+        if not lines:
+            lines.append("pass")
+        return "\n".join(f"    {line}" for line in lines), warnings
+
+    def render(self, trace: Dict[str, Any], body: str, version: int) -> str:
+        """Full script source for a compiled body"""
+        return SCRIPT_TEMPLATE.format(
+            title=(trace.get("title") or "Untitled").replace('"""', "'''"),
+            key=trace["key"],
+            recorded_with=trace.get("recorded_with", "unknown"),
+            compiled_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            version=version,
+            body=body,
+            context_options=self.context_options
+        )
+
+
+class CompiledTestStore:
+    """Versioned store of compiled scripts plus the bulk runner"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("COMPILED_TEST_DIR", "./compiled_tests")
+        self.default_concurrency = int(os.getenv("COMPILED_TEST_CONCURRENCY", "4"))
+        self.default_timeout = float(os.getenv("COMPILED_TEST_TIMEOUT", "300"))
+        self.compiler = PlaywrightScriptCompiler()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.directory, key, "manifest.json")
+
+    def get_manifest(self, key: str) -> Optional[Dict[str, Any]]:
+        """Manifest of a test case's compiled versions, or None if never compiled"""
+        if not is_valid_trace_key(key):
+            return None
+        try:
+            with open(self._manifest_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: Dict[str, Any]):
+        path = self._manifest_path(manifest["key"])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(temp_path, path)
+
+    def compile(self, trace: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Compile a trace and store it as a new version
+
+        Returns the version entry; when the compiled body is identical to the
+        latest version, that version is returned and nothing is written.
+        """
+        key = trace["key"]
+        body, warnings = self.compiler.compile_body(trace)
+        body_hash = hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+        manifest = self.get_manifest(key) or {"key": key, "title": trace.get("title", ""), "versions": []}
+        if manifest["versions"] and manifest["versions"][-1]["body_sha256"] == body_hash:
+            return manifest["versions"][-1]
+
+        version = len(manifest["versions"]) + 1
+        os.makedirs(os.path.join(self.directory, key), exist_ok=True)
+        path = os.path.join(self.directory, key, f"v{version}.py")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.compiler.render(trace, body, version))
+
+        entry = {
+            "version": version,
+            "path": path,
+            "compiled_at": time.time(),
+            "trace_recorded_at": trace.get("recorded_at"),
+            "body_sha256": body_hash,
+            "complete": not warnings,
+            "warnings": warnings
+        }
+        manifest["title"] = trace.get("title", manifest["title"])
+        manifest["versions"].append(entry)
+        self._write_manifest(manifest)
+        state = "complete" if entry["complete"] else f"incomplete ({len(warnings)} steps not compiled)"
+        print(f"[COMPILER] Compiled '{manifest['title']}' to {path} - {state}")
+        return entry
+
+    def get_version(self, key: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """A specific version entry, or the latest when version is None"""
+        manifest = self.get_manifest(key)
+        if not manifest or not manifest["versions"]:
+            return None
+        if version is None:
+            return manifest["versions"][-1]
+        return next((entry for entry in manifest["versions"] if entry["version"] == version), None)
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of all compiled test cases"""
+        summaries = []
+        for key in sorted(os.listdir(self.directory)):
+            manifest = self.get_manifest(key) if os.path.isdir(os.path.join(self.directory, key)) else None
+            if manifest and manifest["versions"]:
+                latest = manifest["versions"][-1]
+                summaries.append({
+                    "key": key,
+                    "title": manifest.get("title", ""),
+                    "versions": len(manifest["versions"]),
+                    "latest_version": latest["version"],
+                    "latest_complete": latest["complete"],
+                    "compiled_at": latest["compiled_at"]
+                })
+        return summaries
+
+    async def run_script(self, key: str, entry: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+        """Run one compiled script in a subprocess"""
+        start_time = time.time()
+        process = await asyncio.create_subprocess_exec(
+            sys.executable, entry["path"],
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT
+        )
+        try:
+            output, _ = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            output_text = output.decode("utf-8", errors="replace")
+            passed = process.returncode == 0
+            error = None if passed else (output_text.strip().splitlines() or ["Script failed"])[-1]
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            output_text = ""
+            passed = False
+            error = f"Timed out after {timeout:.0f}s"
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        return {
+            "key": key,
+            "version": entry["version"],
+            "success": passed,
+            "error": error,
+            "execution_time": time.time() - start_time,
+            "output": output_text[-4000:]
+        }
+
+    async def run_bulk(
+        self,
+        keys: Optional[List[str]] = None,
+        concurrency: Optional[int] = None,
+        timeout: Optional[float] = None,
+        include_incomplete: bool = False
+    ) -> Dict[str, Any]:
+        """Run the latest compiled version of each test case concurrently"""
+        concurrency = max(1, concurrency or self.default_concurrency)
+        timeout = timeout or self.default_timeout
+        semaphore = asyncio.Semaphore(concurrency)
+        keys = keys if keys is not None else [summary["key"] for summary in self.list()]
+
+        results: List[Dict[str, Any]] = []
+        runnable = []
+        for key in keys:
+            entry = self.get_version(key)
+            if entry is None:
+                results.append({"key": key, "success": False, "skipped": True, "error": "No compiled script"})
+            elif not entry["complete"] and not include_incomplete:
+                results.append({"key": key, "version": entry["version"], "success": False, "skipped": True,
+                                "error": "Latest compiled version is incomplete"})
+            else:
+                runnable.append((key, entry))
+
+        async def run_one(key: str, entry: Dict[str, Any]) -> Dict[str, Any]:
+            async with semaphore:
+                return await self.run_script(key, entry, timeout)
+
+        start_time = time.time()
+        results.extend(await asyncio.gather(*(run_one(key, entry) for key, entry in runnable)))
+        wall_clock_time = time.time() - start_time
+        passed = sum(1 for result in results if result["success"])
+        print(f"[COMPILER] Ran {len(runnable)} compiled tests in {wall_clock_time:.2f}s ({passed} passed)")
+        return {
+            "total": len(results),
+            "ran": len(runnable),
+            "passed": passed,
+            "failed": len(runnable) - passed,
+            "skipped": len(results) - len(runnable),
+            "concurrency": concurrency,
+            "wall_clock_time": wall_clock_time,
+            "results": results
+        }
+
+# Global store instance
+_compiled_test_store = None
+
+def get_compiled_test_store() -> CompiledTestStore:
+    """Get or create the global CompiledTestStore instance"""
+    global _compiled_test_store
+    if _compiled_test_store is None:
+        _compiled_test_store = CompiledTestStore()
+    return _compiled_test_store
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Snapshot Pruner
+
+Shrinks the accessibility snapshots that Playwright MCP returns with every
+browser action before they reach the agent's LLM context.
+
+Snapshots are pruned (unnamed layout containers are collapsed, decorative
+nodes dropped, long text truncated and the size capped), then compared with
+the previous step's snapshot of the same page: an identical snapshot becomes a
+one-line note and a small change is sent as a diff of the changed elements
+with their ancestors. Explicit browser_snapshot calls and navigations always
+get the full pruned snapshot. Element refs of unchanged elements stay valid,
+so the agent can keep acting on elements from earlier snapshots.
+
+Only the agent's view is rewritten: trace recording, screenshot capture and
+replay see the raw tool results.
+"""
+import difflib
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from trace_replay import extract_page_url, tool_result_text
+
+# Pruning modes
+MODE_OFF = "off"  # Pass tool results through unchanged (still measured)
+MODE_PRUNE = "prune"  # Prune every snapshot, always send it in full
+MODE_DIFF = "diff"  # Prune, then dedupe/diff against the previous step
+MODES = (MODE_OFF, MODE_PRUNE, MODE_DIFF)
+
+SNAPSHOT_BLOCK_PATTERN = re.compile(r"(- Page Snapshot:?\s*\n```yaml\n)(.*?)(\n?```)", re.DOTALL)
+# role, optional "name", [attributes], then ":" for children or ": text" for inline text
+SNAPSHOT_ITEM_PATTERN = re.compile(
+    r'^(?P<head>(?P<role>[\w/-]+)(?: "(?:[^"\\]|\\.)*")?(?: \[[^\]]*\])*)(?P<colon>:)?(?: (?P<text>.*))?$'
+)
+
+# Layout roles that carry no meaning for the agent unless they are named or hold text
+STRUCTURAL_ROLES = {
+    "generic", "group", "none", "presentation", "list", "listitem", "rowgroup",
+    "section", "article", "main", "navigation", "contentinfo", "banner", "complementary", "region", "document"
+}
+DECORATIVE_ROLES = {"img", "separator", "figure"}
+
+# Rough token estimate for English text and YAML-ish markup
+CHARS_PER_TOKEN = 4
+
+
+def _prune_item(item: str, max_text: int) -> Tuple[bool, str]:
+    """Decide whether a snapshot list item is kept and shorten it; returns (keep, item)"""
+    item = item.replace(" [cursor=pointer]", "")
+    match = SNAPSHOT_ITEM_PATTERN.match(item)
+    if match is None:
+        # Quoted or otherwise unusual items are kept as they are
+        return True, item[:max_text * 2]
+    role, head, inline_text = match.group("role"), match.group("head"), match.group("text") or ""
+    has_children = bool(match.group("colon")) and not inline_text
+    named = '"' in head
+
+    if role.startswith("/"):
+        # Element properties such as /url or /placeholder
+        keep = True
+    elif role in STRUCTURAL_ROLES:
+        keep = named or bool(inline_text)
+    elif role in DECORATIVE_ROLES:
+        keep = named
+    else:
+        keep = True
+
+    if len(inline_text) > max_text:
+        inline_text = inline_text[:max_text].rstrip() + "…"
+    if len(head) > max_text * 2:
+        head = head[:max_text * 2].rstrip() + "…"
+    if inline_text:
+        return keep, f"{head}: {inline_text}"
+    return keep, f"{head}:" if has_children else head
+
+
+def prune_snapshot(snapshot: str, max_text: int = 160, max_lines: int = 300) -> List[str]:
+    """
+    Prune a Playwright MCP YAML accessibility snapshot into a list of lines
+
+    Children of dropped containers move up to the nearest kept ancestor.
+    """
+    lines = []
+    ancestors: List[Tuple[int, bool]] = []  # (indent, kept) of the open ancestors
+    for line in snapshot.splitlines():
+        stripped = line.lstrip(" ")
+        if not stripped.startswith("- "):
+            continue
+        indent = len(line) - len(stripped)
+        while ancestors and ancestors[-1][0] >= indent:
+            ancestors.pop()
+        depth = sum(1 for _, kept in ancestors if kept)
+        keep, item = _prune_item(stripped[2:], max_text)
+        ancestors.append((indent, keep))
+        if keep:
+            lines.append("  " * depth + "- " + item)
+
+    if len(lines) > max_lines:
+        omitted = len(lines) - max_lines
+        lines = lines[:max_lines] + [f"- ... {omitted} more elements omitted (scroll or use browser_snapshot after narrowing the page)"]
+    return lines
+
+
+def _indent_of(line: str) -> int:
+    return len(line) - len(line.lstrip(" "))
+
+
+def diff_snapshot(previous: List[str], current: List[str]) -> Tuple[List[str], int]:
+    """
+    Changed elements of a pruned snapshot, with their ancestors for context
+
+    Returns the diff lines ("+" added or changed, " " context) and the number
+    of elements that were removed.
+    """
+    added = set()
+    removed = 0
+    matcher = difflib.SequenceMatcher(None, previous, current, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            added.update(range(j1, j2))
+        if tag in ("replace", "delete"):
+            removed += i2 - i1
+
+    context = set()
+    for index in added:
+        indent = _indent_of(current[index])
+        for ancestor in range(index - 1, -1, -1):
+            if indent == 0:
+                break
+            if _indent_of(current[ancestor]) < indent:
+                context.add(ancestor)
+                indent = _indent_of(current[ancestor])
+
+    lines = [("+ " if index in added else "  ") + current[index] for index in sorted(added | context)]
+    return lines, removed
+
+
+def _replace_text(result: Any, old_text: str, new_text: str) -> Any:
+    """Copy of an MCP CallToolResult with one text content item replaced"""
+    content = []
+    for item in result.content:
+        if getattr(item, "text", None) == old_text:
+            item = item.model_copy(update={"text": new_text})
+        content.append(item)
+    return result.model_copy(update={"content": content})
+
+
+class SnapshotPruner:
+    """
+    Per-run result transformer for a Playwright session's agent tool calls
+
+    Register with PlaywrightSession.add_result_transformer; stats() reports
+    how much snapshot text the agent received compared to the raw results.
+    """
+
+    def __init__(self, mode: Optional[str] = None):
+        self.mode = (mode or os.getenv("SNAPSHOT_PRUNING", MODE_DIFF)).lower()
+        if self.mode not in MODES:
+            raise ValueError(f"Unknown snapshot pruning mode '{self.mode}' (expected one of {', '.join(MODES)})")
+        self.max_lines = int(os.getenv("SNAPSHOT_MAX_LINES", "300"))
+        self.max_text = int(os.getenv("SNAPSHOT_MAX_TEXT", "160"))
+        # A diff is only sent when it is at most this fraction of the full pruned snapshot
+        self.diff_ratio = float(os.getenv("SNAPSHOT_DIFF_RATIO", "0.6"))
+        self._previous_lines: Optional[List[str]] = None
+        self._previous_url: Optional[str] = None
+        self.tool_results = 0
+        self.snapshots = 0
+        self.full = 0
+        self.diffs = 0
+        self.unchanged = 0
+        self.raw_chars = 0
+        self.delivered_chars = 0
+
+    def __call__(self, name: str, arguments: Dict[str, Any], result: Any) -> Any:
+        text = tool_result_text(result)
+        self.tool_results += 1
+        self.raw_chars += len(text)
+
+        match = SNAPSHOT_BLOCK_PATTERN.search(text)
+        if match is None or self.mode == MODE_OFF:
+            self.snapshots += 1 if match else 0
+            self.delivered_chars += len(text)
+            return result
+
+        self.snapshots += 1
+        lines = prune_snapshot(match.group(2), self.max_text, self.max_lines)
+        page_url = extract_page_url(text)
+        block = self._render(name, lines, page_url)
+        self._previous_lines = lines
+        self._previous_url = page_url
+
+        new_text = text[:match.start()] + block + text[match.end():]
+        self.delivered_chars += len(new_text)
+        for item in getattr(result, "content", None) or []:
+            item_text = getattr(item, "text", None)
+            if item_text and match.group(0) in item_text:
+                return _replace_text(result, item_text, item_text.replace(match.group(0), block, 1))
+        return result
+
+    def _render(self, name: str, lines: List[str], page_url: Optional[str]) -> str:
+        """Snapshot section the agent sees for this step"""
+        full = "- Page Snapshot:\n```yaml\n" + "\n".join(lines) + "\n```"
+        comparable = (
+            self.mode == MODE_DIFF
+            and name != "browser_snapshot"
+            and self._previous_lines is not None
+            and page_url == self._previous_url
+        )
+        if not comparable:
+            self.full += 1
+            return full
+        if lines == self._previous_lines:
+            self.unchanged += 1
+            return "- Page Snapshot: unchanged since the previous step (its element refs are still valid)"
+
+        changes, removed = diff_snapshot(self._previous_lines, lines)
+        diff = (
+            "- Page Snapshot changes since the previous step "
+            "(\"+\" new or changed elements; unchanged elements keep their refs, call browser_snapshot for the full page):\n"
+            "```diff\n" + "\n".join(changes) + "\n```"
+            + (f"\n- {removed} elements removed" if removed else "")
+        )
+        if len(diff) > len(full) * self.diff_ratio:
+            self.full += 1
+            return full
+        self.diffs += 1
+        return diff
+
+    def stats(self) -> Dict[str, Any]:
+        """How much tool result text the agent received versus the raw results"""
+        return {
+            "mode": self.mode,
+            "tool_results": self.tool_results,
+            "snapshots": self.snapshots,
+            "full_snapshots": self.full,
+            "diff_snapshots": self.diffs,
+            "unchanged_snapshots": self.unchanged,
+            "raw_chars": self.raw_chars,
+            "delivered_chars": self.delivered_chars,
+            "raw_tokens_estimate": self.raw_chars // CHARS_PER_TOKEN,
+            "delivered_tokens_estimate": self.delivered_chars // CHARS_PER_TOKEN,
+            "reduction": round(1 - self.delivered_chars / self.raw_chars, 3) if self.raw_chars else 0.0
+        }
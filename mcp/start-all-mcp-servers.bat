@@ -42,7 +42,7 @@ npm install -g mcp-remote @playwright/mcp@latest
 
 echo.
 echo 🎭 Starting Playwright MCP Server (Port 8931)...
-start "Playwright MCP Server" cmd /k "npx @playwright/mcp@latest --port 8931 --browser chrome --output-dir screenshots"
+start "Playwright MCP Server" cmd /k "npx @playwright/mcp@latest --port 8931 --browser chrome --output-dir screenshots --isolated"
 
 echo ⏳ Waiting for Playwright server to initialize...
 timeout /t 5 /nobreak > nul
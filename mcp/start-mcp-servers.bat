@@ -38,7 +38,7 @@ echo 🎭 Starting Playwright MCP Server (VISIBLE browser)...
 echo Browser will be VISIBLE during test execution!
 echo.
 
-start "Playwright MCP Server" cmd /k "npx @playwright/mcp@latest --port 8931 --browser chrome --output-dir screenshots"
+start "Playwright MCP Server" cmd /k "npx @playwright/mcp@latest --port 8931 --browser chrome --output-dir screenshots --isolated"
 
 echo ⏳ Waiting for Playwright server to initialize...
 timeout /t 8 /nobreak > nul
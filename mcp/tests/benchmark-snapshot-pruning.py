@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Benchmark snapshot pruning: tokens per test and seconds per step
+
+Runs the same test case through /execute-test-case with every snapshot
+pruning mode (agent only - replay is disabled) and compares how much tool
+result text reached the agent and how long each browser step took.
+
+Usage: python benchmark-snapshot-pruning.py test_case.json [--runs 3] [--provider google] [--model gemini-2.5-pro]
+"""
+import argparse
+import json
+import statistics
+import sys
+
+import httpx
+
+MODES = ["off", "prune", "diff"]
+
+def run_mode(client: httpx.Client, server: str, test_case: dict, provider: str, model: str, mode: str) -> dict:
+    response = client.post(f"{server}/execute-test-case", json={
+        "testCase": test_case,
+        "llm_provider": provider,
+        "model": model,
+        "replay": False,
+        "record": False,
+        "snapshot_pruning": mode
+    })
+    response.raise_for_status()
+    return response.json()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot pruning modes")
+    parser.add_argument("test_case", help="JSON file with a single test case (title, steps, expectedResult)")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per mode")
+    parser.add_argument("--provider", default="google")
+    parser.add_argument("--model", default="gemini-2.5-pro")
+    parser.add_argument("--server", default="http://localhost:8000")
+    args = parser.parse_args()
+
+    with open(args.test_case) as f:
+        test_case = json.load(f)
+
+    results = {mode: [] for mode in MODES}
+    with httpx.Client(timeout=None) as client:
+        for run in range(args.runs):
+            for mode in MODES:
+                print(f"🏃 Run {run + 1}/{args.runs} with snapshot_pruning={mode}...")
+                data = run_mode(client, args.server, test_case, args.provider, args.model, mode)
+                stats = data.get("snapshot_stats")
+                if not data.get("success") or not stats:
+                    print(f"  ⚠️ Skipped: {data.get('error') or 'no agent statistics in the response'}")
+                    continue
+                results[mode].append(stats)
+                print(f"  ✅ {stats['tool_results']} steps, ~{stats['delivered_tokens_estimate']} tool result tokens, {stats['seconds_per_step']}s/step")
+
+    print("\n📊 Mean per test case")
+    print(f"{'mode':<8}{'runs':>6}{'steps':>8}{'raw tokens':>13}{'agent tokens':>15}{'s/step':>9}{'agent s':>10}")
+    baseline = None
+    for mode in MODES:
+        runs = results[mode]
+        if not runs:
+            print(f"{mode:<8}{0:>6}")
+            continue
+        tokens = statistics.mean(stats["delivered_tokens_estimate"] for stats in runs)
+        seconds_per_step = statistics.mean(stats["seconds_per_step"] or 0 for stats in runs)
+        print(
+            f"{mode:<8}{len(runs):>6}"
+            f"{statistics.mean(stats['tool_results'] for stats in runs):>8.1f}"
+            f"{statistics.mean(stats['raw_tokens_estimate'] for stats in runs):>13.0f}"
+            f"{tokens:>15.0f}{seconds_per_step:>9.2f}"
+            f"{statistics.mean(stats['agent_seconds'] for stats in runs):>10.1f}"
+        )
+        if mode == "off":
+            baseline = (tokens, seconds_per_step)
+        elif baseline and baseline[0] and baseline[1]:
+            print(f"{'':<8}  vs off: {1 - tokens / baseline[0]:.0%} fewer tokens, {1 - seconds_per_step / baseline[1]:.0%} faster steps")
+        else:
+            print(f"{'':<8}  vs off: no baseline")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
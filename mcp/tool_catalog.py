@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+MCP Tool Catalog
+
+Caches the tool list of each MCP server (Playwright, Jira) so handlers and
+/tools stop calling list_tools() on every request, and compiles each tool's
+input schema into a JSON Schema validator once.
+
+Tool arguments built by the server (direct Jira calls, trace replay) are
+validated locally against those validators before any network hop, so a bad
+argument fails immediately with a readable message instead of a server-side
+validation error after a round-trip. A server's entry is dropped when its
+connection is re-established, and reloaded on next use.
+"""
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from jsonschema import Draft7Validator
+from jsonschema.exceptions import SchemaError
+from jsonschema.validators import validator_for
+
+PLAYWRIGHT_SERVER = "playwright"
+JIRA_SERVER = "jira"
+
+ToolLoader = Callable[[], Awaitable[List[Any]]]
+
+
+class ToolArgumentsError(ValueError):
+    """Raised when tool arguments do not match the tool's input schema"""
+
+
+class ToolSpec:
+    """A tool of an MCP server with its precompiled argument validator"""
+
+    def __init__(self, server: str, name: str, description: Optional[str], input_schema: Optional[Dict[str, Any]]):
+        self.server = server
+        self.name = name
+        self.description = description or ""
+        self.input_schema = input_schema or {"type": "object"}
+        self.validator = None
+        try:
+            validator_class = validator_for(self.input_schema, default=Draft7Validator)
+            validator_class.check_schema(self.input_schema)
+            self.validator = validator_class(self.input_schema)
+        except SchemaError as e:
+            print(f"[TOOLS] {server}.{name} has an invalid input schema, its arguments will not be checked: {e.message}")
+
+    def errors(self, arguments: Dict[str, Any]) -> List[str]:
+        """Schema violations of the arguments, as readable messages"""
+        if self.validator is None:
+            return []
+        return [
+            f"{'.'.join(str(part) for part in error.absolute_path) or 'arguments'}: {error.message}"
+            for error in sorted(self.validator.iter_errors(arguments), key=lambda error: list(error.absolute_path))
+        ]
+
+    def validate(self, arguments: Dict[str, Any]):
+        """Raise ToolArgumentsError if the arguments do not match the input schema"""
+        errors = self.errors(arguments)
+        if errors:
+            raise ToolArgumentsError(f"Invalid arguments for {self.server} tool {self.name}: {'; '.join(errors)}")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "server": self.server,
+            "name": self.name,
+            "description": self.description,
+            "input_schema": self.input_schema,
+            "validated": self.validator is not None
+        }
+
+
+class ToolCatalog:
+    """Per-server cache of MCP tool specs"""
+
+    def __init__(self):
+        self._tools: Dict[str, Dict[str, ToolSpec]] = {}
+        self._loaded_at: Dict[str, float] = {}
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self.loads = 0
+        self.hits = 0
+
+    def is_loaded(self, server: str) -> bool:
+        return server in self._tools
+
+    async def get(self, server: str, loader: ToolLoader) -> Dict[str, ToolSpec]:
+        """The server's tools by name, loading them with `loader` (list_tools) on a miss"""
+        tools = self._tools.get(server)
+        if tools is not None:
+            self.hits += 1
+            return tools
+        lock = self._locks.setdefault(server, asyncio.Lock())
+        async with lock:
+            if server not in self._tools:
+                raw_tools = await loader()
+                self._tools[server] = {
+                    tool.name: ToolSpec(server, tool.name, getattr(tool, "description", None), getattr(tool, "inputSchema", None))
+                    for tool in raw_tools
+                }
+                self._loaded_at[server] = time.time()
+                self.loads += 1
+                print(f"[TOOLS] Cached {len(self._tools[server])} {server} tools")
+            return self._tools[server]
+
+    def cached(self, server: str) -> Optional[Dict[str, ToolSpec]]:
+        """The server's tools if they are already cached (never loads)"""
+        return self._tools.get(server)
+
+    def validate(self, server: str, name: str, arguments: Dict[str, Any]):
+        """Validate arguments against a cached tool; unknown servers/tools are left to the server"""
+        spec = (self._tools.get(server) or {}).get(name)
+        if spec is not None:
+            spec.validate(arguments)
+
+    def invalidate(self, server: str):
+        """Forget a server's tools (after it reconnected)"""
+        if self._tools.pop(server, None) is not None:
+            self._loaded_at.pop(server, None)
+            print(f"[TOOLS] Invalidated the {server} tool catalog")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "servers": {server: {"tools": len(tools), "loaded_at": self._loaded_at.get(server)} for server, tools in self._tools.items()},
+            "loads": self.loads,
+            "hits": self.hits
+        }
+
+# Global catalog instance
+_tool_catalog = None
+
+def get_tool_catalog() -> ToolCatalog:
+    """Get or create the global ToolCatalog instance"""
+    global _tool_catalog
+    if _tool_catalog is None:
+        _tool_catalog = ToolCatalog()
+    return _tool_catalog
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Test Case Trace Recording and Replay
+
+Records the Playwright MCP tool calls of a passing agent run and replays them
+on later runs of the same test case without going through the LLM.
+
+Traces are keyed by a hash of the test case's title, steps and expected
+result, so editing any of those invalidates the trace. During replay every
+step is checked against the recorded run: the page URL reported by the tool
+must match, and the element a ref-based action targets must still be present
+in the latest page snapshot. A failed step or a divergent page stops the
+replay and the caller falls back to the agent.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from playwright_session_pool import PlaywrightSession, ToolCallRecord
+
+# Tools that are never recorded (session management, not test steps)
+UNRECORDED_TOOLS = {"browser_close", "browser_install"}
+
+PAGE_URL_PATTERN = re.compile(r"Page URL:\s*(\S+)")
+TRACE_KEY_PATTERN = re.compile(r"[0-9a-f]{64}")
+PLAYWRIGHT_CODE_PATTERN = re.compile(r"Ran Playwright code:?\s*```(?:js|javascript)?\n(.*?)```", re.DOTALL)
+
+
+def compute_test_case_key(test_case: Dict[str, Any]) -> str:
+    """Stable hash of the parts of a test case that determine its browser actions"""
+    payload = json.dumps({
+        "title": test_case.get("title", ""),
+        "steps": test_case.get("steps", []),
+        "expectedResult": test_case.get("expectedResult", "")
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def is_valid_trace_key(key: str) -> bool:
+    """Whether a key looks like compute_test_case_key output (keys are used in file paths)"""
+    return bool(TRACE_KEY_PATTERN.fullmatch(key or ""))
+
+
+def tool_result_text(result: Any) -> str:
+    """Join the text parts of an MCP CallToolResult"""
+    parts = []
+    for item in getattr(result, "content", None) or []:
+        text = getattr(item, "text", None)
+        if text:
+            parts.append(text)
+    return "\n".join(parts)
+
+
+def tool_result_is_error(result: Any) -> bool:
+    """Whether the MCP server reported the tool call as failed"""
+    return bool(getattr(result, "isError", False))
+
+
+def extract_page_url(text: str) -> Optional[str]:
+    """Page URL reported in a Playwright MCP tool result, if any"""
+    match = PAGE_URL_PATTERN.search(text or "")
+    return match.group(1) if match else None
+
+
+def extract_playwright_code(text: str) -> Optional[str]:
+    """The Playwright JS code the MCP server reports having run for an action, if any"""
+    match = PLAYWRIGHT_CODE_PATTERN.search(text or "")
+    return match.group(1).strip() if match else None
+
+
+def normalize_page_url(url: Optional[str]) -> Optional[str]:
+    """Compare pages by scheme, host and path; query strings often carry per-run tokens"""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}{parts.path.rstrip('/')}"
+
+
+def extract_snapshot_target(snapshot_text: Optional[str], ref: str) -> Optional[str]:
+    """
+    The snapshot line describing the element behind a ref, up to the ref itself
+
+    e.g. '- link "Manage" [ref=e12] [cursor=pointer]:' -> 'link "Manage" [ref=e12]'
+    """
+    if not snapshot_text or not ref:
+        return None
+    marker = f"[ref={ref}]"
+    for line in snapshot_text.splitlines():
+        if marker in line:
+            target = line[:line.index(marker) + len(marker)].strip()
+            return target[2:] if target.startswith("- ") else target
+    return None
+
+
+def agent_reported_pass(report: str) -> bool:
+    """Whether the agent's final report says the test passed"""
+    upper = (report or "").upper()
+    return bool(re.search(r"\bPASS(ED)?\b", upper)) and not re.search(r"\bFAIL(ED)?\b", upper)
+
+
+class TraceRecorder:
+    """Collects the successful tool calls made on a session while attached"""
+
+    def __init__(self, session: PlaywrightSession):
+        self.session = session
+        self.steps: List[Dict[str, Any]] = []
+        self._last_snapshot: Optional[str] = None
+
+    def __enter__(self):
+        self.session.add_tool_call_listener(self._on_tool_call)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.session.remove_tool_call_listener(self._on_tool_call)
+        return False
+
+    def _on_tool_call(self, record: ToolCallRecord):
+        if record.error is not None or tool_result_is_error(record.result):
+            return
+        text = tool_result_text(record.result)
+        if record.name not in UNRECORDED_TOOLS:
+            ref = record.arguments.get("ref")
+            self.steps.append({
+                "tool": record.name,
+                "arguments": record.arguments,
+                "page_url": extract_page_url(text),
+                "target": extract_snapshot_target(self._last_snapshot, ref) if ref else None,
+                "code": extract_playwright_code(text)
+            })
+        if "Page Snapshot" in text:
+            self._last_snapshot = text
+
+
+class ReplayResult:
+    """Outcome of replaying a recorded trace"""
+
+    def __init__(self, key: str, total_steps: int):
+        self.key = key
+        self.total_steps = total_steps
+        self.steps_replayed = 0
+        self.success = False
+        self.failed_step: Optional[int] = None
+        self.reason: Optional[str] = None
+        self.execution_time = 0.0
+
+    def report(self) -> str:
+        """Human-readable report in the same shape the agent produces"""
+        if self.success:
+            return (
+                f"Test case replayed from recorded trace {self.key[:12]} "
+                f"({self.total_steps} steps in {self.execution_time:.2f}s).\n"
+                "Every recorded step succeeded and the page matched the recorded run at each checkpoint.\n"
+                "Test PASSED"
+            )
+        return (
+            f"Replay of trace {self.key[:12]} stopped at step {self.failed_step} of {self.total_steps}: {self.reason}"
+        )
+
+
+class TraceStore:
+    """JSON file store of recorded traces, one file per test case key"""
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory or os.getenv("TEST_TRACE_DIR", "./traces")
+        self.step_timeout = float(os.getenv("TEST_TRACE_STEP_TIMEOUT", "30"))
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _write(self, trace: Dict[str, Any]):
+        path = self._path(trace["key"])
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, indent=2)
+        os.replace(temp_path, path)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Load the trace for a key, or None when nothing has been recorded"""
+        if not is_valid_trace_key(key):
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"[TRACE] Could not read trace {key[:12]}: {e}")
+            return None
+
+    def build_trace(self, key: str, test_case: Dict[str, Any], steps: List[Dict[str, Any]], llm_provider: str, model: str) -> Dict[str, Any]:
+        """Build a trace from the steps recorded during a passing agent run"""
+        return {
+            "key": key,
+            "title": test_case.get("title", ""),
+            "recorded_at": time.time(),
+            "recorded_with": f"{llm_provider}:{model}",
+            "steps": steps,
+            "replays": 0,
+            "replay_failures": 0,
+            "last_replayed_at": None
+        }
+
+    def save(self, trace: Dict[str, Any]) -> Dict[str, Any]:
+        """Store (or replace) a trace"""
+        self._write(trace)
+        print(f"[TRACE] Recorded {len(trace['steps'])} steps for '{trace['title']}' ({trace['key'][:12]})")
+        return trace
+
+    def record_replay(self, trace: Dict[str, Any], success: bool):
+        """Update the replay counters of a trace"""
+        trace["replays"] = trace.get("replays", 0) + 1
+        if not success:
+            trace["replay_failures"] = trace.get("replay_failures", 0) + 1
+        trace["last_replayed_at"] = time.time()
+        try:
+            self._write(trace)
+        except Exception as e:
+            print(f"[TRACE] Could not update trace {trace['key'][:12]}: {e}")
+
+    def delete(self, key: str) -> bool:
+        """Remove a trace so the next run goes through the agent again"""
+        if not is_valid_trace_key(key):
+            return False
+        try:
+            os.remove(self._path(key))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def list(self) -> List[Dict[str, Any]]:
+        """Summaries of all stored traces"""
+        summaries = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(".json"):
+                continue
+            trace = self.get(name[:-len(".json")])
+            if trace:
+                summaries.append({
+                    "key": trace["key"],
+                    "title": trace.get("title", ""),
+                    "steps": len(trace.get("steps", [])),
+                    "recorded_at": trace.get("recorded_at"),
+                    "recorded_with": trace.get("recorded_with"),
+                    "replays": trace.get("replays", 0),
+                    "replay_failures": trace.get("replay_failures", 0)
+                })
+        return summaries
+
+    async def replay(self, session: PlaywrightSession, trace: Dict[str, Any]) -> ReplayResult:
+        """
+        Replay a trace step by step on a borrowed session
+
+        Stops at the first step that errors, times out, targets an element that
+        is missing from the current snapshot, or lands on a different page
+        than the recorded run.
+        """
+        steps = trace.get("steps", [])
+        result = ReplayResult(trace["key"], len(steps))
+        start_time = time.time()
+        last_snapshot: Optional[str] = None
+
+        for index, step in enumerate(steps, start=1):
+            result.failed_step = index
+            target = step.get("target")
+            if target and last_snapshot is not None and target not in last_snapshot:
+                result.reason = f"page diverged: element '{target}' is not on the page before {step['tool']}"
+                break
+
+            try:
+                tool_result = await asyncio.wait_for(session.call_tool(step["tool"], step.get("arguments", {})), timeout=self.step_timeout)
+            except asyncio.TimeoutError:
+                result.reason = f"{step['tool']} timed out after {self.step_timeout:.0f}s"
+                break
+            except Exception as e:
+                result.reason = f"{step['tool']} failed: {e}"
+                break
+
+            text = tool_result_text(tool_result)
+            if tool_result_is_error(tool_result):
+                result.reason = f"{step['tool']} returned an error: {text[:200]}"
+                break
+
+            expected_url = normalize_page_url(step.get("page_url"))
+            actual_url = normalize_page_url(extract_page_url(text))
+            if expected_url and actual_url and expected_url != actual_url:
+                result.reason = f"page diverged after {step['tool']}: expected {expected_url}, got {actual_url}"
+                break
+
+            if "Page Snapshot" in text:
+                last_snapshot = text
+            result.steps_replayed = index
+        else:
+            result.success = True
+            result.failed_step = None
+
+        result.execution_time = time.time() - start_time
+        self.record_replay(trace, result.success)
+        if result.success:
+            print(f"[TRACE] Replayed {len(steps)} steps of {trace['key'][:12]} in {result.execution_time:.2f}s")
+        else:
+            print(f"[TRACE] {result.report()}")
+        return result
+
+# Global store instance
+_trace_store = None
+
+def get_trace_store() -> TraceStore:
+    """Get or create the global TraceStore instance"""
+    global _trace_store
+    if _trace_store is None:
+        _trace_store = TraceStore()
+    return _trace_store